@@ -120,8 +120,7 @@ const TaskManagementApp = () => {
   // Load tasks when user changes
   useEffect(() => {
     if (user) {
-      loadTasks();
-      loadStats();
+      loadDashboard();
     }
   }, [user]);
   // FIX 6: Note on potential race condition with loading state
@@ -166,38 +165,40 @@ const TaskManagementApp = () => {
     clearUserSession();
   };
 
-  // Task Functions (unchanged)
-  const loadTasks = async () => {
+  // Task Functions
+  // Tasks and stats come from the dashboard (the first page and the stats are
+  // one snapshot); further pages are followed through page.next_offset so
+  // users with more tasks than one page still see all of them
+  const loadDashboard = async () => {
     try {
-      const response = await fetch(`${API_BASE.tasks}/tasks?user_id=${user.id}`);
-      const data = await response.json();
-      
-      if (response.ok) {
-        setTasks(data.tasks || []);
-      } else {
-        showError('Failed to load tasks');
+      const loaded = [];
+      const seen = new Set();
+      let offset = 0;
+      let firstStats = null;
+      while (offset !== null && offset !== undefined) {
+        const response = await fetch(`${API_BASE.tasks}/dashboard/${user.id}?limit=1000&offset=${offset}`);
+        const data = await response.json();
+        if (!response.ok) {
+          showError('Failed to load tasks');
+          return;
+        }
+        // Offsets can shift under concurrent writes; never show a task twice
+        for (const task of data.tasks || []) {
+          if (!seen.has(task.id)) {
+            seen.add(task.id);
+            loaded.push(task);
+          }
+        }
+        firstStats = firstStats || data.stats;
+        offset = data.page ? data.page.next_offset : null;
       }
+      setTasks(loaded);
+      setStats(firstStats);
     } catch (error) {
       showError('Unable to connect to task service. Make sure it\'s running on port 6002.');
     }
   };
 
-  const loadStats = async () => {
-    try {
-      const response = await fetch(`${API_BASE.tasks}/tasks/stats/${user.id}`);
-      const data = await response.json();
-      
-      if (response.ok) {
-        setStats(data);
-      } else {
-        // FIX 4: Show error if stats loading fails
-        showError('Failed to load stats');
-      }
-    } catch (error) {
-      console.error('Failed to load stats');
-    }
-  };
-
   const handleTaskSubmit = async (e) => {
     e.preventDefault();
     console.log('🚀 Form submitted!'); // ADD THIS
@@ -225,7 +226,7 @@ const TaskManagementApp = () => {
 
       const response = await fetch(url, {
         method,
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', ...ifMatch(editingTask) },
         body: JSON.stringify(payload)
       });
 
@@ -235,11 +236,13 @@ const TaskManagementApp = () => {
       console.log('📥 Response data:', data); // ADD THIS
 
       if (response.ok) {
-        await loadTasks();
-        await loadStats();
+        await loadDashboard();
         setShowTaskForm(false);
         setEditingTask(null);
         setTaskForm({ title: '', description: '', priority: 'medium', status: 'pending', due_date: '' });
+      } else if (response.status === 412) {
+        showError('This task was changed elsewhere. Reloaded the latest version.');
+        await loadDashboard();
       } else {
         showError(data.error || 'Failed to save task');
       }
@@ -260,8 +263,7 @@ const TaskManagementApp = () => {
       });
 
       if (response.ok) {
-        await loadTasks();
-        await loadStats();
+        await loadDashboard();
       } else {
         showError('Failed to delete task');
       }
@@ -282,19 +284,26 @@ const TaskManagementApp = () => {
     setShowTaskForm(true);
   };
 
+  // Conditional PUT: the server answers 412 if the task changed since we loaded it
+  const ifMatch = (task) => (
+    task && task.version !== undefined ? { 'If-Match': `"${task.version}"` } : {}
+  );
+
   const toggleTaskStatus = async (task) => {
     const newStatus = task.status === 'completed' ? 'pending' : 'completed';
     
     try {
       const response = await fetch(`${API_BASE.tasks}/tasks/${task.id}`, {
         method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', ...ifMatch(task) },
         body: JSON.stringify({ status: newStatus })
       });
 
       if (response.ok) {
-        await loadTasks();
-        await loadStats();
+        await loadDashboard();
+      } else if (response.status === 412) {
+        showError('This task was changed elsewhere. Reloaded the latest version.');
+        await loadDashboard();
       }
     } catch (error) {
       showError('Failed to update task');
@@ -0,0 +1,259 @@
+# task_service/admission.py
+"""
+Admission control: per-client rate limits and load shedding.
+
+Every request passes two gates before it reaches a route:
+
+1. Rate limiting. A token bucket per client address with separate read and
+   write budgets. An empty bucket answers 429 + Retry-After. The key is never
+   taken from the request itself (a user_id is not authenticated, so keying on
+   it would let a client pick a fresh bucket per request or drain someone
+   else's). Behind a proxy listed in RATE_LIMIT_TRUSTED_PROXIES, the client is
+   the last address in X-Forwarded-For that is not a trusted proxy.
+2. Load shedding. Writes are refused with 503 + Retry-After while too many
+   writes are already in flight or the SQLite write queue is backed up, so an
+   overload makes some requests fail fast instead of making all of them slow.
+
+Bucket state lives in this process by default. RATE_LIMIT_BACKEND=sqlite keeps
+it in a small local SQLite file instead, so all worker processes on one host
+share the same budgets. If that file stays locked past its timeout, the
+request is admitted: a busy limiter must not turn into 500s.
+"""
+import ipaddress
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from flask import jsonify, request
+
+READ_METHODS = frozenset(('GET', 'HEAD'))
+
+
+class MemoryBuckets:
+    """Token buckets in a dict (one process)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now=None):
+        """Take one token; returns (allowed, tokens_left, retry_after_seconds)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                self._prune(now, rate, burst)
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens, 0 if allowed else (1 - tokens) / rate
+
+    def _prune(self, now, rate, burst):
+        # Buckets that have refilled completely hold no state worth keeping
+        full_after = burst / rate
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+    def close(self):
+        pass
+
+
+class SqliteBuckets:
+    """Token buckets in a local SQLite file, shared by every worker on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db_dir = os.path.dirname(path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        ''')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=1.0,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')  # losing a bucket on crash is fine
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, now=None):
+        # Wall clock, because several processes compare timestamps
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')  # sqlite3.OperationalError after the busy timeout
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens, 0 if allowed else (1 - tokens) / rate
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class AdmissionController:
+    """Flask before/after-request hooks that rate limit and shed load"""
+
+    def __init__(self, buckets, read_rate=20.0, read_burst=40, write_rate=5.0,
+                 write_burst=10, max_inflight_writes=64, write_queue_limit=0,
+                 write_pressure=None, exempt_paths=('/health', '/live'), trusted_proxies=(),
+                 enabled=True):
+        self.buckets = buckets
+        self.read_rate = read_rate
+        self.read_burst = read_burst
+        self.write_rate = write_rate
+        self.write_burst = write_burst
+        self.max_inflight_writes = max_inflight_writes
+        # write_pressure: callable returning the number of queued writes
+        self.write_queue_limit = write_queue_limit
+        self.write_pressure = write_pressure
+        self.exempt_paths = set(exempt_paths)
+        self.trusted_proxies = [ipaddress.ip_network(p, strict=False) for p in trusted_proxies]
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self.inflight_writes = 0
+        self.counters = {'admitted': 0, 'rate_limited': 0, 'shed': 0, 'limiter_errors': 0}
+
+    @classmethod
+    def from_config(cls, config, write_pressure=None):
+        if config['RATE_LIMIT_BACKEND'] == 'sqlite':
+            buckets = SqliteBuckets(config['RATE_LIMIT_DB_PATH'])
+        else:
+            buckets = MemoryBuckets()
+        return cls(
+            buckets,
+            read_rate=config['RATE_LIMIT_READ_PER_SEC'],
+            read_burst=config['RATE_LIMIT_READ_BURST'],
+            write_rate=config['RATE_LIMIT_WRITE_PER_SEC'],
+            write_burst=config['RATE_LIMIT_WRITE_BURST'],
+            max_inflight_writes=config['MAX_INFLIGHT_WRITES'],
+            write_queue_limit=config.get('WRITE_QUEUE_SHED_THRESHOLD', 0),
+            write_pressure=write_pressure,
+            trusted_proxies=config.get('RATE_LIMIT_TRUSTED_PROXIES', ()),
+            enabled=config['RATE_LIMIT_ENABLED'],
+        )
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, inflight_writes=self.inflight_writes,
+                        enabled=self.enabled)
+
+    # ------------------------------------------------------------------
+    # Request hooks
+    # ------------------------------------------------------------------
+    def _trusted(self, addr):
+        try:
+            ip = ipaddress.ip_address(addr)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def client_key(self):
+        """ip:<client address>, looking through trusted proxies"""
+        addr = request.remote_addr
+        if self.trusted_proxies and self._trusted(addr):
+            hops = [h.strip() for h in request.headers.get('X-Forwarded-For', '').split(',') if h.strip()]
+            # Appended left to right; the rightmost untrusted hop is the one
+            # our proxies saw, anything before it is whatever the client sent
+            for hop in reversed(hops):
+                addr = hop
+                if not self._trusted(hop):
+                    break
+        return f'ip:{addr}'
+
+    def _take(self, key, rate, burst):
+        try:
+            return self.buckets.take(key, rate, burst)
+        except Exception as e:
+            # Fail open: a locked or broken bucket store admits the request
+            with self._lock:
+                self.counters['limiter_errors'] += 1
+            print(f"Rate limiter unavailable, admitting request: {e}", file=sys.stderr)
+            return True, burst, 0
+
+    def _reject(self, status, message, retry_after, counter):
+        with self._lock:
+            self.counters[counter] += 1
+        response = jsonify({'error': message})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def _before_request(self):
+        if not self.enabled or request.method == 'OPTIONS' or request.path in self.exempt_paths:
+            return None
+        is_write = request.method not in READ_METHODS
+
+        key = self.client_key()
+        if is_write:
+            allowed, _, wait = self._take(f'w:{key}', self.write_rate, self.write_burst)
+        else:
+            allowed, _, wait = self._take(f'r:{key}', self.read_rate, self.read_burst)
+        if not allowed:
+            return self._reject(429, 'Too many requests', wait, 'rate_limited')
+
+        if is_write:
+            queued = self.write_pressure() if self.write_pressure else 0
+            with self._lock:
+                overloaded = (
+                    self.inflight_writes >= self.max_inflight_writes
+                    or (self.write_queue_limit and queued >= self.write_queue_limit)
+                )
+                if not overloaded:
+                    self.inflight_writes += 1
+            if overloaded:
+                return self._reject(503, 'Service overloaded, retry later', 1, 'shed')
+            request.environ['admission.write'] = True
+
+        with self._lock:
+            self.counters['admitted'] += 1
+        return None
+
+    def _teardown_request(self, exc):
+        if request.environ.pop('admission.write', False):
+            with self._lock:
+                self.inflight_writes -= 1
+
+    def close(self):
+        try:
+            self.buckets.close()
+        except Exception as e:
+            print(f"Error closing rate limit store: {e}", file=sys.stderr)
@@ -0,0 +1,267 @@
+# task_service/analytics.py
+"""
+Productivity analytics for one user, computed with NumPy.
+
+A user's task history (including archived tasks) is fetched in ONE query as
+column arrays of status, priority and the created/updated/due timestamps,
+as stored: the database only collects them, which is the expensive part.
+Here the statuses become a completed flag, priorities small integer codes,
+and NumPy parses the timestamps a chunk at a time into Julian day numbers;
+only a chunk holding a value it cannot parse is retried one value at a time,
+and such values (and NULL, or anything but text) become NaN. The arrays are
+cached per user *version* (a counter the database bumps when a task is
+inserted or deleted, or a column read here changes; flagging a task overdue
+does not count), so they are reloaded only after the user's tasks change.
+Every metric is then a handful of vectorized operations over the cached
+arrays:
+
+- completion: tasks created / completed per day and the share of each day's
+  tasks that are done, for the last `days` days
+- lead_time_hours: created -> completed percentiles (updated_at is the
+  completion time, as for archiving)
+- overdue_aging: open overdue tasks bucketed by how long they are overdue
+- priority: total and completed tasks per priority
+"""
+import sys
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from datetime import date
+
+try:
+    from orjson import loads as _loads
+except ImportError:  # pragma: no cover - optional speedup
+    from json import loads as _loads
+
+# NumPy is imported on first use (load_numpy) rather than at import time: it
+# is the largest import of the service and only this endpoint needs it
+np = None
+
+
+def load_numpy():
+    """Import NumPy for this module (once)"""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+# Julian day number of 0001-01-01 minus one: ordinal = civil day - this
+_ORDINAL_OFFSET = 1721424
+
+# Julian day of 1970-01-01T00:00:00, where datetime64 counts from
+_UNIX_EPOCH_JD = 2440587.5
+_US_PER_DAY = 86_400_000_000
+
+# Timestamps parsed per NumPy call; a failing chunk is parsed value by value
+PARSE_CHUNK = 65536
+
+# Offsets are applied (converted to UTC, as julianday() does); NumPy only
+# warns that it keeps no zone
+warnings.filterwarnings('ignore', message='no explicit representation of timezones',
+                        category=UserWarning)
+
+LEAD_TIME_PERCENTILES = (50, 75, 90, 95, 99)
+AGING_EDGES = (0, 1, 3, 7, 14, 30)
+AGING_LABELS = ('<1d', '1-3d', '3-7d', '7-14d', '14-30d', '30d+')
+
+
+class UserTaskArrays:
+    """Column arrays of one user's tasks"""
+    __slots__ = ('completed', 'priority_codes', 'priorities', 'created', 'updated', 'due')
+
+    def __init__(self, source):
+        # source: TaskStore.analytics_source(), JSON arrays of stored values
+        load_numpy()
+        self.completed = np.array([status == 'completed' for status in _loads(source['status'])],
+                                  dtype=bool)
+        self.priorities, self.priority_codes = _priority_codes(_loads(source['priority']))
+        self.created = julian_days(_loads(source['created']))
+        self.updated = julian_days(_loads(source['updated']))
+        self.due = julian_days(_loads(source['due']))
+
+    def __len__(self):
+        return len(self.completed)
+
+
+def _priority_codes(priorities):
+    """Priorities (None for NULL) -> (sorted names, int32 code per task)"""
+    codes = {}  # value -> code in order of first appearance
+    first_seen = np.array([codes.setdefault(p, len(codes)) for p in priorities], dtype=np.int32)
+    seen = ['none' if value is None else str(value) for value in codes]
+    names = sorted(set(seen))
+    rank = np.array([names.index(name) for name in seen], dtype=np.int32)
+    return np.array(names, dtype=str), rank[first_seen]
+
+
+def _timestamp(value):
+    """One ISO string -> datetime64[us], NaT if unparsable"""
+    try:
+        return np.datetime64(value, 'us')
+    except (ValueError, OverflowError):
+        return np.datetime64('NaT', 'us')
+
+
+def parse_timestamps(values):
+    """Stored timestamps -> datetime64[us] array; NULL, non-text and unparsable values become NaT"""
+    load_numpy()
+    stamps = np.empty(len(values), dtype='datetime64[us]')
+    for start in range(0, len(values), PARSE_CHUNK):
+        # '' is NaT and parses much faster than None; numbers would be taken
+        # as microseconds since 1970
+        chunk = [value if isinstance(value, str) else '' for value in values[start:start + PARSE_CHUNK]]
+        try:
+            stamps[start:start + len(chunk)] = np.array(chunk, dtype='datetime64[us]')
+        except (ValueError, OverflowError):
+            stamps[start:start + len(chunk)] = [_timestamp(value) for value in chunk]
+    return stamps
+
+
+def julian_days(values):
+    """Stored timestamps -> Julian day numbers like SQLite's julianday(); NaN if not a timestamp"""
+    stamps = parse_timestamps(values)
+    days = stamps.astype(np.int64) / _US_PER_DAY + _UNIX_EPOCH_JD
+    days[np.isnat(stamps)] = np.nan
+    return days
+
+
+def _civil_day(julian_days):
+    """Julian day numbers -> integer day numbers (midnight to midnight)"""
+    return np.floor(julian_days - 0.5)
+
+
+def julian_day(dt):
+    """Naive datetime -> Julian day, matching SQLite's julianday()"""
+    midnight = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    return dt.toordinal() + _ORDINAL_OFFSET + 0.5 + (dt - midnight).total_seconds() / 86400.0
+
+
+def _day_string(day):
+    return date.fromordinal(int(day) - _ORDINAL_OFFSET).isoformat()
+
+
+def completion_series(arrays, now_jd, days):
+    today = _civil_day(now_jd)
+    start = today - days + 1
+    created_idx = _civil_day(arrays.created) - start
+    in_window = (created_idx >= 0) & (created_idx < days)  # NaN compares False
+    created = np.bincount(created_idx[in_window].astype(np.int64), minlength=days)
+    created_done = np.bincount(created_idx[in_window & arrays.completed].astype(np.int64),
+                               minlength=days)
+
+    done_idx = _civil_day(arrays.updated[arrays.completed]) - start
+    done_idx = done_idx[(done_idx >= 0) & (done_idx < days)]
+    completed = np.bincount(done_idx.astype(np.int64), minlength=days)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(created > 0, created_done / np.maximum(created, 1), np.nan)
+    return {
+        'dates': [_day_string(start + i) for i in range(days)],
+        'created': created.tolist(),
+        'completed': completed.tolist(),
+        'completion_rate': [None if np.isnan(r) else round(float(r), 4) for r in rate],
+    }
+
+
+def lead_time_hours(arrays):
+    lead = (arrays.updated[arrays.completed] - arrays.created[arrays.completed]) * 24.0
+    lead = lead[np.isfinite(lead) & (lead >= 0)]
+    if not len(lead):
+        return {'count': 0, 'mean': None, **{f'p{p}': None for p in LEAD_TIME_PERCENTILES}}
+    percentiles = np.percentile(lead, LEAD_TIME_PERCENTILES)
+    return {
+        'count': int(len(lead)),
+        'mean': round(float(lead.mean()), 2),
+        **{f'p{p}': round(float(v), 2) for p, v in zip(LEAD_TIME_PERCENTILES, percentiles)},
+    }
+
+
+def overdue_aging(arrays, now_jd):
+    age = now_jd - arrays.due
+    overdue = ~arrays.completed & (age > 0)  # NaN due dates compare False
+    buckets = np.searchsorted(AGING_EDGES, age[overdue], side='right') - 1
+    counts = np.bincount(buckets, minlength=len(AGING_LABELS))
+    return {'total': int(overdue.sum()), 'buckets': dict(zip(AGING_LABELS, counts.tolist()))}
+
+
+def priority_distribution(arrays):
+    size = len(arrays.priorities)
+    totals = np.bincount(arrays.priority_codes, minlength=size)
+    completed = np.bincount(arrays.priority_codes[arrays.completed], minlength=size)
+    return {
+        str(name): {'total': int(t), 'completed': int(c)}
+        for name, t, c in zip(arrays.priorities, totals, completed)
+    }
+
+
+class TaskAnalytics:
+    """Per-user analytics with a version-checked LRU of loaded arrays"""
+
+    def __init__(self, store, max_cached_tasks=2_000_000):
+        self.store = store
+        self.max_cached_tasks = max_cached_tasks
+        self._cache = OrderedDict()  # user_id -> (version, UserTaskArrays)
+        self._cached_tasks = 0
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'loads': 0}
+
+    @classmethod
+    def from_config(cls, config, store):
+        return cls(store, max_cached_tasks=config['ANALYTICS_CACHE_TASKS'])
+
+    def _arrays(self, user_id):
+        version = self.store.user_version(user_id)
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and version is not None and entry[0] == version:
+                self._cache.move_to_end(user_id)
+                self.counters['hits'] += 1
+                return entry[1], True
+
+        arrays = UserTaskArrays(self.store.analytics_source(user_id))
+        with self._lock:
+            self.counters['loads'] += 1
+            if version is None:
+                return arrays, False
+            old = self._cache.pop(user_id, None)
+            if old is not None:
+                self._cached_tasks -= len(old[1])
+            self._cache[user_id] = (version, arrays)
+            self._cached_tasks += len(arrays)
+            while self._cached_tasks > self.max_cached_tasks and len(self._cache) > 1:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cached_tasks -= len(evicted)
+        return arrays, False
+
+    def for_user(self, user_id, now, days=30):
+        """Analytics document for GET /api/tasks/analytics/<user_id>"""
+        started = time.perf_counter()
+        arrays, cached = self._arrays(user_id)
+        loaded = time.perf_counter()
+
+        now_jd = julian_day(now)
+        result = {
+            'user_id': user_id,
+            'total_tasks': len(arrays),
+            'days': days,
+            'completion': completion_series(arrays, now_jd, days),
+            'lead_time_hours': lead_time_hours(arrays),
+            'overdue_aging': overdue_aging(arrays, now_jd),
+            'priority': priority_distribution(arrays),
+        }
+        finished = time.perf_counter()
+        result['timings_ms'] = {
+            'load': round((loaded - started) * 1000, 2),
+            'compute': round((finished - loaded) * 1000, 2),
+            'cached': cached,
+        }
+        if not cached and len(arrays) > 100000:
+            print(f"Analytics for user {user_id}: loaded {len(arrays)} tasks in "
+                  f"{result['timings_ms']['load']}ms", file=sys.stderr)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, users=len(self._cache), tasks=self._cached_tasks)
@@ -1,96 +1,198 @@
+import time
+STARTED = time.perf_counter()  # start of the 'import' startup phase
 from dotenv import load_dotenv
 load_dotenv('.env.development')  # Load environment variables
 # task_service/app.py
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import sqlite3
 import os
 from datetime import datetime
-import requests
 import traceback
 import sys
+import atexit
 from config import get_config 
+from storage import create_task_store, UPDATABLE_FIELDS, VersionConflict
+from backup import BackupManager, BackupInProgress
+from archiver import Archiver
+from deadlines import DeadlineScheduler
+from analytics import TaskAnalytics, load_numpy
+from idempotency import IdempotencyKeys
+from admission import AdmissionController
+from singleflight import SingleFlight
+from user_client import UserServiceClient
+from serialization import FastJSONProvider, Compressor, COLUMNAR_MIMETYPE, wants_columnar
+from startup import Startup
+from shutdown import GracefulShutdown
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Load configuration
 env = os.getenv('FLASK_ENV', 'development')
-app.config.from_object(get_config(env))
-get_config(env).init_app(app)
+config_class = get_config(env)
+app.config.from_object(config_class)
+config_class.init_app(app)
 
 # Setup CORS with configured origins
 CORS(app, origins=app.config['CORS_ORIGINS'])
 
-# Database configuration
-# DATABASE = os.getenv('DATABASE', '/app/data/tasks.db')
-DATABASE = os.environ.get('DATABASE', 'tasks.db')
+# Migrations and warmup run before GET /ready turns 200 (see startup.py)
+startup = Startup('task-service', started=STARTED)
+startup.init_app(app)
+
+# SIGTERM: fail readiness, drain in-flight requests, flush writes, exit (see shutdown.py)
+shutdown = GracefulShutdown.from_config(app.config, startup)
+shutdown.init_app(app)
 
 # USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', 'http://localhost:5001')
 # Replaced with config value
 USER_SERVICE_URL = app.config['USER_SERVICE_URL']
 
 print(f"=== TASK SERVICE STARTING ===", file=sys.stderr)
-print(f"DATABASE: {DATABASE}", file=sys.stderr)
+print(f"DATABASE: {app.config['DATABASE_PATH']}", file=sys.stderr)
+print(f"STORAGE_BACKEND: {app.config['STORAGE_BACKEND']}", file=sys.stderr)
 print(f"USER_SERVICE_URL: {USER_SERVICE_URL}", file=sys.stderr)
 
-def ensure_data_directory():
-    """Ensure the data directory exists"""
-    db_dir = os.path.dirname(DATABASE)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir, exist_ok=True)
-        print(f"Created directory: {db_dir}", file=sys.stderr)
+# Task persistence goes through a TaskStore (storage/); the backend is chosen
+# by STORAGE_BACKEND in config
+store = create_task_store(app.config)
+atexit.register(store.close)
 
-def get_db_connection():
-    """Get database connection using config"""
-    try:
-        conn = sqlite3.connect(app.config['DATABASE_PATH'])
-        conn.row_factory = sqlite3.Row
-        return conn
-    except Exception as e:
-        print(f"ERROR connecting to database: {e}", file=sys.stderr)
-        raise
+# Online snapshots of every shard (SQLite files only; nothing to snapshot in memory)
+backups = None
+if store.backend == 'sqlite' and not store.in_memory:
+    backups = BackupManager.from_config(
+        app.config,
+        sources=lambda: [(f'shard{s.index}', s.database_path) for s in store.router.shards],
+        extra_files=lambda: [store.router.map_path],
+    )
+    atexit.register(backups.stop)
+
+# Moves old completed tasks out of the hot table
+archiver = Archiver.from_config(app.config, store)
+atexit.register(archiver.stop)
+
+# Flags tasks overdue when their due_date passes, sends reminders before that
+deadlines = DeadlineScheduler.from_config(app.config, store)
+atexit.register(deadlines.stop)
+
+
+def log_deadline_event(event):
+    """Reminders and overdue transitions as one JSON line each, for log-based alerting"""
+    print(app.json.dumps({'event': 'deadline', **event}), file=sys.stderr)
+
+
+deadlines.on_event(log_deadline_event)
+
+# Per-client rate limits, and 503s for writes while the write queue is backed up
+admission = AdmissionController.from_config(
+    app.config,
+    write_pressure=lambda: max((w['pending'] for w in store.writer_stats().values()), default=0),
+)
+admission.init_app(app)
+atexit.register(admission.close)
+
+# gzip/brotli for large JSON responses
+compressor = Compressor.from_config(app.config)
+compressor.init_app(app)
+
+# Identical concurrent reads (same route + params) share one query
+reads = SingleFlight(enabled=app.config['COALESCE_READS'])
+
+# Cached profile lookups for the dashboard
+users = UserServiceClient.from_config(app.config)
+
+# Per-user NumPy arrays for the analytics endpoint, reloaded when tasks change
+analytics = TaskAnalytics.from_config(app.config, store)
+
+# Safe retries of POST /api/tasks (Idempotency-Key header)
+idempotency = IdempotencyKeys.from_config(
+    app.config, purge=lambda now: store.purge_idempotency_keys(now)
+)
+
+# After draining: no new background work, queued writes committed, pools closed
+shutdown.on_shutdown('background_jobs', lambda: stop_background_jobs())
+shutdown.on_shutdown('stores', lambda: store.close())
+shutdown.on_shutdown('rate_limits', admission.close)
+shutdown.on_shutdown('http_sessions', users.close)
+atexit.register(users.close)
 
 def init_db():
     """Initialize the database with required tables"""
     print("Initializing database...", file=sys.stderr)
-    ensure_data_directory()
     
     try:
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                priority TEXT DEFAULT 'medium',
-                status TEXT DEFAULT 'pending',
-                due_date TEXT,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        store.init_schema()
         print("Database initialized successfully!", file=sys.stderr)
-        print(f"Database location: {DATABASE}", file=sys.stderr)
     except Exception as e:
         print(f"ERROR initializing database: {e}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         raise
 
+def warm_up():
+    """Open pooled connections and read hot index pages before taking traffic"""
+    store.warm(rows=app.config['STARTUP_WARM_ROWS'])
+
+def preload():
+    """Imports kept off the startup path, loaded before their first use"""
+    import requests  # noqa: F401 - health checks and profile lookups
+    load_numpy()
+
+def start_background_jobs():
+    if backups is not None:
+        backups.start_scheduler(app.config['BACKUP_INTERVAL'])
+    archiver.start(app.config['ARCHIVE_INTERVAL'])
+    deadlines.start()
+
+def stop_background_jobs():
+    """Stop the schedulers, letting a running archive batch finish"""
+    if backups is not None:
+        backups.stop()
+    archiver.stop(timeout=app.config['SHUTDOWN_DRAIN_TIMEOUT'])
+    deadlines.stop(timeout=app.config['SHUTDOWN_DRAIN_TIMEOUT'])
+
+def reschedule(task_id):
+    """Hand a task's new due_date/status to the deadline scheduler"""
+    task = store.get_task(task_id)
+    if task is None:
+        deadlines.cancel(task_id)
+    else:
+        deadlines.schedule(task_id, task['user_id'], task['due_date'], task['status'])
+
+def coalesced_json(key, load, encoded=False, mimetype='application/json'):
+    """
+    JSON response from load(), shared with identical requests running now.
+    With encoded=True load() returns the finished JSON text itself.
+    """
+    body = reads.do(key, load if encoded else lambda: app.json.dumps(load()) + '\n')
+    return app.response_class(body, mimetype=mimetype)
+
+def arg_flag(name):
+    """True when a query-string flag is set (?name=true / 1 / yes)"""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+def if_match_versions():
+    """Task versions named by If-Match (None when the PUT is unconditional)"""
+    if 'If-Match' not in request.headers or request.if_match.star_tag:
+        return None
+    # Only strong, numeric ETags can match; anything else fails the precondition
+    return {int(tag) for tag in request.if_match.as_set() if tag.isdigit()}
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for Kubernetes probes"""
+    if startup.state == 'failed':
+        return jsonify({
+            'status': 'unhealthy',
+            'service': 'task-service',
+            'error': f'Startup failed: {startup.error}',
+            'timestamp': datetime.now().isoformat()
+        }), 503
     try:
-        conn = get_db_connection()
-        conn.execute('SELECT 1')
-        conn.close()
+        store.ping()
         
         try:
+            import requests  # deferred (see preload)
             response = requests.get(f'{USER_SERVICE_URL}/health', timeout=2)
             user_service_healthy = response.status_code == 200
         except:
@@ -102,6 +204,16 @@ def health_check():
             'dependencies': {
                 'user-service': 'healthy' if user_service_healthy else 'unhealthy'
             },
+            'write_queue': store.writer_stats(),
+            'admission': admission.stats(),
+            'single_flight': reads.stats(),
+            'profile_cache': users.stats(),
+            'compression': compressor.stats(),
+            'analytics': analytics.stats(),
+            'idempotency': idempotency.stats(),
+            'deadlines': deadlines.stats(),
+            'startup': startup.stats(),
+            'shutdown': shutdown.stats(),
             'timestamp': datetime.now().isoformat()
         }), 200
             
@@ -127,31 +239,29 @@ def tasks():
             
             if not user_id:
                 return jsonify({'error': 'user_id is required'}), 400
-            
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM tasks WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
-            tasks = cursor.fetchall()
-            conn.close()
-            
-            print(f"Found {len(tasks)} tasks", file=sys.stderr)
-            
-            tasks_list = []
-            for task in tasks:
-                tasks_list.append({
-                    'id': task['id'],
-                    'user_id': task['user_id'],
-                    'title': task['title'],
-                    'description': task['description'],
-                    'priority': task['priority'],
-                    'status': task['status'],
-                    'due_date': task['due_date'],
-                    'created_at': task['created_at'],
-                    'updated_at': task['updated_at']
-                })
-            
-            return jsonify({'tasks': tasks_list}), 200
+            if not user_id.isdigit():
+                return jsonify({'error': 'user_id must be an integer'}), 400
+            
+            include_archived = arg_flag('include_archived')
+            
+            if wants_columnar():
+                response = coalesced_json(
+                    ('tasks-columnar', int(user_id), include_archived),
+                    lambda: store.list_tasks_columns(int(user_id), include_archived=include_archived),
+                    mimetype=COLUMNAR_MIMETYPE
+                )
+                response.vary.add('Accept')
+                return response, 200
+            
+            def load():
+                # Rows arrive already encoded as a JSON array
+                tasks_json = store.list_tasks_json(int(user_id), include_archived=include_archived)
+                print(f"Listed tasks ({len(tasks_json)} bytes)", file=sys.stderr)
+                return '{"tasks":' + tasks_json + '}\n'
+            
+            response = coalesced_json(('tasks', int(user_id), include_archived), load, encoded=True)
+            response.vary.add('Accept')
+            return response, 200
             
         except Exception as e:
             print(f"GET TASKS ERROR: {str(e)}", file=sys.stderr)
@@ -164,6 +274,11 @@ def tasks():
         print(f"Raw data: {request.data}", file=sys.stderr)
         
         try:
+            try:
+                idempotency_key = idempotency.request_key()
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
             data = request.get_json()
             print(f"Parsed JSON: {data}", file=sys.stderr)
             
@@ -188,38 +303,60 @@ def tasks():
                 print("ERROR: title is missing", file=sys.stderr)
                 return jsonify({'error': 'title is required'}), 400
             
-            print("Opening database connection...", file=sys.stderr)
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            try:
+                int(user_id)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'user_id must be an integer'}), 400
+            
+            if due_date is not None and not isinstance(due_date, str):
+                return jsonify({'error': 'due_date must be a string'}), 400
             
             now = datetime.now().isoformat()
             print(f"Timestamp: {now}", file=sys.stderr)
             
-            print("Executing INSERT...", file=sys.stderr)
-            cursor.execute('''
-                INSERT INTO tasks (user_id, title, description, priority, status, due_date, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, title, description, priority, status, due_date, now, now))
-            
-            print("Committing...", file=sys.stderr)
-            conn.commit()
-            task_id = cursor.lastrowid
-            conn.close()
+            task = {
+                'user_id': user_id,
+                'title': title,
+                'description': description,
+                'priority': priority,
+                'status': status,
+                'due_date': due_date,
+                'created_at': now,
+                'updated_at': now
+            }
+            
+            def create(record=None):
+                print("Storing task...", file=sys.stderr)
+                task_id = store.create_task(task, idempotency=record)
+                reads.forget()
+                deadlines.schedule(task_id, int(user_id), due_date, status)
+                print(f"✓ Task created successfully: ID={task_id}", file=sys.stderr)
+                return task_id
+            
+            def respond(task_id):
+                return 201, {
+                    'message': 'Task created successfully',
+                    'task': {
+                        'id': task_id,
+                        'user_id': user_id,
+                        'title': title,
+                        'description': description,
+                        'priority': priority,
+                        'status': status,
+                        'due_date': due_date
+                    }
+                }
             
-            print(f"✓ Task created successfully: ID={task_id}", file=sys.stderr)
+            if idempotency_key is not None:
+                # Keys are per user, so one user's key can never replay another's task
+                return idempotency.run(
+                    int(user_id), idempotency_key, idempotency.fingerprint(data),
+                    lambda at: store.get_idempotent_response(int(user_id), idempotency_key, at),
+                    create, respond
+                )
             
-            return jsonify({
-                'message': 'Task created successfully',
-                'task': {
-                    'id': task_id,
-                    'user_id': user_id,
-                    'title': title,
-                    'description': description,
-                    'priority': priority,
-                    'status': status,
-                    'due_date': due_date
-                }
-            }), 201
+            status_code, body = respond(create())
+            return jsonify(body), status_code
             
         except Exception as e:
             print(f"CREATE TASK ERROR: {str(e)}", file=sys.stderr)
@@ -235,27 +372,12 @@ def task_detail(task_id):
     
     if request.method == 'GET':
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM tasks WHERE id = ?', (task_id,))
-            task = cursor.fetchone()
-            conn.close()
+            task = store.get_task(task_id, include_archived=arg_flag('include_archived'))
             
             if task:
-                return jsonify({
-                    'task': {
-                        'id': task['id'],
-                        'user_id': task['user_id'],
-                        'title': task['title'],
-                        'description': task['description'],
-                        'priority': task['priority'],
-                        'status': task['status'],
-                        'due_date': task['due_date'],
-                        'created_at': task['created_at'],
-                        'updated_at': task['updated_at']
-                    }
-                }), 200
+                response = jsonify({'task': task})
+                response.set_etag(str(task['version']))
+                return response.make_conditional(request)
             else:
                 return jsonify({'error': 'Task not found'}), 404
                 
@@ -271,44 +393,28 @@ def task_detail(task_id):
             if not data:
                 return jsonify({'error': 'No JSON data provided'}), 400
             
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            update_fields = []
-            values = []
-            
-            if 'title' in data:
-                update_fields.append('title = ?')
-                values.append(data['title'])
-            if 'description' in data:
-                update_fields.append('description = ?')
-                values.append(data['description'])
-            if 'priority' in data:
-                update_fields.append('priority = ?')
-                values.append(data['priority'])
-            if 'status' in data:
-                update_fields.append('status = ?')
-                values.append(data['status'])
-            if 'due_date' in data:
-                update_fields.append('due_date = ?')
-                values.append(data['due_date'])
-            
-            update_fields.append('updated_at = ?')
-            values.append(datetime.now().isoformat())
-            
-            values.append(task_id)
-            
-            query = f"UPDATE tasks SET {', '.join(update_fields)} WHERE id = ?"
-            cursor.execute(query, values)
-            conn.commit()
-            
-            if cursor.rowcount == 0:
-                conn.close()
+            changes = {field: data[field] for field in UPDATABLE_FIELDS if field in data}
+            if changes.get('due_date') is not None and not isinstance(changes['due_date'], str):
+                return jsonify({'error': 'due_date must be a string'}), 400
+            changes['updated_at'] = datetime.now().isoformat()
+            
+            try:
+                version = store.update_task(task_id, changes, expected_versions=if_match_versions())
+            except VersionConflict as e:
+                response = jsonify({'error': 'Task was modified by another request',
+                                    'version': e.current_version})
+                response.status_code = 412
+                response.set_etag(str(e.current_version))
+                return response
+            if not version:
                 return jsonify({'error': 'Task not found'}), 404
+            reads.forget()
+            if deadlines.running and ('due_date' in changes or 'status' in changes):
+                reschedule(task_id)
             
-            conn.close()
-            
-            return jsonify({'message': 'Task updated successfully'}), 200
+            response = jsonify({'message': 'Task updated successfully', 'version': version})
+            response.set_etag(str(version))
+            return response
             
         except Exception as e:
             print(f"Update task error: {str(e)}", file=sys.stderr)
@@ -317,17 +423,10 @@ def task_detail(task_id):
     
     elif request.method == 'DELETE':
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-            conn.commit()
-            
-            if cursor.rowcount == 0:
-                conn.close()
+            if not store.delete_task(task_id):
                 return jsonify({'error': 'Task not found'}), 404
-            
-            conn.close()
+            reads.forget()
+            deadlines.cancel(task_id)
             
             return jsonify({'message': 'Task deleted successfully'}), 200
             
@@ -340,47 +439,152 @@ def task_detail(task_id):
 def task_stats(user_id):
     """Get task statistics for a user"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        include_archived = arg_flag('include_archived')
+        return coalesced_json(
+            ('stats', user_id, include_archived),
+            lambda: store.task_stats(user_id, datetime.now().isoformat(), include_archived=include_archived)
+        ), 200
         
-        cursor.execute('SELECT COUNT(*) as count FROM tasks WHERE user_id = ?', (user_id,))
-        total_tasks = cursor.fetchone()['count']
+    except Exception as e:
+        print(f"Stats error: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/tasks/analytics/<int:user_id>', methods=['GET'])
+def task_analytics(user_id):
+    """Completion trend, lead times, overdue aging and priorities for a user"""
+    try:
+        try:
+            days = int(request.args.get('days', 30))
+        except ValueError:
+            return jsonify({'error': 'days must be an integer'}), 400
+        if not 1 <= days <= app.config['ANALYTICS_MAX_DAYS']:
+            return jsonify({'error': f"days must be between 1 and {app.config['ANALYTICS_MAX_DAYS']}"}), 400
+        return coalesced_json(
+            ('analytics', user_id, days),
+            lambda: analytics.for_user(user_id, datetime.now(), days)
+        ), 200
         
-        cursor.execute('SELECT status, COUNT(*) as count FROM tasks WHERE user_id = ? GROUP BY status', (user_id,))
-        status_counts = cursor.fetchall()
+    except Exception as e:
+        print(f"Analytics error: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/dashboard/<int:user_id>', methods=['GET'])
+def dashboard(user_id):
+    """One page of tasks plus stats for a user, from one consistent read"""
+    try:
+        try:
+            limit = int(request.args.get('limit', app.config['DASHBOARD_PAGE_SIZE']))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'limit and offset must be integers'}), 400
+        if limit < 1 or offset < 0:
+            return jsonify({'error': 'limit must be positive and offset not negative'}), 400
+        limit = min(limit, app.config['DASHBOARD_MAX_PAGE_SIZE'])
+        include_archived = arg_flag('include_archived')
+        include_profile = arg_flag('include_profile')
         
-        by_status = {}
-        for row in status_counts:
-            by_status[row['status']] = row['count']
+        def load():
+            # One extra row tells us whether there is a next page
+            result = store.dashboard_json(user_id, datetime.now().isoformat(), limit + 1, offset,
+                                          include_archived=include_archived)
+            tasks_page = result['tasks']
+            body = {
+                'stats': result['stats'],
+                'page': {
+                    'limit': limit,
+                    'offset': offset,
+                    'next_offset': offset + limit if len(tasks_page) > limit else None
+                }
+            }
+            if include_profile:
+                body['profile'] = users.get_profile(user_id)
+            # Tasks arrive encoded by the database; splice them in ahead of the rest
+            return '{"tasks":[' + ','.join(tasks_page[:limit]) + '],' + app.json.dumps(body)[1:] + '\n'
         
-        cursor.execute('''
-            SELECT COUNT(*) as count FROM tasks 
-            WHERE user_id = ? AND due_date < ? AND status != 'completed'
-        ''', (user_id, datetime.now().isoformat()))
-        overdue_tasks = cursor.fetchone()['count']
+        key = ('dashboard', user_id, limit, offset, include_archived, include_profile)
+        return coalesced_json(key, load, encoded=True), 200
         
-        conn.close()
+    except Exception as e:
+        print(f"Dashboard error: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/admin/shards', methods=['GET'])
+def shard_status():
+    """Shard map, per-shard row counts and writer queue counters"""
+    try:
+        details = store.describe()
+        if 'shards' not in details:
+            return jsonify({'error': f"Storage backend '{store.backend}' is not sharded"}), 404
+        
+        return jsonify(details), 200
+        
+    except Exception as e:
+        print(f"Shard status error: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/admin/tasks/stats', methods=['GET'])
+def global_task_stats():
+    """Task statistics across all users (scatter-gather when sharded)"""
+    try:
+        return jsonify(store.global_stats()), 200
         
+    except Exception as e:
+        print(f"Global stats error: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/admin/backups', methods=['GET', 'POST'])
+def admin_backups():
+    """Backup progress and snapshot list (GET) or start a snapshot (POST)"""
+    if backups is None:
+        return jsonify({'error': f"Backups are not supported for '{store.backend}' storage"}), 404
+    
+    if request.method == 'POST':
+        try:
+            backups.start_snapshot()
+        except BackupInProgress:
+            return jsonify({'error': 'A backup is already running', 'status': backups.status()}), 409
+        return jsonify({'message': 'Backup started', 'status': backups.status()}), 202
+    
+    try:
         return jsonify({
-            'total_tasks': total_tasks,
-            'by_status': by_status,
-            'overdue_tasks': overdue_tasks
+            'status': backups.status(),
+            'snapshots': backups.list_snapshots()
         }), 200
-        
     except Exception as e:
-        print(f"Stats error: {str(e)}", file=sys.stderr)
+        print(f"Backup status error: {str(e)}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/admin/archive', methods=['GET', 'POST'])
+def admin_archive():
+    """Archiver status (GET) or start an archive run now (POST)"""
+    if request.method == 'POST':
+        if archiver.status()['state'] == 'running':
+            return jsonify({'error': 'Archiver is already running', 'status': archiver.status()}), 409
+        archiver.run_in_background()
+        return jsonify({'message': 'Archive run started', 'status': archiver.status()}), 202
+    
+    return jsonify(archiver.status()), 200
+
 # if __name__ == '__main__':
 #     print(f"Starting task service...", file=sys.stderr)
-#     print(f"Database path: {DATABASE}", file=sys.stderr)
+#     print(f"Database path: {app.config['DATABASE_PATH']}", file=sys.stderr)
 #     print(f"User service URL: {USER_SERVICE_URL}", file=sys.stderr)
 #     init_db()
 #     app.run(host='0.0.0.0', port=5002, debug=True)
 
 if __name__ == '__main__':
-    init_db()
+    # Serve /health and /ready at once; everything else waits for these phases
+    startup.start(
+        [('migrate', init_db), ('warm', warm_up)],
+        after_ready=[('preload', preload), ('background_jobs', start_background_jobs)],
+    )
+    shutdown.install()
     print(f"🚀 Task Service starting in {env} mode")
     print(f"📊 Database: {app.config['DATABASE_PATH']}")
     print(f"🔧 Debug: {app.config['DEBUG']}")
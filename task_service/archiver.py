@@ -0,0 +1,160 @@
+# task_service/archiver.py
+"""
+Background archival of completed tasks.
+
+Tasks whose status is 'completed' and whose last update (updated_at) is older
+than ARCHIVE_AFTER_DAYS are moved from `tasks` into `tasks_archive` in
+batches of ARCHIVE_BATCH_SIZE, pausing between batches so regular writes keep
+their latency. After a run the freed pages are handed back with an
+incremental VACUUM, so the hot table and its indexes stay small.
+
+Command line (run from the service directory):
+    python archiver.py run       # archive now
+    python archiver.py vacuum    # one-time switch of old SQLite files to incremental auto-vacuum
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class Archiver:
+    """Moves old completed tasks out of the hot table"""
+
+    def __init__(self, store, after_days=30, batch_size=500, batch_pause=0.05,
+                 vacuum_pages=2000):
+        self.store = store
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.total_archived = 0
+
+    @classmethod
+    def from_config(cls, config, store):
+        return cls(
+            store,
+            after_days=config['ARCHIVE_AFTER_DAYS'],
+            batch_size=config['ARCHIVE_BATCH_SIZE'],
+            batch_pause=config['ARCHIVE_BATCH_PAUSE'],
+            vacuum_pages=config['ARCHIVE_VACUUM_PAGES'],
+        )
+
+    def status(self):
+        return {
+            'state': 'running' if self._running else 'idle',
+            'after_days': self.after_days,
+            'batch_size': self.batch_size,
+            'total_archived': self.total_archived,
+            'last_run': self.last_run,
+        }
+
+    def run_once(self):
+        """Archive everything that is due, then reclaim space"""
+        with self._lock:
+            if self._running:
+                return None
+            self._running = True
+        started = time.monotonic()
+        now = datetime.now()
+        cutoff = (now - timedelta(days=self.after_days)).isoformat()
+        moved = batches = 0
+        try:
+            while not self._stop.is_set():
+                count = self.store.archive_completed(cutoff, self.batch_size, now.isoformat())
+                if count == 0:
+                    break
+                moved += count
+                batches += 1
+                self.total_archived += count
+                time.sleep(self.batch_pause)
+            pages = self.store.compact(self.vacuum_pages) if moved else 0
+            self.last_run = {
+                'ok': True,
+                'finished_at': datetime.now().isoformat(),
+                'cutoff': cutoff,
+                'archived': moved,
+                'batches': batches,
+                'pages_reclaimed': pages,
+                'seconds': round(time.monotonic() - started, 3),
+            }
+            if moved:
+                print(f"Archived {moved} task(s) in {batches} batch(es), "
+                      f"reclaimed {pages} page(s)", file=sys.stderr)
+            return self.last_run
+        except Exception as e:
+            self.last_run = {'ok': False, 'error': str(e), 'archived': moved,
+                             'finished_at': datetime.now().isoformat()}
+            print(f"ARCHIVER ERROR: {e}", file=sys.stderr)
+            return self.last_run
+        finally:
+            with self._lock:
+                self._running = False
+
+    def run_in_background(self):
+        thread = threading.Thread(target=self.run_once, name='archiver-run', daemon=True)
+        thread.start()
+        return thread
+
+    def start(self, interval):
+        """Run every `interval` seconds until stop()"""
+        if interval <= 0 or self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.run_once()
+
+        self._thread = threading.Thread(target=loop, name='archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=0.0):
+        """Stop the schedule; wait up to `timeout` seconds for a running pass to finish its batch"""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        while self._running and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+def convert_to_incremental_vacuum(database_paths):
+    """Rewrite SQLite files that were created without auto_vacuum=INCREMENTAL"""
+    for path in database_paths:
+        conn = sqlite3.connect(path, isolation_level=None, timeout=60)
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                print(f"{path}: already incremental")
+                continue
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            print(f"{path}: converted to incremental auto-vacuum")
+        finally:
+            conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive completed tasks')
+    parser.add_argument('command', choices=['run', 'vacuum'])
+    args = parser.parse_args(argv)
+
+    from app import archiver, init_db, store
+    init_db()
+    if args.command == 'run':
+        print(archiver.run_once())
+    elif store.backend != 'sqlite':
+        print(f"Nothing to convert for STORAGE_BACKEND={store.backend}", file=sys.stderr)
+        return 1
+    else:
+        convert_to_incremental_vacuum(shard.database_path for shard in store.router.shards)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
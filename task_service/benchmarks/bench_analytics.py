@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+bench_analytics.py - Latency of GET /api/tasks/analytics for one large user
+
+Usage:
+    python benchmarks/bench_analytics.py [--tasks 1000000] [--iterations 20]
+
+Fills one user with --tasks tasks (bulk inserted, bypassing the write queue),
+then reports:
+  cold      first request: one-query array load + NumPy metrics
+  cached    later requests: version check + NumPy metrics only
+  after write  the request after one task changed (full reload)
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analytics import TaskAnalytics  # noqa: E402
+from sharding import ShardRouter  # noqa: E402
+from storage.sqlite import SqliteTaskStore  # noqa: E402
+
+USER_ID = 1
+
+
+def make_store(tmp_dir):
+    router = ShardRouter([os.path.join(tmp_dir, 'tasks.db')],
+                         map_path=os.path.join(tmp_dir, 'shard_map.json'))
+    store = SqliteTaskStore(router)
+    store.init_schema()
+    return store
+
+
+def bulk_fill(path, count, now):
+    rng = random.Random(42)
+    rows = []
+    # Oldest first, as the service inserts them (rowid order follows created_at)
+    minutes_ago = sorted((rng.randrange(0, 365 * 24 * 60) for _ in range(count)), reverse=True)
+    for i in range(count):
+        created = now - timedelta(minutes=minutes_ago[i])
+        done = rng.random() < 0.6
+        updated = created + timedelta(minutes=rng.randrange(1, 14 * 24 * 60)) if done else created
+        due = (created + timedelta(days=rng.randrange(1, 30))).isoformat() if rng.random() < 0.7 else None
+        rows.append((USER_ID, f'Task {i}', '', ('low', 'medium', 'high')[i % 3],
+                     'completed' if done else 'pending', due,
+                     created.isoformat(), updated.isoformat()))
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            'INSERT INTO tasks (user_id, title, description, priority, status, due_date, '
+            'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+        )
+    conn.close()
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tasks', type=int, default=1000000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(tmp)
+        try:
+            print(f"filling {args.tasks} tasks...", file=sys.stderr)
+            bulk_fill(os.path.join(tmp, 'tasks.db'), args.tasks, now)
+            analytics = TaskAnalytics(store, max_cached_tasks=args.tasks * 2)
+
+            cold = analytics.for_user(USER_ID, now)['timings_ms']
+            cached = [timed(lambda: analytics.for_user(USER_ID, now)) for _ in range(args.iterations)]
+            task_id = store.list_tasks_columns(USER_ID)['columns']['id'][0]
+            store.update_task(task_id, {'status': 'completed', 'updated_at': now.isoformat()})
+            after_write = analytics.for_user(USER_ID, now)['timings_ms']
+
+            print(f"{'request':<12} {'load ms':>9} {'compute ms':>11} {'total ms':>9}")
+            print(f"{'cold':<12} {cold['load']:>9.0f} {cold['compute']:>11.1f} "
+                  f"{cold['load'] + cold['compute']:>9.0f}")
+            print(f"{'cached':<12} {'-':>9} {'-':>11} {statistics.median(cached):>9.1f}  (median)")
+            print(f"{'after write':<12} {after_write['load']:>9.0f} {after_write['compute']:>11.1f} "
+                  f"{after_write['load'] + after_write['compute']:>9.0f}")
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+bench_serialization.py - CPU per request and bytes on the wire for task lists
+
+Usage:
+    python benchmarks/bench_serialization.py [--sizes 10,100,1000] [--iterations 300]
+
+Compares three ways of producing the GET /api/tasks body for one user:
+  before    list_tasks() dicts + Flask's default json encoder (sorted keys)
+  orjson    list_tasks() dicts + FastJSONProvider
+  direct    list_tasks_json(): rows encoded by SQLite, no per-row dicts
+and reports the response size uncompressed, with gzip and (if installed) brotli.
+
+A second table compares the row format with the columnar format
+(Accept: application/vnd.tasks.columnar+json) for one large list: bytes on
+the wire and the time a client needs to parse the body.
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from serialization import FastJSONProvider, brotli, orjson  # noqa: E402
+from sharding import ShardRouter  # noqa: E402
+from storage.sqlite import SqliteTaskStore  # noqa: E402
+
+
+def make_store(tmp_dir):
+    router = ShardRouter([os.path.join(tmp_dir, 'tasks.db')],
+                         map_path=os.path.join(tmp_dir, 'shard_map.json'))
+    store = SqliteTaskStore(router)
+    store.init_schema()
+    return store
+
+
+def fill(store, user_id, count):
+    for i in range(count):
+        store.create_task({
+            'user_id': user_id, 'title': f'Task number {i}',
+            'description': 'Follow up with the team about the release notes',
+            'priority': ('low', 'medium', 'high')[i % 3],
+            'status': ('pending', 'in_progress', 'completed')[i % 3],
+            'due_date': '2025-03-01', 'created_at': f'2025-01-01T00:00:{i % 60:02d}',
+            'updated_at': '2025-01-02T00:00:00',
+        })
+
+
+def cpu_per_call(fn, iterations):
+    fn()  # warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='10,100,1000')
+    parser.add_argument('--iterations', type=int, default=300)
+    parser.add_argument('--columnar-rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default_json = DefaultJSONProvider(app)
+    fast_json = FastJSONProvider(app)
+    if orjson is None:
+        print("orjson is not installed: the 'orjson' column falls back to the default encoder")
+
+    print(f"{'tasks':>6} {'before us':>10} {'orjson us':>10} {'direct us':>10} "
+          f"{'raw B':>9} {'gzip B':>8} {'br B':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(tmp)
+        try:
+            for user_id, size in enumerate(int(s) for s in args.sizes.split(',')):
+                fill(store, user_id, size)
+                paths = {
+                    'before': lambda: default_json.dumps({'tasks': store.list_tasks(user_id)}),
+                    'orjson': lambda: fast_json.dumps({'tasks': store.list_tasks(user_id)}),
+                    'direct': lambda: '{"tasks":' + store.list_tasks_json(user_id) + '}',
+                }
+                cpu = {name: cpu_per_call(fn, args.iterations) * 1e6 for name, fn in paths.items()}
+
+                body = paths['direct']().encode()
+                gzipped = len(gzip.compress(body, compresslevel=5))
+                brotlied = len(brotli.compress(body, quality=4)) if brotli is not None else '-'
+                print(f"{size:>6} {cpu['before']:>10.0f} {cpu['orjson']:>10.0f} {cpu['direct']:>10.0f} "
+                      f"{len(body):>9} {gzipped:>8} {brotlied:>8}")
+
+            user_id += 1
+            fill(store, user_id, args.columnar_rows)
+            formats = {
+                'rows': lambda: '{"tasks":' + store.list_tasks_json(user_id) + '}',
+                'columnar': lambda: fast_json.dumps(store.list_tasks_columns(user_id)),
+            }
+            print()
+            print(f"{args.columnar_rows} tasks")
+            print(f"{'format':<10} {'encode ms':>10} {'parse ms':>9} {'raw B':>9} {'gzip B':>8}")
+            for name, fn in formats.items():
+                encode = cpu_per_call(fn, max(1, args.iterations // 30)) * 1000
+                body = fn()
+                parse = cpu_per_call(lambda: json.loads(body), max(1, args.iterations // 30)) * 1000
+                encoded = body.encode()
+                print(f"{name:<10} {encode:>10.1f} {parse:>9.1f} {len(encoded):>9} "
+                      f"{len(gzip.compress(encoded, compresslevel=5)):>8}")
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+bench_storage.py - Compare task storage backends under concurrent load
+
+Usage:
+    python benchmarks/bench_storage.py [--threads 16] [--ops 4000]
+    TEST_POSTGRES_DSN=postgresql://localhost/tasks_bench python benchmarks/bench_storage.py
+
+Every worker thread runs the same mix as the frontend: mostly list/stats
+reads with one create and one update per five operations. SQLite always runs;
+PostgreSQL runs when TEST_POSTGRES_DSN is set.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sharding import ShardRouter  # noqa: E402
+from storage.sqlite import SqliteTaskStore  # noqa: E402
+
+
+def sqlite_store(tmp_dir, shards):
+    router = ShardRouter(
+        [os.path.join(tmp_dir, f'tasks-{i}.db') for i in range(shards)],
+        map_path=os.path.join(tmp_dir, 'shard_map.json'),
+    )
+    return SqliteTaskStore(router)
+
+
+def postgres_store(dsn):
+    from storage.postgres import PostgresTaskStore
+    store = PostgresTaskStore(dsn, pool_size=16)
+    store.init_schema()
+    with store.pool.connection() as conn:
+        conn.execute('TRUNCATE tasks RESTART IDENTITY')
+    return store
+
+
+def run_mix(store, threads, ops, users=200):
+    now = '2025-01-01T00:00:00'
+
+    def op(i):
+        user_id = i % users
+        started = time.perf_counter()
+        kind = i % 5
+        if kind == 0:
+            store.create_task({
+                'user_id': user_id, 'title': f'task {i}', 'description': '',
+                'priority': 'medium', 'status': 'pending', 'due_date': None,
+                'created_at': now, 'updated_at': now,
+            })
+        elif kind == 1:
+            tasks = store.list_tasks(user_id)
+            if tasks:
+                store.update_task(tasks[0]['id'], {'status': 'completed', 'updated_at': now})
+        elif kind == 2:
+            store.task_stats(user_id, now)
+        else:
+            store.list_tasks(user_id)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(op, range(ops)))
+    elapsed = time.perf_counter() - started
+    return {
+        'ops_per_sec': ops / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=4000)
+    parser.add_argument('--shards', type=int, default=1)
+    args = parser.parse_args()
+
+    backends = [('sqlite', lambda tmp: sqlite_store(tmp, args.shards))]
+    if os.getenv('TEST_POSTGRES_DSN'):
+        backends.append(('postgres', lambda tmp: postgres_store(os.environ['TEST_POSTGRES_DSN'])))
+
+    print(f"{'backend':<10} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, factory in backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = factory(tmp)
+            store.init_schema()
+            try:
+                result = run_mix(store, args.threads, args.ops)
+            finally:
+                store.close()
+        print(f"{name:<10} {result['ops_per_sec']:>10.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
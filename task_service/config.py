@@ -12,6 +12,57 @@ class Config:
     # Database Settings
     DATABASE_PATH = os.getenv('DATABASE', './data/tasks.db')
     
+    # Storage Backend ('sqlite' or 'postgres')
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+    POSTGRES_DSN = os.getenv('POSTGRES_DSN', '')
+    POSTGRES_POOL_SIZE = int(os.getenv('POSTGRES_POOL_SIZE', 10))
+    
+    # Write Queue Settings (group commit)
+    WRITE_BATCH_WINDOW_MS = float(os.getenv('WRITE_BATCH_WINDOW_MS', 2))
+    WRITE_BATCH_MAX = int(os.getenv('WRITE_BATCH_MAX', 256))
+    WRITE_TIMEOUT = float(os.getenv('WRITE_TIMEOUT', 10))
+    
+    # Identical concurrent GETs share one query (see singleflight.py)
+    COALESCE_READS = os.getenv('COALESCE_READS', 'True').lower() == 'true'
+    
+    # Response Compression (see serialization.py)
+    COMPRESS_RESPONSES = os.getenv('COMPRESS_RESPONSES', 'True').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # bytes
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 5))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+    
+    # Sharding Settings (comma-separated shard files, routed by user_id)
+    TASK_SHARDS = os.getenv('TASK_SHARDS', DATABASE_PATH).split(',')
+    SHARD_BUCKETS = int(os.getenv('SHARD_BUCKETS', 64))
+    SHARD_MAP_PATH = os.getenv('SHARD_MAP_PATH', str(Path(DATABASE_PATH).parent / 'shard_map.json'))
+    SHARD_POOL_SIZE = int(os.getenv('SHARD_POOL_SIZE', 4))
+    SHARD_MAP_RELOAD = float(os.getenv('SHARD_MAP_RELOAD', 1))
+    
+    # Backup Settings (online snapshots, see backup.py)
+    BACKUP_DIR = os.getenv('BACKUP_DIR', str(Path(DATABASE_PATH).parent / 'backups'))
+    BACKUP_INTERVAL = int(os.getenv('BACKUP_INTERVAL', 6 * 3600))  # seconds, 0 = off
+    BACKUP_RETENTION = int(os.getenv('BACKUP_RETENTION', 7))
+    
+    # Archive Settings (completed tasks move to tasks_archive, see archiver.py)
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30))
+    ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', 3600))  # seconds, 0 = off
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', 0.05))
+    ARCHIVE_VACUUM_PAGES = int(os.getenv('ARCHIVE_VACUUM_PAGES', 2000))
+    
+    # Admission Control (rate limits and load shedding, see admission.py)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # 'memory' or 'sqlite'
+    RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', str(Path(DATABASE_PATH).parent / 'ratelimit.db'))
+    RATE_LIMIT_READ_PER_SEC = float(os.getenv('RATE_LIMIT_READ_PER_SEC', 20))
+    RATE_LIMIT_READ_BURST = int(os.getenv('RATE_LIMIT_READ_BURST', 40))
+    RATE_LIMIT_WRITE_PER_SEC = float(os.getenv('RATE_LIMIT_WRITE_PER_SEC', 5))
+    RATE_LIMIT_WRITE_BURST = int(os.getenv('RATE_LIMIT_WRITE_BURST', 10))
+    # Proxies (addresses or CIDRs) whose X-Forwarded-For names the client
+    RATE_LIMIT_TRUSTED_PROXIES = [p.strip() for p in os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '').split(',') if p.strip()]
+    MAX_INFLIGHT_WRITES = int(os.getenv('MAX_INFLIGHT_WRITES', 64))
+    WRITE_QUEUE_SHED_THRESHOLD = int(os.getenv('WRITE_QUEUE_SHED_THRESHOLD', 1024))  # queued writes per shard
+    
     # Server Settings
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 6002))
@@ -21,6 +72,35 @@ class Config:
     
     # External Services
     USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', 'http://localhost:5001')
+    PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', 60))  # seconds
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+    
+    # Dashboard Settings (GET /api/dashboard/<user_id>)
+    DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', 100))
+    DASHBOARD_MAX_PAGE_SIZE = int(os.getenv('DASHBOARD_MAX_PAGE_SIZE', 1000))
+    
+    # Idempotency Settings (Idempotency-Key on POST /api/tasks, see idempotency.py)
+    IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', 'True').lower() == 'true'
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))  # seconds a key is remembered
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 30))
+    IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', 600))  # seconds, 0 = off
+    
+    # Analytics Settings (GET /api/tasks/analytics/<user_id>)
+    ANALYTICS_CACHE_TASKS = int(os.getenv('ANALYTICS_CACHE_TASKS', 2000000))  # tasks kept as arrays
+    ANALYTICS_MAX_DAYS = int(os.getenv('ANALYTICS_MAX_DAYS', 365))
+    
+    # Deadline Settings (overdue flags and reminders, see deadlines.py)
+    DEADLINES_ENABLED = os.getenv('DEADLINES_ENABLED', 'True').lower() == 'true'
+    DEADLINE_WINDOW = int(os.getenv('DEADLINE_WINDOW', 3600))  # seconds of deadlines read ahead
+    DEADLINE_BATCH = int(os.getenv('DEADLINE_BATCH', 10000))  # deadlines per index page
+    REMINDER_LEAD_TIME = int(os.getenv('REMINDER_LEAD_TIME', 3600))  # seconds before due, 0 = off
+    
+    # Startup Settings (readiness pipeline, see startup.py)
+    STARTUP_WARM_ROWS = int(os.getenv('STARTUP_WARM_ROWS', 100000))  # index entries read per shard, 0 = off
+    
+    # Shutdown Settings (SIGTERM draining, see shutdown.py)
+    SHUTDOWN_READINESS_DELAY = float(os.getenv('SHUTDOWN_READINESS_DELAY', 3))  # seconds unready before draining
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 20))  # seconds to wait for in-flight requests
     
     @staticmethod
     def init_app(app):
@@ -55,6 +135,11 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     DATABASE_PATH = ':memory:'
+    TASK_SHARDS = [':memory:']
+    SHARD_MAP_PATH = None
+    BACKUP_INTERVAL = 0
+    ARCHIVE_INTERVAL = 0
+    RATE_LIMIT_ENABLED = False
     USER_SERVICE_URL = 'http://localhost:6001'  # Mock service in tests
 
 
@@ -0,0 +1,250 @@
+# task_service/deadlines.py
+"""
+Overdue transitions and due-date reminders.
+
+Tasks carry an `overdue` flag stored with the row. A write that lands after
+the due date sets it right away (database triggers, see storage/). For every
+other open task, this scheduler sets the flag when its due_date passes, and
+sends a reminder event REMINDER_LEAD_TIME seconds before that. task_stats()
+and the dashboard then add up flags instead of comparing every due_date with
+the clock. Both kinds of event go to the on_event() listeners; app.py logs
+each as a JSON line ({"event": "deadline", "type": "reminder", ...}) on
+stderr, for whatever ships the logs to alert on.
+
+Only the next stretch of deadlines is kept in memory. That is at most
+DEADLINE_BATCH of them, due within DEADLINE_WINDOW seconds plus the reminder
+lead, read in due_date order from a partial index that holds only open,
+unflagged tasks. They sit in a heap. One thread sleeps until the earliest
+entry, then flags everything that is due with one write per shard. When the
+heap runs low, the next page is read from the index. Far-off deadlines cost
+nothing until they come close, and no pass ever scans the table.
+
+The routes keep the heap current:
+- schedule() pushes a created task, or a changed due_date or status, if it
+  falls inside the loaded stretch. Anything beyond it is found in the index
+  later.
+- cancel() drops a deleted task.
+
+Writes made elsewhere (another process, shard moves) are picked up when the
+stretch is read again, every DEADLINE_WINDOW seconds. Flagging re-checks
+status and due_date in the database, so a stale entry never flags a task
+that is not overdue.
+
+Reminders are best effort. Each is sent at most once per process, and ones
+whose time passed while the scheduler was not running are skipped. They can
+also come late when more than DEADLINE_BATCH deadlines fall inside the
+window. Overdue transitions are never skipped: the first pass after a start
+flags whatever came due in the meantime.
+"""
+import heapq
+import sys
+import threading
+from datetime import datetime, timedelta
+
+OVERDUE = 'overdue'
+REMINDER = 'reminder'
+
+# Seconds before reading the index again after a failed pass
+RETRY_DELAY = 5.0
+
+
+def due_at(due_date):
+    """
+    due_date string -> naive datetime, or None if unparsable. Offsets are
+    dropped, so the result orders like the strings the queries compare.
+    """
+    try:
+        return datetime.fromisoformat(due_date).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+class DeadlineScheduler:
+    """Heap of upcoming due dates; flags tasks overdue and sends reminders"""
+
+    def __init__(self, store, window=3600, batch=10000, reminder_lead=3600, enabled=True):
+        self.store = store
+        self.window = timedelta(seconds=window)
+        self.batch = batch
+        self.reminder_lead = timedelta(seconds=reminder_lead)
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._heap = []  # (fire_at, task_id, kind, due_date, user_id)
+        self._entries = {}  # task_id -> (due_date, user_id) while scheduled
+        self._cursor = None  # (due_date, id): everything up to it is loaded
+        self._more = False  # the last page was full; the index has more before its bound
+        self._resync_at = None
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {'flagged': 0, 'reminders': 0, 'loaded': 0, 'pages': 0, 'errors': 0}
+
+    @classmethod
+    def from_config(cls, config, store):
+        return cls(
+            store,
+            window=config['DEADLINE_WINDOW'],
+            batch=config['DEADLINE_BATCH'],
+            reminder_lead=config['REMINDER_LEAD_TIME'],
+            enabled=config['DEADLINES_ENABLED'],
+        )
+
+    def on_event(self, fn):
+        """Call fn({'type', 'task_id', 'user_id', 'due_date'}) for each overdue transition and reminder"""
+        self._listeners.append(fn)
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._stop.is_set()
+
+    # ------------------------------------------------------------------
+    # Route hooks
+    # ------------------------------------------------------------------
+    def schedule(self, task_id, user_id, due_date, status):
+        """A task was created or its due_date/status changed"""
+        with self._lock:
+            self._entries.pop(task_id, None)
+            # Only strings compare with the cursor; anything else is never due
+            if (status == 'completed' or not isinstance(due_date, str) or not due_date
+                    or self._cursor is None or (due_date, task_id) > self._cursor):
+                return
+            earliest = self._heap[0][0] if self._heap else None
+            self._push(task_id, user_id, due_date, datetime.now())
+            if self._heap and (earliest is None or self._heap[0][0] < earliest):
+                self._wake.notify()
+
+    def cancel(self, task_id):
+        """A task was deleted"""
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+    def _push(self, task_id, user_id, due_date, now):
+        fire_at = due_at(due_date)
+        if fire_at is None:
+            return
+        self._entries[task_id] = (due_date, user_id)
+        heapq.heappush(self._heap, (fire_at, task_id, OVERDUE, due_date, user_id))
+        remind_at = fire_at - self.reminder_lead
+        if self.reminder_lead and remind_at > now:
+            heapq.heappush(self._heap, (remind_at, task_id, REMINDER, due_date, user_id))
+
+    def _load(self, now):
+        """Read the next page of deadlines from the index into the heap"""
+        before = (now + self.window + self.reminder_lead).isoformat()
+        rows = self.store.pending_deadlines(before, after=self._cursor, limit=self.batch)
+        for due_date, task_id, user_id in rows:
+            if task_id not in self._entries:
+                self._push(task_id, user_id, due_date, now)
+        self._more = len(rows) == self.batch
+        # A short page means everything due before `before` is loaded
+        self._cursor = rows[-1][:2] if self._more else (before, 0)
+        self.counters['loaded'] += len(rows)
+        self.counters['pages'] += 1
+
+    def run_pending(self, now=None):
+        """
+        Flag and remind whatever is due at `now`, loading deadlines as
+        needed; return seconds until the next entry or reload
+        """
+        now = now or datetime.now()
+        with self._lock:
+            if self._resync_at is None or now >= self._resync_at:
+                # Start over from the index: picks up writes made elsewhere
+                # and drops cancelled entries
+                self._heap, self._entries, self._cursor = [], {}, None
+                self._resync_at = now + self.window
+                self._load(now)
+            elif self._more and len(self._entries) < self.batch // 2:
+                self._load(now)
+
+            overdue, reminders = [], []
+            while self._heap and self._heap[0][0] <= now:
+                _, task_id, kind, due_date, user_id = heapq.heappop(self._heap)
+                if self._entries.get(task_id) != (due_date, user_id):
+                    continue  # rescheduled or cancelled since
+                if kind == OVERDUE:
+                    del self._entries[task_id]
+                    overdue.append((task_id, user_id, due_date))
+                else:
+                    reminders.append((task_id, user_id, due_date))
+
+        flagged = set()
+        if overdue:
+            try:
+                flagged.update(self.store.mark_overdue([t[:2] for t in overdue], now.isoformat()))
+            except Exception as e:
+                # The tasks are still unflagged in the index; read it again soon
+                with self._lock:
+                    self.counters['errors'] += 1
+                    self._resync_at = now + timedelta(seconds=RETRY_DELAY)
+                print(f"Deadline scheduler could not flag {len(overdue)} task(s): {e}", file=sys.stderr)
+
+        events = [(REMINDER, task) for task in reminders]
+        events += [(OVERDUE, task) for task in overdue if task[0] in flagged]
+        self._emit(events)
+        if events:
+            print(f"Deadlines: {len(flagged)} task(s) overdue, {len(reminders)} reminder(s)",
+                  file=sys.stderr)
+
+        with self._lock:
+            self.counters['flagged'] += len(flagged)
+            self.counters['reminders'] += len(reminders)
+            if self._more and len(self._entries) < self.batch // 2:
+                return 0.0
+            wake_at = min(self._heap[0][0], self._resync_at) if self._heap else self._resync_at
+        return max((wake_at - now).total_seconds(), 0.0)
+
+    def _emit(self, events):
+        for kind, (task_id, user_id, due_date) in events:
+            event = {'type': kind, 'task_id': task_id, 'user_id': user_id, 'due_date': due_date}
+            for listener in self._listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    print(f"Deadline listener failed: {e}", file=sys.stderr)
+
+    # ------------------------------------------------------------------
+    # Background thread
+    # ------------------------------------------------------------------
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    wait = self.run_pending()
+                except Exception as e:
+                    with self._lock:
+                        self.counters['errors'] += 1
+                    print(f"DEADLINE SCHEDULER ERROR: {e}", file=sys.stderr)
+                    wait = RETRY_DELAY
+                with self._wake:
+                    if not self._stop.is_set():
+                        self._wake.wait(wait)
+
+        self._thread = threading.Thread(target=loop, name='deadlines', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=0.0):
+        """Stop the thread; wait up to `timeout` seconds for a running pass"""
+        self._stop.set()
+        with self._wake:
+            self._wake.notify()
+        if self._thread is not None and timeout:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self.counters,
+                enabled=self.enabled,
+                running=self.running,
+                scheduled=len(self._entries),
+                loaded_until=self._cursor[0] if self._cursor else None,
+            )
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+shard_tool.py - Inspect and rebalance task shards while the service runs
+
+Usage:
+    python shard_tool.py status
+    python shard_tool.py move-user <user_id> <shard>
+    python shard_tool.py move-bucket <bucket> <shard>
+    python shard_tool.py split <source_shard> <new_database_path>
+    python shard_tool.py rebalance
+
+Moves copy the rows to the target shard, publish the new shard map, wait two
+SHARD_MAP_RELOAD intervals for running services to pick it up, bring over
+writes that still reached the source, and only then delete from the source.
+No restart is needed.
+"""
+import argparse
+import sqlite3
+import sys
+
+from app import store, init_db
+from sharding import move_bucket, move_user
+
+
+router = getattr(store, 'router', None)
+
+
+def cmd_status(args):
+    for shard in router.shards:
+        with sqlite3.connect(shard.database_path) as conn:
+            tasks, users = conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT user_id) FROM tasks'
+            ).fetchone()
+        buckets = router.map.buckets.count(shard.index)
+        print(f"shard {shard.index}: {shard.database_path}  "
+              f"buckets={buckets} users={users} tasks={tasks}")
+    print(f"map version {router.map.version}, {len(router.map.users)} user override(s)")
+
+
+def cmd_move_user(args):
+    moved = move_user(router, args.user_id, args.shard)
+    print(f"Moved {moved} task(s) of user {args.user_id} to shard {args.shard}")
+
+
+def cmd_move_bucket(args):
+    moved = move_bucket(router, args.bucket, args.shard)
+    print(f"Moved bucket {args.bucket} ({moved} task(s)) to shard {args.shard}")
+
+
+def cmd_split(args):
+    """Add a new shard file and hand it half of the source shard's buckets"""
+    # Tables first: once the map lists the file, every process scatters reads to it
+    shard = router.open_shard(args.path)
+    store.init_shard(shard)
+    router.map.shards.append(args.path)
+    router.save_map()
+    router.refresh(force=True)
+    target = shard.index
+    owned = [b for b, s in enumerate(router.map.buckets) if s == args.source]
+    for bucket in owned[len(owned) // 2:]:
+        moved = move_bucket(router, bucket, target)
+        print(f"  bucket {bucket} -> shard {target} ({moved} task(s))")
+    print(f"Split shard {args.source}; new shard {target} at {args.path}")
+
+
+def cmd_rebalance(args):
+    """Even out bucket ownership across shards"""
+    counts = {shard.index: router.map.buckets.count(shard.index) for shard in router.shards}
+    target = len(router.map.buckets) // len(counts)
+    for bucket, owner in enumerate(list(router.map.buckets)):
+        if counts[owner] <= target:
+            continue
+        receiver = min(counts, key=counts.get)
+        if counts[receiver] >= target:
+            break
+        moved = move_bucket(router, bucket, receiver)
+        counts[owner] -= 1
+        counts[receiver] += 1
+        print(f"  bucket {bucket}: shard {owner} -> {receiver} ({moved} task(s))")
+    print("Rebalance complete")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Task shard maintenance')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('status').set_defaults(func=cmd_status)
+
+    p = sub.add_parser('move-user')
+    p.add_argument('user_id', type=int)
+    p.add_argument('shard', type=int)
+    p.set_defaults(func=cmd_move_user)
+
+    p = sub.add_parser('move-bucket')
+    p.add_argument('bucket', type=int)
+    p.add_argument('shard', type=int)
+    p.set_defaults(func=cmd_move_bucket)
+
+    p = sub.add_parser('split')
+    p.add_argument('source', type=int)
+    p.add_argument('path')
+    p.set_defaults(func=cmd_split)
+
+    sub.add_parser('rebalance').set_defaults(func=cmd_rebalance)
+
+    args = parser.parse_args(argv)
+    if store.backend != 'sqlite':
+        print(f"STORAGE_BACKEND={store.backend} is not sharded", file=sys.stderr)
+        return 1
+    if router.map_path is None:
+        print("SHARD_MAP_PATH is not set; nothing to rebalance", file=sys.stderr)
+        return 1
+    init_db()
+    args.func(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,562 @@
+# task_service/sharding.py
+"""
+Hash-sharded task storage across multiple SQLite files.
+
+Tasks are routed by user_id:
+
+    user_id --crc32--> bucket (0..SHARD_BUCKETS-1) --shard map--> shard index
+
+The shard map is a small JSON document (SHARD_MAP_PATH) listing the shard
+files, the owner shard of every bucket and per-user overrides. Moving a
+bucket or a single user only edits the map, so the hash itself never changes
+when shards are added. Every process re-reads the map when the file changes,
+which is how a move done by `shard_tool.py` reaches all replicas online.
+
+Each shard has its own read connection pool and its own WriteQueue, so the
+SQLite writer lock is per file instead of global.
+
+Task ids stay globally unique: every shard allocates ids from its own range
+(`index * SHARD_ID_SPAN + n`) using a counter in the `shard_meta` table, and
+moved tasks keep their ids. Lookups by id try the shard that owns the id
+range first and fall back to the other shards.
+
+A shard path of ':memory:' (TestingConfig) becomes a private in-memory
+database opened through a shared-cache URI, so the read pool and the writer
+see the same data. The Shard keeps one extra connection open so the
+database lives as long as the Shard does. Shared-cache connections use table
+locks that fail at once instead of waiting, so an in-memory shard gives its
+pool and its writer one lock: a read never overlaps a write batch, and
+readers only ever see committed rows.
+"""
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from write_queue import WriteQueue
+
+SHARD_ID_SPAN = 2 ** 40
+
+MEMORY_PATH = ':memory:'
+
+_memory_databases = itertools.count(1)
+
+
+def memory_database_uri(label):
+    """URI of a new in-memory database shared by all connections in this process"""
+    return f'file:{label}-{os.getpid()}-{next(_memory_databases)}?mode=memory&cache=shared'
+
+
+def is_uri(path):
+    return path.startswith('file:')
+
+
+TASK_COLUMNS = ('id', 'user_id', 'title', 'description', 'priority', 'status',
+                'due_date', 'created_at', 'updated_at', 'version')
+
+_LOCATE_TASK = {table: f'SELECT {", ".join(TASK_COLUMNS)} FROM {table} WHERE id = ?'
+                for table in ('tasks', 'tasks_archive')}
+
+
+def bucket_for(user_id, bucket_count):
+    """Stable bucket for a user id (same value in every process)"""
+    return zlib.crc32(str(int(user_id)).encode()) % bucket_count
+
+
+class ShardMap:
+    """Bucket -> shard assignments plus per-user overrides"""
+
+    def __init__(self, shards, buckets, users=None, version=1):
+        self.shards = list(shards)
+        self.buckets = list(buckets)
+        self.users = {int(k): int(v) for k, v in (users or {}).items()}
+        self.version = version
+
+    @classmethod
+    def default(cls, shards, bucket_count):
+        """Spread buckets round-robin over the configured shards"""
+        return cls(shards, [i % len(shards) for i in range(bucket_count)])
+
+    @classmethod
+    def load(cls, path, shards, bucket_count):
+        """Load the map from disk or build the default one"""
+        if path and os.path.exists(path):
+            with open(path) as f:
+                doc = json.load(f)
+            return cls(doc['shards'], doc['buckets'], doc.get('users'), doc.get('version', 1))
+        return cls.default(shards, bucket_count)
+
+    def save(self, path):
+        """Atomically write the map so readers never see a partial file"""
+        self.version += 1
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'shards': self.shards,
+            'buckets': self.buckets,
+            'users': {str(k): v for k, v in sorted(self.users.items())},
+        }
+
+    def bucket_for(self, user_id):
+        return bucket_for(user_id, len(self.buckets))
+
+    def shard_for(self, user_id):
+        """Index of the shard that owns this user's tasks"""
+        user_id = int(user_id)
+        if user_id in self.users:
+            return self.users[user_id]
+        return self.buckets[self.bucket_for(user_id)]
+
+
+class ConnectionPool:
+    """Small pool of read connections to one SQLite file"""
+
+    def __init__(self, database_path, size=4, busy_timeout=5.0, lock=None):
+        self.database_path = database_path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.lock = lock  # held around every connection() block when set
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, timeout=self.busy_timeout,
+                               check_same_thread=False, uri=is_uri(self.database_path))
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def fill(self):
+        """Open connections until the pool is at its size"""
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            self._idle.put(self._connect())
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        with self.lock or nullcontext():
+            conn = self.acquire()
+            try:
+                yield conn
+            finally:
+                self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+class Shard:
+    """One SQLite file: read pool + writer queue + id range"""
+
+    def __init__(self, index, database_path, pool_size=4, batch_window=0.002,
+                 max_batch=256):
+        self.index = index
+        self.in_memory = database_path == MEMORY_PATH
+        self._keeper = None
+        lock = None
+        if self.in_memory:
+            database_path = memory_database_uri(f'tasks-shard{index}')
+            self._keeper = sqlite3.connect(database_path, uri=True, check_same_thread=False)
+            # Reentrant: a scatter on one thread may nest reads of the same shard
+            lock = threading.RLock()
+        self.database_path = database_path
+        self.id_base = index * SHARD_ID_SPAN
+        self.pool = ConnectionPool(database_path, size=pool_size, lock=lock)
+        self.writer = WriteQueue(database_path, batch_window=batch_window,
+                                 max_batch=max_batch, name=f'sqlite-writer-{index}',
+                                 lock=lock)
+
+    def ensure_meta(self, conn):
+        """Create shard bookkeeping and seed the id counter for this shard"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS shard_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        # Existing single-file databases keep counting from their current max id
+        row = conn.execute(
+            'SELECT MAX(id) FROM tasks WHERE id >= ? AND id < ?',
+            (self.id_base, self.id_base + SHARD_ID_SPAN)
+        ).fetchone()
+        start = max(self.id_base, row[0] or 0)
+        # Legacy AUTOINCREMENT databases may have handed out higher ids before
+        has_sequence = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'"
+        ).fetchone()
+        if has_sequence:
+            seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+            if seq and self.owns_id(seq[0]):
+                start = max(start, seq[0])
+        conn.execute(
+            "INSERT OR IGNORE INTO shard_meta (key, value) VALUES ('next_task_id', ?)",
+            (start,)
+        )
+
+    @staticmethod
+    def allocate_task_id(cursor):
+        """Reserve the next task id; must run inside a writer command"""
+        cursor.execute("UPDATE shard_meta SET value = value + 1 WHERE key = 'next_task_id'")
+        return cursor.execute("SELECT value FROM shard_meta WHERE key = 'next_task_id'").fetchone()[0]
+
+    def owns_id(self, task_id):
+        return self.id_base <= task_id < self.id_base + SHARD_ID_SPAN
+
+    def close(self):
+        self.writer.stop()
+        self.pool.close()
+        if self._keeper is not None:
+            self._keeper.close()  # drops the in-memory database
+            self._keeper = None
+
+
+class ShardRouter:
+    """Routes task storage calls to shards by user_id"""
+
+    def __init__(self, shard_paths, bucket_count=64, map_path=None, pool_size=4,
+                 batch_window=0.002, max_batch=256, reload_interval=1.0):
+        self.map_path = map_path
+        self.bucket_count = bucket_count
+        self.pool_size = pool_size
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._map_mtime = None
+        self._last_check = 0.0
+        self.shards = []
+        self.map = ShardMap.load(map_path, shard_paths, bucket_count)
+        self._map_mtime = self._stat_map()
+        self._sync_shards()
+        self._executor = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['TASK_SHARDS'],
+            bucket_count=config['SHARD_BUCKETS'],
+            map_path=config['SHARD_MAP_PATH'],
+            pool_size=config['SHARD_POOL_SIZE'],
+            batch_window=config['WRITE_BATCH_WINDOW_MS'] / 1000.0,
+            max_batch=config['WRITE_BATCH_MAX'],
+            reload_interval=config['SHARD_MAP_RELOAD'],
+        )
+
+    # ------------------------------------------------------------------
+    # Shard map handling
+    # ------------------------------------------------------------------
+    def _stat_map(self):
+        try:
+            return os.stat(self.map_path).st_mtime_ns if self.map_path else None
+        except FileNotFoundError:
+            return None
+
+    def _sync_shards(self):
+        """Open Shard objects for any shard files added to the map"""
+        for index in range(len(self.shards), len(self.map.shards)):
+            self.shards.append(self._open(index, self.map.shards[index]))
+
+    def _open(self, index, path):
+        return Shard(index, path, pool_size=self.pool_size, batch_window=self.batch_window,
+                     max_batch=self.max_batch)
+
+    def open_shard(self, path):
+        """
+        Open the next shard without listing it in the map (shard_tool.py
+        split): the caller creates its tables before publishing it, since
+        other processes scatter reads to every shard the map lists
+        """
+        with self._lock:
+            shard = self._open(len(self.shards), path)
+            self.shards.append(shard)
+        return shard
+
+    def refresh(self, force=False):
+        """Reload the shard map if another process changed it"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.reload_interval:
+            return
+        self._last_check = now
+        mtime = self._stat_map()
+        if mtime == self._map_mtime and not force:
+            return
+        with self._lock:
+            self.map = ShardMap.load(self.map_path, self.map.shards, self.bucket_count)
+            self._map_mtime = mtime
+            self._sync_shards()
+        print(f"Shard map reloaded (version {self.map.version})", file=sys.stderr)
+
+    def save_map(self):
+        """Persist the current map (used by the rebalance tooling)"""
+        with self._lock:
+            self.map.save(self.map_path)
+            self._map_mtime = self._stat_map()
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def for_user(self, user_id):
+        self.refresh()
+        return self.shards[self.map.shard_for(user_id)]
+
+    def candidates_for_id(self, task_id):
+        """Shards to probe for a task id, most likely first"""
+        self.refresh()
+        home = [s for s in self.shards if s.owns_id(task_id)]
+        return home + [s for s in self.shards if s not in home]
+
+    def locate_task(self, task_id, include_archived=False):
+        """Return (shard, row) for a task id, or (None, None)"""
+        tables = ('tasks', 'tasks_archive') if include_archived else ('tasks',)
+        for table in tables:
+            for shard in self.candidates_for_id(task_id):
+                with shard.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.row_factory = None
+                    row = cursor.execute(_LOCATE_TASK[table], (task_id,)).fetchone()
+                if row is not None:
+                    return shard, row
+        return None, None
+
+    def scatter(self, fn):
+        """Run fn(shard, conn) on every shard in parallel; results in shard order"""
+        self.refresh()
+        if len(self.shards) == 1:
+            shard = self.shards[0]
+            with shard.pool.connection() as conn:
+                return [fn(shard, conn)]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='scatter')
+
+        def run(shard):
+            with shard.pool.connection() as conn:
+                return fn(shard, conn)
+        return list(self._executor.map(run, self.shards))
+
+    def writer_stats(self):
+        return {str(s.index): s.writer.stats() for s in self.shards}
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+# ----------------------------------------------------------------------
+# Online moves (used by shard_tool.py)
+# ----------------------------------------------------------------------
+def _connect_rw(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+
+# Copied with the row so scheduler-set overdue flags survive the move
+_MOVE_COLUMNS = ', '.join(TASK_COLUMNS + ('overdue',))
+_ARCHIVE_COLUMNS = ', '.join(TASK_COLUMNS + ('archived_at',))
+_SYNC_COLUMNS = ', '.join(f'{c} = s.{c}' for c in TASK_COLUMNS[2:] + ('overdue',))
+
+
+@contextmanager
+def _attached(dst_path, src_path):
+    """
+    Write transaction on dst with src attached for reading. Every statement
+    writes dst alone, so the transaction stays atomic (SQLite does not make
+    a commit spanning two WAL files atomic).
+    """
+    dst = _connect_rw(dst_path)
+    try:
+        dst.execute('ATTACH DATABASE ? AS src', (src_path,))
+        try:
+            dst.execute('BEGIN IMMEDIATE')
+            yield dst
+            dst.execute('COMMIT')
+        finally:
+            if dst.in_transaction:
+                dst.execute('ROLLBACK')
+            dst.execute('DETACH DATABASE src')
+    finally:
+        dst.close()
+
+
+def _copy_user_rows(src_path, dst_path, user_id):
+    """
+    Copy one user's tasks and archived tasks from src to dst, replacing
+    whatever dst holds for the user (leftovers of an interrupted move; no
+    process routes the user to dst yet). Nothing is deleted from src.
+    Returns the ids copied.
+    """
+    with _attached(dst_path, src_path) as dst:
+        dst.execute('DELETE FROM main.tasks WHERE user_id = ?', (user_id,))
+        dst.execute('DELETE FROM main.tasks_archive WHERE user_id = ?', (user_id,))
+        dst.execute(f'INSERT INTO main.tasks ({_MOVE_COLUMNS}) '
+                    f'SELECT {_MOVE_COLUMNS} FROM src.tasks WHERE user_id = ?', (user_id,))
+        dst.execute(f'INSERT INTO main.tasks_archive ({_ARCHIVE_COLUMNS}) '
+                    f'SELECT {_ARCHIVE_COLUMNS} FROM src.tasks_archive WHERE user_id = ?', (user_id,))
+        return [row[0] for row in dst.execute('SELECT id FROM main.tasks WHERE user_id = ?', (user_id,))]
+
+
+def _catch_up_user_rows(src_path, dst_path, user_id, copied):
+    """
+    Bring over what processes still on the old map wrote to src after the
+    copy, without undoing writes already made on dst:
+    - tasks created in src since (ids not in `copied`) are added
+    - rows with a higher version in src replace the dst row
+    - copied tasks gone from src (deleted or archived there) are removed
+    - archived tasks are added if missing
+    Returns how many tasks were added or changed.
+    """
+    copied = json.dumps(copied)
+    with _attached(dst_path, src_path) as dst:
+        changed = dst.execute(
+            f'INSERT OR IGNORE INTO main.tasks ({_MOVE_COLUMNS}) '
+            f'SELECT {_MOVE_COLUMNS} FROM src.tasks '
+            f'WHERE user_id = ? AND id NOT IN (SELECT value FROM json_each(?))',
+            (user_id, copied)
+        ).rowcount
+        changed += dst.execute(
+            f'UPDATE main.tasks SET {_SYNC_COLUMNS} FROM src.tasks AS s '
+            f'WHERE s.id = tasks.id AND s.user_id = ? AND s.version > tasks.version',
+            (user_id,)
+        ).rowcount
+        changed += dst.execute(
+            'DELETE FROM main.tasks WHERE user_id = ? AND id IN (SELECT value FROM json_each(?)) '
+            'AND id NOT IN (SELECT id FROM src.tasks WHERE user_id = ?)',
+            (user_id, copied, user_id)
+        ).rowcount
+        dst.execute(f'INSERT OR IGNORE INTO main.tasks_archive ({_ARCHIVE_COLUMNS}) '
+                    f'SELECT {_ARCHIVE_COLUMNS} FROM src.tasks_archive WHERE user_id = ?', (user_id,))
+    return changed
+
+
+def _delete_user_rows(path, user_id):
+    """Drop a user's rows from the shard they moved away from"""
+    conn = _connect_rw(path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM tasks WHERE user_id = ?', (user_id,))
+        conn.execute('DELETE FROM tasks_archive WHERE user_id = ?', (user_id,))
+        conn.execute('COMMIT')
+    finally:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        conn.close()
+
+
+def _settle(router, settle):
+    """
+    Wait until every process routes by the map just saved: one reload
+    interval for them to notice it, one more for requests routed before that
+    """
+    time.sleep(2 * router.reload_interval if settle is None else settle)
+
+
+def move_user(router, user_id, target, settle=None):
+    """
+    Move a user's tasks to another shard without stopping the service.
+
+    1. Copy the rows to the target; the source keeps them, so processes
+       still routing there keep answering in full.
+    2. Publish the per-user override in the shard map.
+    3. Wait for every process to reload the map (settle, in seconds; two
+       reload intervals by default).
+    4. Bring over writes that reached the source meanwhile.
+    5. Delete the rows from the source, in a transaction of its own.
+
+    A crash at any step leaves every row in at least one shard the map can
+    reach. Returns the number of tasks moved.
+    """
+    user_id = int(user_id)
+    router.refresh(force=True)
+    source = router.map.shard_for(user_id)
+    if source == target:
+        return 0
+    src_path = router.shards[source].database_path
+    dst_path = router.shards[target].database_path
+
+    copied = _copy_user_rows(src_path, dst_path, user_id)
+    router.map.users[user_id] = target
+    router.save_map()
+    _settle(router, settle)
+    added = _catch_up_user_rows(src_path, dst_path, user_id, copied)
+    _delete_user_rows(src_path, user_id)
+    return len(copied) + added
+
+
+def move_bucket(router, bucket, target, settle=None):
+    """
+    Hand a bucket to another shard: copy all of its users, publish the new
+    owner once, wait like move_user(), then catch up and clean the source
+    user by user. Users whose first task reached the source while the map
+    was being picked up are copied in the catch-up. Returns tasks moved.
+    """
+    router.refresh(force=True)
+    source = router.map.buckets[bucket]
+    if source == target:
+        return 0
+    src_path = router.shards[source].database_path
+    dst_path = router.shards[target].database_path
+
+    copied = {user_id: _copy_user_rows(src_path, dst_path, user_id)
+              for user_id in user_ids_in_bucket(src_path, router.map, bucket)}
+    router.map.buckets[bucket] = target
+    for user_id in [u for u, s in router.map.users.items()
+                    if s == target and router.map.bucket_for(u) == bucket]:
+        del router.map.users[user_id]
+    router.save_map()
+    _settle(router, settle)
+
+    moved = 0
+    for user_id in set(copied) | set(user_ids_in_bucket(src_path, router.map, bucket)):
+        ids = copied.get(user_id, [])
+        moved += len(ids) + _catch_up_user_rows(src_path, dst_path, user_id, ids)
+        _delete_user_rows(src_path, user_id)
+    return moved
+
+
+def user_ids_in_bucket(database_path, shard_map, bucket):
+    with sqlite3.connect(database_path) as conn:
+        return [r[0] for r in conn.execute('SELECT DISTINCT user_id FROM tasks')
+                if shard_map.bucket_for(r[0]) == bucket and r[0] not in shard_map.users]
@@ -0,0 +1,75 @@
+# task_service/singleflight.py
+"""
+Single-flight coalescing for identical concurrent reads.
+
+When several requests ask for the same thing at the same time (a user with a
+few tabs open, or loadTasks()/loadStats() firing together) only the first one
+runs the query. The others wait for it and get the same serialized response
+body. Nothing is cached: once the leader finishes, the next request runs a
+fresh query.
+
+Writes call forget(), which detaches the flights in progress. A read that
+starts after a write therefore never joins a query that started before it.
+"""
+import threading
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share it"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.counters = {'executed': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        """Return fn(), or the result of an identical call already running"""
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.counters['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self.counters['executed'] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def forget(self):
+        """Let new callers start fresh flights (call after every write)"""
+        with self._lock:
+            self._flights.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._flights), enabled=self.enabled)
@@ -0,0 +1,124 @@
+# task_service/startup.py
+"""
+Startup pipeline and readiness flag.
+
+`python app.py` starts serving right away and runs the startup phases in a
+background thread: migrations, then warming (pool connections, hot index
+pages). When they finish, the service turns *ready*:
+
+- GET /ready answers 200 once ready and 503 before that (the Kubernetes
+  readinessProbe).
+- GET /live answers 200 as long as the process serves requests (the
+  startup and liveness probes). It checks no database or other service, so
+  a slow dependency makes the pod unready instead of getting it restarted.
+  GET /health keeps the full report, dependencies included.
+- While phases run, every other route answers 503 with Retry-After. The
+  schema may not exist yet.
+- If a phase fails, the service never becomes ready, and /live and /health
+  answer 503, so the liveness probe restarts the pod.
+
+Non-critical work (importing NumPy and requests, starting schedulers) runs
+after the flag flips, so it does not delay readiness. Each phase's duration
+is logged and reported by /ready and /health. The 'import' phase is the time
+from the first line of app.py to building the Startup.
+
+An app that is imported but never started (tests, shard_tool.py) stays
+'idle' and is not gated.
+"""
+import sys
+import threading
+import time
+
+from flask import jsonify, request
+
+# Always served, whatever the state
+UNGATED_PATHS = ('/health', '/ready', '/live')
+
+
+class Startup:
+    """Timed startup phases ending in an explicit readiness flag"""
+
+    def __init__(self, service, started=None):
+        self.service = service
+        self._started = time.perf_counter() if started is None else started
+        self.state = 'idle'  # idle -> starting -> ready (-> draining -> stopped, see shutdown.py), or failed
+        self.error = None
+        self.phases = {}  # name -> milliseconds, in run order
+        self.ready_ms = None
+        self._lock = threading.Lock()
+        if started is not None:
+            self.phases['import'] = round((time.perf_counter() - started) * 1000, 1)
+
+    def init_app(self, app):
+        app.add_url_rule('/ready', 'ready', self._ready_view)
+        app.add_url_rule('/live', 'live', self._live_view)
+        app.before_request(self._gate)
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def start(self, phases, after_ready=()):
+        """Run phases in a background thread; see run()"""
+        thread = threading.Thread(target=self.run, args=(phases, after_ready),
+                                  name='startup', daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, phases, after_ready=()):
+        """
+        Run each (name, fn) of phases in order, then flip to ready and run
+        after_ready. A failing phase leaves the service 'failed' (not ready);
+        a failing after_ready step is only logged.
+        """
+        self.state = 'starting'
+        for name, fn in phases:
+            try:
+                self._timed(name, fn)
+            except Exception as e:
+                self.error = f'{name}: {e}'
+                self.state = 'failed'
+                print(f"Startup phase '{name}' failed: {e}", file=sys.stderr)
+                return False
+        self.ready_ms = round((time.perf_counter() - self._started) * 1000, 1)
+        self.state = 'ready'
+        print(f"{self.service} ready in {self.ready_ms} ms "
+              f"({', '.join(f'{n} {ms} ms' for n, ms in self.phases.items())})", file=sys.stderr)
+
+        for name, fn in after_ready:
+            try:
+                self._timed(name, fn)
+            except Exception as e:
+                print(f"Startup step '{name}' failed: {e}", file=sys.stderr)
+        return True
+
+    def _timed(self, name, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+        finally:
+            with self._lock:
+                self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _gate(self):
+        if self.state in ('starting', 'failed') and request.path not in UNGATED_PATHS:
+            response = jsonify({'error': 'Service is starting', 'state': self.state})
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+        return None
+
+    def _ready_view(self):
+        status = 200 if self.ready else 503
+        return jsonify({'status': self.state, 'service': self.service, 'startup': self.stats()}), status
+
+    def _live_view(self):
+        status = 503 if self.state == 'failed' else 200
+        return jsonify({'status': self.state, 'service': self.service}), status
+
+    def stats(self):
+        with self._lock:
+            stats = {'state': self.state, 'ready_ms': self.ready_ms, 'phases_ms': dict(self.phases)}
+        if self.error:
+            stats['error'] = self.error
+        return stats
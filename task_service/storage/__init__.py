@@ -0,0 +1,20 @@
+# task_service/storage/__init__.py
+"""Task storage backends, selected through Config.STORAGE_BACKEND"""
+from storage.base import (TaskStore, TASK_FIELDS, UPDATABLE_FIELDS, IdempotencyConflict,
+                          IdempotencyRecord, VersionConflict, columns_from_rows, task_from_row)
+
+
+def create_task_store(config):
+    """Build the TaskStore named by config['STORAGE_BACKEND']"""
+    backend = config['STORAGE_BACKEND']
+    if backend == 'sqlite':
+        from storage.sqlite import SqliteTaskStore
+        return SqliteTaskStore.from_config(config)
+    if backend == 'postgres':
+        from storage.postgres import PostgresTaskStore
+        return PostgresTaskStore.from_config(config)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+__all__ = ['TaskStore', 'TASK_FIELDS', 'UPDATABLE_FIELDS', 'IdempotencyConflict', 'IdempotencyRecord',
+           'VersionConflict', 'columns_from_rows', 'task_from_row', 'create_task_store']
@@ -0,0 +1,248 @@
+# task_service/storage/base.py
+"""
+Storage interface for tasks.
+
+Routes only talk to a TaskStore; which database sits behind it is chosen by
+Config.STORAGE_BACKEND. Every backend returns tasks as plain dicts with the
+keys in TASK_FIELDS, so responses look the same whatever the backend.
+"""
+import json
+from abc import ABC, abstractmethod
+
+TASK_FIELDS = ('id', 'user_id', 'title', 'description', 'priority', 'status',
+               'due_date', 'created_at', 'updated_at', 'version')
+
+# Fields a client may change through PUT /api/tasks/<id>
+UPDATABLE_FIELDS = ('title', 'description', 'priority', 'status', 'due_date')
+
+# Columns analytics reads: only updates of these bump a user's version
+# (user_version()), so flagging a task overdue keeps the analytics cache
+VERSIONED_FIELDS = ('user_id', 'status', 'priority', 'due_date', 'created_at', 'updated_at')
+
+# Rows read per fetchmany() when a result is turned into dicts
+FETCH_BATCH = 256
+
+# Low-cardinality columns sent as {'dictionary': [...], 'codes': [...]} in the
+# columnar list format
+DICTIONARY_FIELDS = ('priority', 'status')
+
+
+class VersionConflict(Exception):
+    """A conditional update found the task at another version"""
+
+    def __init__(self, task_id, current_version):
+        super().__init__(f"task {task_id} is at version {current_version}")
+        self.task_id = task_id
+        self.current_version = current_version
+
+
+class IdempotencyConflict(Exception):
+    """The Idempotency-Key already has a stored, unexpired response"""
+
+
+class IdempotencyRecord:
+    """
+    Response to store under an Idempotency-Key, in the same transaction as
+    the insert it answers. render(new_id) -> (status, JSON body text) is
+    called by the store once the id is known; the result is kept on the
+    record so the first response and every replay are byte-identical.
+    """
+    __slots__ = ('key', 'fingerprint', 'created_at', 'expires_at', 'render', 'status', 'body')
+
+    def __init__(self, key, fingerprint, created_at, expires_at, render):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.render = render
+        self.status = None
+        self.body = None
+
+    def response_for(self, new_id):
+        self.status, self.body = self.render(new_id)
+        return self.status, self.body
+
+
+def task_from_row(row):
+    """Task dict from a row tuple in TASK_FIELDS order (extra trailing columns are ignored)"""
+    return dict(zip(TASK_FIELDS, row))
+
+
+def fetch_in_batches(cursor, size=FETCH_BATCH):
+    """Rows of an executed cursor, read `size` at a time with fetchmany()"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def columns_from_rows(rows):
+    """
+    Column arrays for row tuples in TASK_FIELDS order:
+    {'count': n, 'columns': {field: [...] or {'dictionary', 'codes'}}}
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    transposed = list(zip(*rows)) if rows else [()] * len(TASK_FIELDS)
+    columns = {}
+    for field, values in zip(TASK_FIELDS, transposed):
+        if field in DICTIONARY_FIELDS:
+            dictionary = list(dict.fromkeys(values))
+            index = {value: i for i, value in enumerate(dictionary)}
+            columns[field] = {'dictionary': dictionary, 'codes': [index[v] for v in values]}
+        else:
+            columns[field] = list(values)
+    return {'count': len(rows), 'columns': columns}
+
+
+class TaskStore(ABC):
+    """Persistence operations used by the task routes"""
+
+    backend = None
+
+    @abstractmethod
+    def init_schema(self):
+        """Create tables and indexes if they do not exist"""
+
+    @abstractmethod
+    def ping(self):
+        """Raise if the database cannot be reached"""
+
+    def warm(self, rows=0):
+        """
+        Open pooled connections and read up to `rows` entries of the hottest
+        index, so the first requests after startup do not pay for them
+        """
+
+    @abstractmethod
+    def list_tasks(self, user_id, include_archived=False):
+        """All tasks of a user, newest first"""
+
+    def list_tasks_columns(self, user_id, include_archived=False):
+        """list_tasks() as column arrays, see columns_from_rows()"""
+        tasks = self.list_tasks(user_id, include_archived=include_archived)
+        return columns_from_rows([tuple(task[f] for f in TASK_FIELDS) for task in tasks])
+
+    def list_tasks_json(self, user_id, include_archived=False):
+        """list_tasks() as a JSON array string; backends encode rows in the database"""
+        return json.dumps(self.list_tasks(user_id, include_archived=include_archived))
+
+    @abstractmethod
+    def get_task(self, task_id, include_archived=False):
+        """One task as a dict, or None"""
+
+    @abstractmethod
+    def create_task(self, task, idempotency=None):
+        """
+        Insert a task (dict without 'id') and return the new id. With an
+        IdempotencyRecord, its response is stored atomically with the task
+        (IdempotencyConflict, and no task, if the key is already taken).
+        """
+
+    @abstractmethod
+    def get_idempotent_response(self, user_id, key, now):
+        """{'fingerprint', 'status', 'body'} stored for the key, or None if absent or expired"""
+
+    @abstractmethod
+    def purge_idempotency_keys(self, now):
+        """Delete expired idempotency keys; return how many"""
+
+    @abstractmethod
+    def update_task(self, task_id, changes, expected_versions=None):
+        """
+        Apply {field: value} changes and bump the task's version; return the
+        new version, or False if the task does not exist. With
+        expected_versions, the update is a single compare-and-set that only
+        applies while the task is at one of those versions (VersionConflict
+        otherwise).
+        """
+
+    @abstractmethod
+    def delete_task(self, task_id):
+        """Delete a task; return False if it did not exist"""
+
+    @abstractmethod
+    def task_stats(self, user_id, now, include_archived=False):
+        """
+        {'total_tasks', 'by_status', 'overdue_tasks'} for one user. Overdue
+        counts the stored overdue flags plus open tasks whose due_date passed
+        before `now` but are not flagged yet (see deadlines.py)
+        """
+
+    @abstractmethod
+    def pending_deadlines(self, before, after=None, limit=1000):
+        """
+        Open, not yet overdue tasks with a due_date before `before`, as
+        (due_date, id, user_id) tuples ordered by (due_date, id), starting
+        after the (due_date, id) cursor `after`. Read through a partial index
+        that holds only such tasks.
+        """
+
+    @abstractmethod
+    def mark_overdue(self, tasks, now):
+        """
+        Set the overdue flag of (id, user_id) tasks that are still open and
+        due before `now`; return the ids that were flagged
+        """
+
+    @abstractmethod
+    def dashboard(self, user_id, now, limit, offset=0, include_archived=False):
+        """
+        {'tasks': one page (newest first), 'stats': task_stats(...)} read
+        from a single consistent snapshot
+        """
+
+    def dashboard_json(self, user_id, now, limit, offset=0, include_archived=False):
+        """
+        dashboard() with each task already encoded: {'tasks': [JSON object
+        text], 'stats': {...}}. Backends encode rows in the database, so the
+        route splices them into the response without a dict per task
+        """
+        result = self.dashboard(user_id, now, limit, offset, include_archived=include_archived)
+        return {'tasks': [json.dumps(task) for task in result['tasks']], 'stats': result['stats']}
+
+    @abstractmethod
+    def global_stats(self):
+        """{'total_tasks', 'by_status'} across all users"""
+
+    @abstractmethod
+    def archive_completed(self, cutoff, limit, archived_at):
+        """
+        Move up to `limit` tasks completed before `cutoff` (by updated_at)
+        into the archive; return how many were moved
+        """
+
+    def compact(self, max_pages=None):
+        """Give free pages back to the filesystem; return pages reclaimed"""
+        return 0
+
+    def user_version(self, user_id):
+        """
+        Opaque value that changes whenever any of the user's tasks changes,
+        or None if the backend cannot tell (callers must not cache then)
+        """
+        return None
+
+    def analytics_source(self, user_id):
+        """
+        The user's tasks, archived ones included, as JSON array texts of
+        the columns as stored (null for NULL): {'status', 'priority',
+        'created', 'updated', 'due'}. analytics.py interprets them
+        """
+        tasks = self.list_tasks(user_id, include_archived=True)
+        return {
+            name: json.dumps([t[field] for t in tasks])
+            for name, field in (('status', 'status'), ('priority', 'priority'), ('created', 'created_at'),
+                                ('updated', 'updated_at'), ('due', 'due_date'))
+        }
+
+    def describe(self):
+        """Backend details for the admin endpoints"""
+        return {'backend': self.backend}
+
+    def writer_stats(self):
+        """Write path counters reported by /health"""
+        return {}
+
+    def close(self):
+        """Release connections and background threads"""
@@ -0,0 +1,402 @@
+# task_service/storage/postgres.py
+"""
+PostgreSQL task store.
+
+Used when STORAGE_BACKEND=postgres. Unlike SQLite there is no single-file
+writer lock, so writes go straight to a pooled connection and replicas can
+share one database. Needs `psycopg` and `psycopg_pool` (see requirements.txt).
+"""
+from storage.base import (TaskStore, TASK_FIELDS, UPDATABLE_FIELDS, VERSIONED_FIELDS,
+                          IdempotencyConflict, VersionConflict, columns_from_rows)
+
+try:
+    from psycopg.rows import dict_row, tuple_row
+    from psycopg_pool import ConnectionPool
+except ImportError:  # pragma: no cover - only needed for this backend
+    dict_row = tuple_row = ConnectionPool = None
+
+_COLUMNS = ', '.join(TASK_FIELDS)
+
+# UPDATE statements for every combination of fields a PUT can change (see
+# the SQLite store); psycopg prepares each shape server-side after a few runs
+_SET_FIELDS = UPDATABLE_FIELDS + ('updated_at',)
+_UPDATE_TASK = tuple(
+    'UPDATE tasks SET '
+    + ''.join(f'{f} = %s, ' for i, f in enumerate(_SET_FIELDS) if mask & (1 << i))
+    + 'version = version + 1 '
+    'WHERE id = %s AND (%s::bigint[] IS NULL OR version = ANY(%s::bigint[])) '
+    'RETURNING version'
+    for mask in range(1 << len(_SET_FIELDS))
+)
+
+
+class PostgresTaskStore(TaskStore):
+    backend = 'postgres'
+
+    def __init__(self, dsn, pool_size=10):
+        if ConnectionPool is None:
+            raise RuntimeError("STORAGE_BACKEND=postgres needs the psycopg and psycopg_pool packages")
+        self.dsn = dsn
+        self.pool = ConnectionPool(
+            dsn,
+            min_size=1,
+            max_size=pool_size,
+            kwargs={'row_factory': dict_row},
+            open=True,
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        if not config['POSTGRES_DSN']:
+            raise ValueError("POSTGRES_DSN must be set when STORAGE_BACKEND=postgres")
+        return cls(config['POSTGRES_DSN'], pool_size=config['POSTGRES_POOL_SIZE'])
+
+    def init_schema(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id BIGSERIAL PRIMARY KEY,
+                    user_id BIGINT NOT NULL,
+                    title TEXT NOT NULL,
+                    description TEXT,
+                    priority TEXT DEFAULT 'medium',
+                    status TEXT DEFAULT 'pending',
+                    due_date TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    version BIGINT NOT NULL DEFAULT 1,
+                    overdue SMALLINT NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at)')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (updated_at)
+                WHERE status = 'completed'
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks_archive (
+                    id BIGINT PRIMARY KEY,
+                    user_id BIGINT NOT NULL,
+                    title TEXT NOT NULL,
+                    description TEXT,
+                    priority TEXT,
+                    status TEXT,
+                    due_date TEXT,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    version BIGINT NOT NULL DEFAULT 1,
+                    archived_at TEXT
+                )
+            ''')
+            # Row versions (optimistic concurrency) for tables created before them
+            for table in ('tasks', 'tasks_archive'):
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1')
+            # Overdue flags (see deadlines.py), indexes and trigger as in the SQLite store
+            conn.execute('ALTER TABLE tasks ADD COLUMN IF NOT EXISTS overdue SMALLINT NOT NULL DEFAULT 0')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_due_pending ON tasks (due_date, id)
+                WHERE overdue = 0 AND status <> 'completed' AND due_date IS NOT NULL
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_user_due_pending ON tasks (user_id, due_date)
+                WHERE overdue = 0 AND status <> 'completed' AND due_date IS NOT NULL
+            ''')
+            conn.execute('''
+                CREATE OR REPLACE FUNCTION set_task_overdue() RETURNS trigger AS $$
+                BEGIN
+                    NEW.overdue := CASE WHEN NEW.status <> 'completed' AND NEW.due_date < NEW.updated_at
+                                        THEN 1 ELSE 0 END;
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_archive_user_created ON tasks_archive (user_id, created_at)')
+            conn.execute('DROP FUNCTION IF EXISTS task_julianday(TEXT)')  # analytics.py parses dates now
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS user_versions (
+                    user_id BIGINT PRIMARY KEY,
+                    version BIGINT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE OR REPLACE FUNCTION bump_user_version() RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO user_versions (user_id, version)
+                    VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END, 1)
+                    ON CONFLICT (user_id) DO UPDATE SET version = user_versions.version + 1;
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    user_id BIGINT NOT NULL,
+                    key TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    body TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    expires_at TEXT NOT NULL,
+                    PRIMARY KEY (user_id, key)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at)')
+            conn.execute('DROP TRIGGER IF EXISTS tasks_user_version ON tasks')
+            conn.execute(f'''
+                CREATE TRIGGER tasks_user_version
+                AFTER INSERT OR UPDATE OF {', '.join(VERSIONED_FIELDS)} OR DELETE ON tasks
+                FOR EACH ROW EXECUTE FUNCTION bump_user_version()
+            ''')
+            conn.execute('DROP TRIGGER IF EXISTS tasks_overdue ON tasks')
+            conn.execute('''
+                CREATE TRIGGER tasks_overdue BEFORE INSERT OR UPDATE OF status, due_date ON tasks
+                FOR EACH ROW EXECUTE FUNCTION set_task_overdue()
+            ''')
+
+    def ping(self):
+        with self.pool.connection() as conn:
+            conn.execute('SELECT 1')
+
+    def warm(self, rows=0):
+        self.pool.wait()  # min_size connections open
+        if rows:
+            with self.pool.connection() as conn:
+                conn.execute(
+                    'SELECT COUNT(*) FROM (SELECT user_id FROM tasks '
+                    'ORDER BY user_id, created_at LIMIT %s) hot', (rows,)
+                ).fetchone()
+
+    def list_tasks(self, user_id, include_archived=False):
+        with self.pool.connection() as conn:
+            if include_archived:
+                return conn.execute(
+                    f'SELECT {_COLUMNS} FROM tasks WHERE user_id = %s '
+                    f'UNION ALL SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = %s '
+                    f'ORDER BY created_at DESC',
+                    (int(user_id), int(user_id))
+                ).fetchall()
+            return conn.execute(
+                f'SELECT {_COLUMNS} FROM tasks WHERE user_id = %s ORDER BY created_at DESC',
+                (int(user_id),)
+            ).fetchall()
+
+    def list_tasks_columns(self, user_id, include_archived=False):
+        sql = f'SELECT {_COLUMNS} FROM tasks WHERE user_id = %s'
+        params = (int(user_id),)
+        if include_archived:
+            sql += f' UNION ALL SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = %s'
+            params += (int(user_id),)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=tuple_row)
+            cursor.execute(sql + ' ORDER BY created_at DESC', params)
+            return columns_from_rows(cursor.fetchall())
+
+    def list_tasks_json(self, user_id, include_archived=False):
+        source = f'SELECT {_COLUMNS} FROM tasks WHERE user_id = %s'
+        params = (int(user_id),)
+        if include_archived:
+            source += f' UNION ALL SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = %s'
+            params += (int(user_id),)
+        with self.pool.connection() as conn:
+            return conn.execute(
+                f"SELECT COALESCE(json_agg(t ORDER BY t.created_at DESC), '[]')::text AS body "
+                f"FROM ({source}) t",
+                params
+            ).fetchone()['body']
+
+    def get_task(self, task_id, include_archived=False):
+        with self.pool.connection() as conn:
+            task = conn.execute(
+                f'SELECT {_COLUMNS} FROM tasks WHERE id = %s', (task_id,)
+            ).fetchone()
+            if task is None and include_archived:
+                task = conn.execute(
+                    f'SELECT {_COLUMNS} FROM tasks_archive WHERE id = %s', (task_id,)
+                ).fetchone()
+            return task
+
+    def create_task(self, task, idempotency=None):
+        fields = [f for f in TASK_FIELDS if f not in ('id', 'version')]
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f"INSERT INTO tasks ({', '.join(fields)}) "
+                f"VALUES ({', '.join('%s' for _ in fields)}) RETURNING id",
+                tuple(int(task[f]) if f == 'user_id' else task.get(f) for f in fields)
+            ).fetchone()
+            if idempotency is not None:
+                status, body = idempotency.response_for(row['id'])
+                # Takes over an expired key; leaves a live one alone (rowcount 0)
+                saved = conn.execute('''
+                    INSERT INTO idempotency_keys
+                        (user_id, key, fingerprint, status, body, created_at, expires_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (user_id, key) DO UPDATE SET
+                        fingerprint = excluded.fingerprint, status = excluded.status,
+                        body = excluded.body, created_at = excluded.created_at,
+                        expires_at = excluded.expires_at
+                    WHERE idempotency_keys.expires_at <= excluded.created_at
+                ''', (int(task['user_id']), idempotency.key, idempotency.fingerprint, status, body,
+                      idempotency.created_at, idempotency.expires_at)).rowcount
+                if saved == 0:
+                    # Leaving the block with an exception rolls the task back too
+                    raise IdempotencyConflict(idempotency.key)
+        return row['id']
+
+    def get_idempotent_response(self, user_id, key, now):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'SELECT fingerprint, status, body FROM idempotency_keys '
+                'WHERE user_id = %s AND key = %s AND expires_at > %s',
+                (int(user_id), key, now)
+            ).fetchone()
+
+    def purge_idempotency_keys(self, now):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'DELETE FROM idempotency_keys WHERE expires_at <= %s', (now,)
+            ).rowcount
+
+    def update_task(self, task_id, changes, expected_versions=None):
+        mask = sum(1 << i for i, f in enumerate(_SET_FIELDS) if f in changes)
+        versions = None if expected_versions is None else sorted(expected_versions)
+        params = [changes[f] for f in _SET_FIELDS if f in changes] + [task_id, versions, versions]
+        with self.pool.connection() as conn:
+            updated = conn.execute(_UPDATE_TASK[mask], params).fetchone()
+            if updated is not None:
+                return updated['version']
+            current = conn.execute('SELECT version FROM tasks WHERE id = %s', (task_id,)).fetchone()
+        if current is None or expected_versions is None:
+            return False
+        raise VersionConflict(task_id, current['version'])
+
+    def delete_task(self, task_id):
+        with self.pool.connection() as conn:
+            return conn.execute('DELETE FROM tasks WHERE id = %s', (task_id,)).rowcount > 0
+
+    def pending_deadlines(self, before, after=None, limit=1000):
+        after_due, after_id = after or ('', 0)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(row_factory=tuple_row)
+            cursor.execute('''
+                SELECT due_date, id, user_id FROM tasks
+                WHERE overdue = 0 AND status <> 'completed' AND due_date IS NOT NULL
+                    AND (due_date, id) > (%s, %s) AND due_date < %s
+                ORDER BY due_date, id LIMIT %s
+            ''', (after_due, after_id, before, limit))
+            return cursor.fetchall()
+
+    def mark_overdue(self, tasks, now):
+        ids = [task_id for task_id, _ in tasks]
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                UPDATE tasks SET overdue = 1
+                WHERE id = ANY(%s) AND overdue = 0 AND status <> 'completed' AND due_date <= %s
+                RETURNING id
+            ''', (ids, now)).fetchall()
+        return [row['id'] for row in rows]
+
+    def task_stats(self, user_id, now, include_archived=False):
+        with self.pool.connection() as conn:
+            return self._stats(conn, user_id, now, include_archived)
+
+    def _stats(self, conn, user_id, now, include_archived):
+        rows = conn.execute(
+            'SELECT status, COUNT(*) AS count, SUM(overdue) AS overdue '
+            'FROM tasks WHERE user_id = %s GROUP BY status',
+            (int(user_id),)
+        ).fetchall()
+        # Due dates that passed since the scheduler last ran (see deadlines.py)
+        unflagged = conn.execute('''
+            SELECT COUNT(*) AS count FROM tasks
+            WHERE user_id = %s AND overdue = 0 AND status <> 'completed' AND due_date < %s
+        ''', (int(user_id), now)).fetchone()['count']
+        overdue_tasks = sum(row['overdue'] for row in rows) + unflagged
+        archived = conn.execute(
+            'SELECT COUNT(*) AS count FROM tasks_archive WHERE user_id = %s', (int(user_id),)
+        ).fetchone()['count'] if include_archived else 0
+        by_status = {row['status']: row['count'] for row in rows}
+        if archived:
+            by_status['completed'] = by_status.get('completed', 0) + archived
+        return {
+            'total_tasks': sum(by_status.values()),
+            'by_status': by_status,
+            'overdue_tasks': overdue_tasks
+        }
+
+    def dashboard(self, user_id, now, limit, offset=0, include_archived=False):
+        return self._page(user_id, now, limit, offset, include_archived, f'SELECT {_COLUMNS}')
+
+    def dashboard_json(self, user_id, now, limit, offset=0, include_archived=False):
+        result = self._page(user_id, now, limit, offset, include_archived,
+                            'SELECT row_to_json(t)::text AS body')
+        return {'tasks': [row['body'] for row in result['tasks']], 'stats': result['stats']}
+
+    def _page(self, user_id, now, limit, offset, include_archived, select):
+        source = f'SELECT {_COLUMNS} FROM tasks WHERE user_id = %s'
+        params = (int(user_id),)
+        if include_archived:
+            source += f' UNION ALL SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = %s'
+            params += (int(user_id),)
+        with self.pool.connection() as conn:
+            # Must be the first statement of the (implicit) transaction
+            conn.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+            tasks = conn.execute(
+                f'{select} FROM ({source}) t ORDER BY t.created_at DESC, t.id DESC LIMIT %s OFFSET %s',
+                params + (limit, offset)
+            ).fetchall()
+            stats = self._stats(conn, user_id, now, include_archived)
+        return {'tasks': tasks, 'stats': stats}
+
+    def global_stats(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT status, COUNT(*) AS count FROM tasks GROUP BY status'
+            ).fetchall()
+        by_status = {row['status']: row['count'] for row in rows}
+        return {'total_tasks': sum(by_status.values()), 'by_status': by_status}
+
+    def archive_completed(self, cutoff, limit, archived_at):
+        with self.pool.connection() as conn:
+            return conn.execute(f'''
+                WITH moved AS (
+                    DELETE FROM tasks WHERE id IN (
+                        SELECT id FROM tasks
+                        WHERE status = 'completed' AND updated_at < %s
+                        ORDER BY updated_at LIMIT %s
+                    )
+                    RETURNING {_COLUMNS}
+                )
+                INSERT INTO tasks_archive ({_COLUMNS}, archived_at)
+                SELECT {_COLUMNS}, %s FROM moved
+            ''', (cutoff, limit, archived_at)).rowcount
+
+    def user_version(self, user_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT version FROM user_versions WHERE user_id = %s', (int(user_id),)
+            ).fetchone()
+        return row['version'] if row else 0
+
+    def analytics_source(self, user_id):
+        # Columns as stored, as in the SQLite store; analytics.py interprets them
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT
+                    COALESCE(json_agg(status), '[]')::text AS status,
+                    COALESCE(json_agg(priority), '[]')::text AS priority,
+                    COALESCE(json_agg(created_at), '[]')::text AS created,
+                    COALESCE(json_agg(updated_at), '[]')::text AS updated,
+                    COALESCE(json_agg(due_date), '[]')::text AS due
+                FROM (
+                    SELECT status, priority, created_at, updated_at, due_date FROM tasks WHERE user_id = %s
+                    UNION ALL
+                    SELECT status, priority, created_at, updated_at, due_date FROM tasks_archive WHERE user_id = %s
+                ) t
+            ''', (int(user_id), int(user_id))).fetchone()
+        return dict(row)
+
+    def describe(self):
+        return {'backend': self.backend, 'pool': self.pool.get_stats()}
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,604 @@
+# task_service/storage/sqlite.py
+"""SQLite task store: sharded files, pooled reads, group-committed writes"""
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import sys
+
+from sharding import Shard, ShardRouter
+from storage.base import (TaskStore, TASK_FIELDS, UPDATABLE_FIELDS, VERSIONED_FIELDS,
+                          IdempotencyConflict, VersionConflict, columns_from_rows, fetch_in_batches, task_from_row)
+
+_COLUMNS = ', '.join(TASK_FIELDS)
+
+_INSERT_TASK = f'''
+    INSERT INTO tasks ({_COLUMNS})
+    VALUES ({', '.join('?' for _ in TASK_FIELDS)})
+'''
+
+# Takes over an expired key; leaves a live one alone (rowcount 0)
+_SAVE_IDEMPOTENCY_KEY = '''
+    INSERT INTO idempotency_keys (user_id, key, fingerprint, status, body, created_at, expires_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, key) DO UPDATE SET
+        fingerprint = excluded.fingerprint, status = excluded.status, body = excluded.body,
+        created_at = excluded.created_at, expires_at = excluded.expires_at
+    WHERE idempotency_keys.expires_at <= excluded.created_at
+'''
+
+_LIST = f'''
+    SELECT {_COLUMNS} FROM tasks WHERE user_id = ? ORDER BY created_at DESC
+'''
+
+_LIST_WITH_ARCHIVE = f'''
+    SELECT {_COLUMNS} FROM tasks WHERE user_id = ?
+    UNION ALL
+    SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = ?
+    ORDER BY created_at DESC
+'''
+
+# Rows are encoded by SQLite's json_object(); Python only joins the strings
+_JSON_ROW = 'json_object(' + ', '.join(f"'{f}', {f}" for f in TASK_FIELDS) + ')'
+
+_LIST_JSON = f'''
+    SELECT {_JSON_ROW} FROM tasks WHERE user_id = ? ORDER BY created_at DESC
+'''
+
+_LIST_JSON_WITH_ARCHIVE = f'''
+    SELECT {_JSON_ROW} FROM (
+        SELECT {_COLUMNS} FROM tasks WHERE user_id = ?
+        UNION ALL
+        SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = ?
+    ) ORDER BY created_at DESC
+'''
+
+# The user's whole history as column arrays (see analytics.py). One aggregate
+# row per table: aggregating over a UNION ALL subquery is much slower.
+# Columns go out as stored: any per-row expression (julianday(), a status
+# test, COALESCE) costs more here than the same work in analytics.py
+_ANALYTICS_COLUMNS = """
+    json_group_array(status) AS status,
+    json_group_array(priority) AS priority,
+    json_group_array(created_at) AS created,
+    json_group_array(updated_at) AS updated,
+    json_group_array(due_date) AS due
+"""
+_ANALYTICS_SOURCE = f'''
+    SELECT {_ANALYTICS_COLUMNS} FROM tasks WHERE user_id = ?
+    UNION ALL
+    SELECT {_ANALYTICS_COLUMNS} FROM tasks_archive WHERE user_id = ?
+'''
+
+
+def _concat_json_arrays(first, second):
+    """'[1,2]' + '[3]' -> '[1,2,3]' without decoding either"""
+    if first == '[]':
+        return second
+    if second == '[]':
+        return first
+    return first[:-1] + ',' + second[1:]
+
+
+_PAGE = f'''
+    SELECT {_COLUMNS} FROM tasks WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+'''
+
+_PAGE_WITH_ARCHIVE = f'''
+    SELECT {_COLUMNS} FROM tasks WHERE user_id = ?
+    UNION ALL
+    SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+'''
+
+_PAGE_JSON = f'''
+    SELECT {_JSON_ROW} FROM tasks WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+'''
+
+_PAGE_JSON_WITH_ARCHIVE = f'''
+    SELECT {_JSON_ROW} FROM (
+        SELECT {_COLUMNS} FROM tasks WHERE user_id = ?
+        UNION ALL
+        SELECT {_COLUMNS} FROM tasks_archive WHERE user_id = ?
+    ) ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+'''
+
+# UPDATE statements for every combination of fields a PUT can change, built
+# once: requests pick one by bitmask instead of formatting SQL, and each
+# connection compiles a shape once (sqlite3's statement cache). The versions
+# If-Match allows come as a JSON array, or NULL for an unconditional update
+_SET_FIELDS = UPDATABLE_FIELDS + ('updated_at',)
+_UPDATE_TASK = tuple(
+    'UPDATE tasks SET '
+    + ''.join(f'{f} = ?, ' for i, f in enumerate(_SET_FIELDS) if mask & (1 << i))
+    + 'version = version + 1 '
+    'WHERE id = ? AND (? IS NULL OR version IN (SELECT value FROM json_each(?))) '
+    'RETURNING version'
+    for mask in range(1 << len(_SET_FIELDS))
+)
+
+
+# Stored overdue flags per status (see deadlines.py)
+_STATUS_COUNTS = '''
+    SELECT status, COUNT(*) AS count, SUM(overdue) AS overdue
+    FROM tasks WHERE user_id = ? GROUP BY status
+'''
+
+# Due dates that passed since the scheduler last ran (or while it was off);
+# a seek into idx_tasks_user_due_pending, normally empty
+_UNFLAGGED_OVERDUE = '''
+    SELECT COUNT(*) FROM tasks
+    WHERE user_id = ? AND overdue = 0 AND status != 'completed' AND due_date < ?
+'''
+
+_PENDING_DEADLINES = '''
+    SELECT due_date, id, user_id FROM tasks INDEXED BY idx_tasks_due_pending
+    WHERE overdue = 0 AND status != 'completed' AND due_date IS NOT NULL
+        AND (due_date, id) > (?, ?) AND due_date < ?
+    ORDER BY due_date, id LIMIT ?
+'''
+
+# Re-checks status and due date, so a stale scheduler entry flags nothing
+_MARK_OVERDUE = '''
+    UPDATE tasks SET overdue = 1
+    WHERE id IN (SELECT value FROM json_each(?))
+        AND overdue = 0 AND status != 'completed' AND due_date <= ?
+    RETURNING id
+'''
+
+
+class SqliteTaskStore(TaskStore):
+    backend = 'sqlite'
+
+    def __init__(self, router, write_timeout=10.0):
+        self.router = router
+        self.write_timeout = write_timeout
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(ShardRouter.from_config(config), write_timeout=config['WRITE_TIMEOUT'])
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _write(self, shard, sql, params=()):
+        return shard.writer.execute(sql, params, timeout=self.write_timeout)
+
+    def _write_command(self, shard, command):
+        return shard.writer.submit(command).result(self.write_timeout)
+
+    # ------------------------------------------------------------------
+    # TaskStore
+    # ------------------------------------------------------------------
+    def init_schema(self):
+        for shard in self.router.shards:
+            self.init_shard(shard)
+
+        # Pin the current layout so later config changes cannot silently re-hash users
+        if self.router.map_path and not os.path.exists(self.router.map_path):
+            self.router.save_map()
+
+    def init_shard(self, shard):
+        """Create or migrate the tables of one shard"""
+        if not shard.in_memory:
+            db_dir = os.path.dirname(shard.database_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir, exist_ok=True)
+                print(f"Created directory: {db_dir}", file=sys.stderr)
+
+        conn = sqlite3.connect(shard.database_path, uri=shard.in_memory)
+        # New files get incremental auto-vacuum so archiving can hand space back
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table'").fetchone():
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                priority TEXT DEFAULT 'medium',
+                status TEXT DEFAULT 'pending',
+                due_date TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                version INTEGER NOT NULL DEFAULT 1,
+                overdue INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at)')
+        # Lets the archiver find old completed tasks without a table scan
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (updated_at)
+            WHERE status = 'completed'
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tasks_archive (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                priority TEXT,
+                status TEXT,
+                due_date TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                version INTEGER NOT NULL DEFAULT 1,
+                archived_at TEXT
+            )
+        ''')
+        # Row versions (optimistic concurrency) for files created before them
+        for table in ('tasks', 'tasks_archive'):
+            columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if 'version' not in columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+        # Overdue flags (see deadlines.py); old rows start unflagged and the
+        # scheduler's first pass flags the ones already past due
+        if 'overdue' not in {row[1] for row in conn.execute('PRAGMA table_info(tasks)')}:
+            conn.execute('ALTER TABLE tasks ADD COLUMN overdue INTEGER NOT NULL DEFAULT 0')
+        # Only open, unflagged tasks with a due date: what the scheduler
+        # reads ahead, and what task_stats() still compares with the clock
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tasks_due_pending ON tasks (due_date)
+            WHERE overdue = 0 AND status != 'completed' AND due_date IS NOT NULL
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tasks_user_due_pending ON tasks (user_id, due_date)
+            WHERE overdue = 0 AND status != 'completed' AND due_date IS NOT NULL
+        ''')
+        # A write landing after the due date sets the flag itself (the
+        # write's updated_at is its clock), completing a task or moving
+        # its due date clears it; the UPDATE only touches the flag, so
+        # neither trigger fires again
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_overdue_insert AFTER INSERT ON tasks
+            WHEN NEW.status != 'completed' AND NEW.due_date < NEW.updated_at
+            BEGIN
+                UPDATE tasks SET overdue = 1 WHERE id = NEW.id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_overdue_update AFTER UPDATE OF status, due_date ON tasks
+            WHEN NEW.overdue != COALESCE(NEW.status != 'completed' AND NEW.due_date < NEW.updated_at, 0)
+            BEGIN
+                UPDATE tasks SET overdue = 1 - overdue WHERE id = NEW.id;
+            END
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_archive_user_created ON tasks_archive (user_id, created_at)')
+        # Per-user change counter for caches (analytics); triggers keep it
+        # exact for every write path, including archiving and shard moves.
+        # Updates count only when they touch a column analytics reads, so
+        # the deadline scheduler's overdue flags leave the caches alone
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_versions (
+                user_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('DROP TRIGGER IF EXISTS tasks_version_update')  # was on every column
+        update_of = f'UPDATE OF {", ".join(VERSIONED_FIELDS)}'
+        for name, event, row in (('insert', 'INSERT', 'NEW'), ('update', update_of, 'NEW'),
+                                 ('delete', 'DELETE', 'OLD')):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS tasks_version_{name}
+                AFTER {event} ON tasks
+                BEGIN
+                    INSERT INTO user_versions (user_id, version) VALUES ({row}.user_id, 1)
+                    ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+                END
+            ''')
+        # Stored responses for Idempotency-Key retries of POST /api/tasks,
+        # kept in the user's shard so they commit with the task
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                user_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                body TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                expires_at TEXT NOT NULL,
+                PRIMARY KEY (user_id, key)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at)')
+        shard.ensure_meta(conn)
+        conn.commit()
+        conn.close()
+        print(f"Shard {shard.index} ready: {shard.database_path}", file=sys.stderr)
+
+    def ping(self):
+        self.router.scatter(lambda shard, conn: conn.execute('SELECT 1'))
+
+    def warm(self, rows=0):
+        for shard in self.router.shards:
+            shard.pool.fill()
+            if rows:
+                # Walks the (user_id, created_at) index that every list and page reads
+                with shard.pool.connection() as conn:
+                    conn.execute(
+                        'SELECT COUNT(*) FROM (SELECT user_id FROM tasks '
+                        'INDEXED BY idx_tasks_user_created LIMIT ?)', (rows,)
+                    ).fetchone()
+
+    def list_tasks(self, user_id, include_archived=False):
+        shard = self.router.for_user(user_id)
+        with shard.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            if include_archived:
+                cursor.execute(_LIST_WITH_ARCHIVE, (user_id, user_id))
+            else:
+                cursor.execute(_LIST, (user_id,))
+            return [task_from_row(row) for row in fetch_in_batches(cursor)]
+
+    def list_tasks_columns(self, user_id, include_archived=False):
+        shard = self.router.for_user(user_id)
+        with shard.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            if include_archived:
+                cursor.execute(_LIST_WITH_ARCHIVE, (user_id, user_id))
+            else:
+                cursor.execute(_LIST, (user_id,))
+            return columns_from_rows(cursor.fetchall())
+
+    def list_tasks_json(self, user_id, include_archived=False):
+        shard = self.router.for_user(user_id)
+        with shard.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples, no Row objects
+            if include_archived:
+                cursor.execute(_LIST_JSON_WITH_ARCHIVE, (user_id, user_id))
+            else:
+                cursor.execute(_LIST_JSON, (user_id,))
+            return '[' + ','.join(row[0] for row in cursor) + ']'
+
+    def get_task(self, task_id, include_archived=False):
+        _, row = self.router.locate_task(task_id, include_archived=include_archived)
+        return task_from_row(row) if row is not None else None
+
+    def create_task(self, task, idempotency=None):
+        shard = self.router.for_user(task['user_id'])
+
+        def insert_task(cursor):
+            new_id = Shard.allocate_task_id(cursor)
+            cursor.execute(_INSERT_TASK, tuple(
+                new_id if field == 'id' else 1 if field == 'version' else task.get(field)
+                for field in TASK_FIELDS
+            ))
+            if idempotency is not None:
+                status, body = idempotency.response_for(new_id)
+                cursor.execute(_SAVE_IDEMPOTENCY_KEY, (
+                    task['user_id'], idempotency.key, idempotency.fingerprint, status, body,
+                    idempotency.created_at, idempotency.expires_at
+                ))
+                if cursor.rowcount == 0:
+                    # The writer rolls this command (task included) back to its savepoint
+                    raise IdempotencyConflict(idempotency.key)
+            return new_id
+
+        return self._write_command(shard, insert_task)
+
+    def get_idempotent_response(self, user_id, key, now):
+        shard = self.router.for_user(user_id)
+        with shard.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT fingerprint, status, body FROM idempotency_keys '
+                'WHERE user_id = ? AND key = ? AND expires_at > ?',
+                (user_id, key, now)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def purge_idempotency_keys(self, now):
+        futures = [
+            shard.writer.submit(lambda cursor: cursor.execute(
+                'DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,)
+            ).rowcount)
+            for shard in self.router.shards
+        ]
+        return sum(f.result(self.write_timeout) for f in futures)
+
+    def update_task(self, task_id, changes, expected_versions=None):
+        shard, _ = self.router.locate_task(task_id)
+        if shard is None:
+            return False
+        mask = sum(1 << i for i, f in enumerate(_SET_FIELDS) if f in changes)
+        versions = None if expected_versions is None else json.dumps(sorted(expected_versions))
+        params = [changes[f] for f in _SET_FIELDS if f in changes] + [task_id, versions, versions]
+
+        def compare_and_set(cursor):
+            updated = cursor.execute(_UPDATE_TASK[mask], params).fetchall()
+            if updated:
+                return updated[0][0]
+            current = cursor.execute('SELECT version FROM tasks WHERE id = ?', (task_id,)).fetchone()
+            if current is None or expected_versions is None:
+                return False
+            raise VersionConflict(task_id, current[0])
+
+        return self._write_command(shard, compare_and_set)
+
+    def delete_task(self, task_id):
+        shard, _ = self.router.locate_task(task_id)
+        if shard is None:
+            return False
+        result = self._write(shard, 'DELETE FROM tasks WHERE id = ?', (task_id,))
+        return result.rowcount > 0
+
+    def pending_deadlines(self, before, after=None, limit=1000):
+        after_due, after_id = after or ('', 0)
+
+        def shard_page(shard, conn):
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            return cursor.execute(_PENDING_DEADLINES, (after_due, after_id, before, limit)).fetchall()
+
+        # Each shard's page is sorted; the first `limit` of the merge are the global page
+        merged = heapq.merge(*self.router.scatter(shard_page))
+        return list(itertools.islice(merged, limit))
+
+    def mark_overdue(self, tasks, now):
+        by_shard = {}
+        for task_id, user_id in tasks:
+            by_shard.setdefault(self.router.for_user(user_id), []).append(task_id)
+
+        def flag(ids):
+            return lambda cursor: [row[0] for row in cursor.execute(_MARK_OVERDUE, (json.dumps(ids), now))]
+
+        futures = [shard.writer.submit(flag(ids)) for shard, ids in by_shard.items()]
+        return [task_id for f in futures for task_id in f.result(self.write_timeout)]
+
+    def task_stats(self, user_id, now, include_archived=False):
+        shard = self.router.for_user(user_id)
+        with shard.pool.connection() as conn:
+            return self._stats(conn, user_id, now, include_archived)
+
+    def _stats(self, conn, user_id, now, include_archived):
+        by_status = {}
+        overdue_tasks = 0
+        for row in conn.execute(_STATUS_COUNTS, (user_id,)):
+            by_status[row['status']] = row['count']
+            overdue_tasks += row['overdue']
+        total_tasks = sum(by_status.values())
+        overdue_tasks += conn.execute(_UNFLAGGED_OVERDUE, (user_id, now)).fetchone()[0]
+        if include_archived:
+            # Archived tasks are completed by definition, never overdue
+            archived = conn.execute(
+                'SELECT COUNT(*) as count FROM tasks_archive WHERE user_id = ?', (user_id,)
+            ).fetchone()['count']
+            if archived:
+                total_tasks += archived
+                by_status['completed'] = by_status.get('completed', 0) + archived
+        return {
+            'total_tasks': total_tasks,
+            'by_status': by_status,
+            'overdue_tasks': overdue_tasks
+        }
+
+    def dashboard(self, user_id, now, limit, offset=0, include_archived=False):
+        rows, stats = self._page(user_id, now, limit, offset, include_archived,
+                                 _PAGE_WITH_ARCHIVE if include_archived else _PAGE)
+        return {'tasks': [task_from_row(row) for row in rows], 'stats': stats}
+
+    def dashboard_json(self, user_id, now, limit, offset=0, include_archived=False):
+        rows, stats = self._page(user_id, now, limit, offset, include_archived,
+                                 _PAGE_JSON_WITH_ARCHIVE if include_archived else _PAGE_JSON)
+        return {'tasks': [row[0] for row in rows], 'stats': stats}
+
+    def _page(self, user_id, now, limit, offset, include_archived, page_sql):
+        shard = self.router.for_user(user_id)
+        params = (user_id, user_id, limit, offset) if include_archived else (user_id, limit, offset)
+        with shard.pool.connection() as conn:
+            # One read transaction: the page and the counts see the same snapshot
+            conn.execute('BEGIN')
+            try:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                rows = cursor.execute(page_sql, params).fetchall()
+                stats = self._stats(conn, user_id, now, include_archived)
+            finally:
+                conn.rollback()
+        return rows, stats
+
+    def global_stats(self):
+        def shard_counts(shard, conn):
+            return conn.execute(
+                'SELECT status, COUNT(*) AS count FROM tasks GROUP BY status'
+            ).fetchall()
+
+        by_status = {}
+        total_tasks = 0
+        for rows in self.router.scatter(shard_counts):
+            for row in rows:
+                by_status[row['status']] = by_status.get(row['status'], 0) + row['count']
+                total_tasks += row['count']
+        return {'total_tasks': total_tasks, 'by_status': by_status}
+
+    def archive_completed(self, cutoff, limit, archived_at):
+        def archive_batch(cursor):
+            ids = [row[0] for row in cursor.execute('''
+                SELECT id FROM tasks
+                WHERE status = 'completed' AND updated_at < ?
+                ORDER BY updated_at LIMIT ?
+            ''', (cutoff, limit))]
+            if not ids:
+                return 0
+            marks = ', '.join('?' for _ in ids)
+            cursor.execute(
+                f'INSERT OR REPLACE INTO tasks_archive ({_COLUMNS}, archived_at) '
+                f'SELECT {_COLUMNS}, ? FROM tasks WHERE id IN ({marks})',
+                [archived_at] + ids
+            )
+            cursor.execute(f'DELETE FROM tasks WHERE id IN ({marks})', ids)
+            return len(ids)
+
+        # One bounded batch per shard, queued behind regular writes
+        futures = [shard.writer.submit(archive_batch) for shard in self.router.shards]
+        return sum(f.result(self.write_timeout) for f in futures)
+
+    def compact(self, max_pages=None):
+        def vacuum(cursor):
+            # Python's sqlite3 steps this pragma only once and each step frees
+            # one page, so keep stepping until the budget or the freelist is used up
+            start = free = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+            budget = min(free, int(max_pages)) if max_pages else free
+            while start - free < budget:
+                cursor.execute('PRAGMA incremental_vacuum(1)')
+                left = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+                if left == free:  # not an auto_vacuum=INCREMENTAL file
+                    break
+                free = left
+            return start - free
+
+        futures = [shard.writer.submit(vacuum) for shard in self.router.shards]
+        return sum(f.result(self.write_timeout) for f in futures)
+
+    def user_version(self, user_id):
+        shard = self.router.for_user(user_id)
+        with shard.pool.connection() as conn:
+            row = conn.execute('SELECT version FROM user_versions WHERE user_id = ?', (user_id,)).fetchone()
+        # Counters are per shard file, so the shard is part of the version
+        return (shard.index, row['version'] if row else 0)
+
+    def analytics_source(self, user_id):
+        shard = self.router.for_user(user_id)
+        with shard.pool.connection() as conn:
+            live, archived = conn.execute(_ANALYTICS_SOURCE, (user_id, user_id)).fetchall()
+        return {key: _concat_json_arrays(live[key], archived[key]) for key in live.keys()}
+
+    def describe(self):
+        router = self.router
+
+        def shard_summary(shard, conn):
+            row = conn.execute(
+                'SELECT COUNT(*) AS tasks, COUNT(DISTINCT user_id) AS users FROM tasks'
+            ).fetchone()
+            return {
+                'index': shard.index,
+                'database': shard.database_path,
+                'tasks': row['tasks'],
+                'users': row['users'],
+                'buckets': router.map.buckets.count(shard.index),
+                'writer': shard.writer.stats()
+            }
+
+        return {
+            'backend': self.backend,
+            'map_version': router.map.version,
+            'bucket_count': len(router.map.buckets),
+            'user_overrides': len(router.map.users),
+            'shards': router.scatter(shard_summary)
+        }
+
+    @property
+    def in_memory(self):
+        """True when the shards are in-memory databases (TestingConfig)"""
+        return any(shard.in_memory for shard in self.router.shards)
+
+    def writer_stats(self):
+        return self.router.writer_stats()
+
+    def close(self):
+        self.router.close()
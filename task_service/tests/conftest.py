@@ -0,0 +1,70 @@
+# task_service/tests/conftest.py
+import os
+
+import pytest
+
+from sharding import ShardRouter
+from storage.sqlite import SqliteTaskStore
+
+# Set TEST_POSTGRES_DSN (e.g. postgresql://postgres@localhost/tasks_test) to run
+# the conformance suite against a local PostgreSQL as well
+POSTGRES_DSN = os.getenv('TEST_POSTGRES_DSN')
+
+
+def make_sqlite_store(tmp_path, shards=2, in_memory=False):
+    router = ShardRouter(
+        [':memory:' if in_memory else str(tmp_path / f'tasks-{i}.db') for i in range(shards)],
+        map_path=None if in_memory else str(tmp_path / 'shard_map.json'),
+        batch_window=0.001,
+    )
+    return SqliteTaskStore(router)
+
+
+def make_postgres_store():
+    from storage.postgres import PostgresTaskStore
+    store = PostgresTaskStore(POSTGRES_DSN, pool_size=4)
+    store.init_schema()
+    with store.pool.connection() as conn:
+        conn.execute('TRUNCATE tasks, tasks_archive, user_versions, idempotency_keys RESTART IDENTITY')
+    return store
+
+
+@pytest.fixture(params=['sqlite', 'sqlite-memory', 'postgres'])
+def store(request, tmp_path):
+    if request.param == 'postgres':
+        if not POSTGRES_DSN:
+            pytest.skip('TEST_POSTGRES_DSN not set')
+        task_store = make_postgres_store()
+    else:
+        task_store = make_sqlite_store(tmp_path, in_memory=request.param == 'sqlite-memory')
+        task_store.init_schema()
+    yield task_store
+    task_store.close()
+
+
+# ----------------------------------------------------------------------
+# In-process API tests: the Flask app on TestingConfig (in-memory shard,
+# no rate limits, no background jobs), driven through the test client
+# ----------------------------------------------------------------------
+@pytest.fixture(scope='session')
+def service():
+    """The app module, imported once with FLASK_ENV=testing"""
+    os.environ['FLASK_ENV'] = 'testing'
+    import app as task_app
+    return task_app
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    """Test client backed by a fresh in-memory database for each test"""
+    from analytics import TaskAnalytics
+    from storage import create_task_store
+
+    task_store = create_task_store(service.app.config)
+    task_store.init_schema()
+    monkeypatch.setattr(service, 'store', task_store)
+    monkeypatch.setattr(service.archiver, 'store', task_store)
+    monkeypatch.setattr(service.deadlines, 'store', task_store)
+    monkeypatch.setattr(service, 'analytics', TaskAnalytics.from_config(service.app.config, task_store))
+    yield service.app.test_client()
+    task_store.close()
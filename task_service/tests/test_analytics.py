@@ -0,0 +1,124 @@
+# task_service/tests/test_analytics.py
+from datetime import datetime
+
+import pytest
+
+import analytics as analytics_module
+from analytics import TaskAnalytics, julian_day, julian_days
+from conftest import make_sqlite_store
+from test_storage_conformance import new_task
+
+NOW = datetime(2025, 3, 10, 12, 0, 0)
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    task_store = make_sqlite_store(tmp_path)
+    task_store.init_schema()
+    yield task_store
+    task_store.close()
+
+
+def test_julian_day_matches_sqlite():
+    import sqlite3
+    conn = sqlite3.connect(':memory:')
+    for value in ('2025-01-01T00:00:00', '2025-03-10T12:00:00', '1999-12-31T23:59:30'):
+        expected = conn.execute('SELECT julianday(?)', (value,)).fetchone()[0]
+        assert julian_day(datetime.fromisoformat(value)) == pytest.approx(expected, abs=1e-9)
+
+
+def test_julian_days_match_sqlite(monkeypatch):
+    import sqlite3
+    conn = sqlite3.connect(':memory:')
+    values = ['2025-01-01', '2025-03-10T12:00:00', '1999-12-31 23:59:30.250', '2025-01-01T12:00:00+02:00',
+              None, '2025-02-30', 'next friday', '2025-01-01T06:00:00', 2460676]
+    expected = [conn.execute('SELECT julianday(?)', (value,)).fetchone()[0] for value in values]
+    expected[5] = None  # julianday() rolls it over to March 2; left out here instead
+    expected[8] = None  # only text is a timestamp
+    # Chunks of 3: the unparsable ones send their chunks down the slow path
+    monkeypatch.setattr(analytics_module, 'PARSE_CHUNK', 3)
+    days = julian_days(values)
+    assert [None if day != day else day for day in days] == [
+        None if e is None else pytest.approx(e, abs=1e-9) for e in expected
+    ]
+
+
+def test_metrics(sqlite_store):
+    # Created and done the same day, after 6 hours
+    sqlite_store.create_task(new_task(1, priority='high', status='completed',
+                                      created_at='2025-03-09T06:00:00', updated_at='2025-03-09T12:00:00'))
+    # Open, 2 days overdue
+    sqlite_store.create_task(new_task(1, priority='high', due_date='2025-03-08T12:00:00',
+                                      created_at='2025-03-09T08:00:00'))
+    # Open, due in the future; created outside a 7-day window
+    sqlite_store.create_task(new_task(1, priority='low', due_date='2025-04-01',
+                                      created_at='2025-01-01T00:00:00'))
+    # Done after 48 hours, then archived
+    sqlite_store.create_task(new_task(1, status='completed',
+                                      created_at='2025-03-01T00:00:00', updated_at='2025-03-03T00:00:00'))
+    sqlite_store.archive_completed('2025-03-05T00:00:00', 10, '2025-03-06T00:00:00')
+
+    result = TaskAnalytics(sqlite_store).for_user(1, NOW, days=7)
+    assert result['total_tasks'] == 4
+    completion = result['completion']
+    assert completion['dates'][0] == '2025-03-04'
+    assert completion['dates'][-1] == '2025-03-10'
+    assert completion['created'] == [0, 0, 0, 0, 0, 2, 0]
+    assert completion['completed'] == [0, 0, 0, 0, 0, 1, 0]
+    assert completion['completion_rate'][5] == 0.5
+    assert completion['completion_rate'][0] is None
+
+    assert result['lead_time_hours']['count'] == 2
+    assert result['lead_time_hours']['p50'] == 27.0
+    assert result['lead_time_hours']['mean'] == 27.0
+    assert result['overdue_aging']['total'] == 1
+    assert result['overdue_aging']['buckets']['1-3d'] == 1
+    assert result['priority'] == {
+        'high': {'total': 2, 'completed': 1},
+        'low': {'total': 1, 'completed': 0},
+        'medium': {'total': 1, 'completed': 1},
+    }
+
+
+def test_user_without_tasks(sqlite_store):
+    result = TaskAnalytics(sqlite_store).for_user(5, NOW, days=3)
+    assert result['total_tasks'] == 0
+    assert result['completion']['created'] == [0, 0, 0]
+    assert result['lead_time_hours']['p50'] is None
+    assert result['overdue_aging']['total'] == 0
+    assert result['priority'] == {}
+
+
+def test_arrays_are_cached_until_the_user_writes(sqlite_store):
+    analytics = TaskAnalytics(sqlite_store)
+    task_id = sqlite_store.create_task(new_task(1, created_at='2025-03-10T00:00:00'))
+    assert analytics.for_user(1, NOW)['timings_ms']['cached'] is False
+    assert analytics.for_user(1, NOW)['timings_ms']['cached'] is True
+
+    # Another user's writes leave the cache alone
+    sqlite_store.create_task(new_task(2))
+    assert analytics.for_user(1, NOW)['timings_ms']['cached'] is True
+
+    sqlite_store.update_task(task_id, {'status': 'completed', 'updated_at': '2025-03-10T01:00:00'})
+    result = analytics.for_user(1, NOW)
+    assert result['timings_ms']['cached'] is False
+    assert result['lead_time_hours']['count'] == 1
+    assert analytics.stats() == {'hits': 2, 'loads': 2, 'users': 1, 'tasks': 1}
+
+
+def test_overdue_flags_keep_the_cache(sqlite_store):
+    analytics = TaskAnalytics(sqlite_store)
+    task_id = sqlite_store.create_task(new_task(1, due_date='2025-03-09T00:00:00'))
+    analytics.for_user(1, NOW)
+    sqlite_store.mark_overdue([(task_id, 1)], '2025-03-10T00:00:00')
+    assert analytics.for_user(1, NOW)['timings_ms']['cached'] is True
+
+
+def test_cache_is_bounded_by_task_count(sqlite_store):
+    analytics = TaskAnalytics(sqlite_store, max_cached_tasks=2)
+    for user_id in (1, 2, 3):
+        sqlite_store.create_task(new_task(user_id))
+        analytics.for_user(user_id, NOW)
+    assert analytics.stats()['users'] == 2
+    assert analytics.for_user(1, NOW)['timings_ms']['cached'] is False
+    assert analytics.for_user(3, NOW)['timings_ms']['cached'] is True
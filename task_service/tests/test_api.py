@@ -0,0 +1,111 @@
+# task_service/tests/test_api.py
+"""The HTTP API end to end, in-process (see the client fixture in conftest.py)"""
+import pytest
+
+from serialization import COLUMNAR_MIMETYPE
+
+
+def create(client, user_id=1, title='Write docs', **fields):
+    response = client.post('/api/tasks', json={'user_id': user_id, 'title': title, **fields})
+    assert response.status_code == 201
+    return response.get_json()['task']['id']
+
+
+def test_health(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'healthy'
+
+
+def test_create_list_get(client):
+    task_id = create(client, priority='high', due_date='2099-01-01')
+    create(client, user_id=2, title='Someone else')
+
+    tasks = client.get('/api/tasks?user_id=1').get_json()['tasks']
+    assert [t['id'] for t in tasks] == [task_id]
+    task = client.get(f'/api/tasks/{task_id}').get_json()['task']
+    assert task['title'] == 'Write docs'
+    assert task['priority'] == 'high'
+    assert task['status'] == 'pending'
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'title': 'No user'}, 'user_id is required'),
+    ({'user_id': 1}, 'title is required'),
+    ({'user_id': 'abc', 'title': 'x'}, 'user_id must be an integer'),
+])
+def test_create_validation(client, body, error):
+    response = client.post('/api/tasks', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_list_requires_numeric_user_id(client):
+    assert client.get('/api/tasks').status_code == 400
+    assert client.get('/api/tasks?user_id=abc').status_code == 400
+
+
+def test_update_and_delete(client):
+    task_id = create(client)
+    response = client.put(f'/api/tasks/{task_id}', json={'status': 'completed'})
+    assert response.status_code == 200
+    assert client.get(f'/api/tasks/{task_id}').get_json()['task']['status'] == 'completed'
+
+    assert client.delete(f'/api/tasks/{task_id}').status_code == 200
+    assert client.get(f'/api/tasks/{task_id}').status_code == 404
+    assert client.put(f'/api/tasks/{task_id}', json={'title': 'x'}).status_code == 404
+    assert client.delete(f'/api/tasks/{task_id}').status_code == 404
+
+
+def test_each_test_starts_with_an_empty_database(client):
+    assert client.get('/api/tasks?user_id=1').get_json() == {'tasks': []}
+
+
+def test_stats_and_dashboard(client):
+    create(client, due_date='2000-01-01')
+    done = create(client, title='Done')
+    client.put(f'/api/tasks/{done}', json={'status': 'completed'})
+
+    stats = client.get('/api/tasks/stats/1').get_json()
+    assert stats == {'total_tasks': 2, 'by_status': {'pending': 1, 'completed': 1}, 'overdue_tasks': 1}
+
+    dashboard = client.get('/api/dashboard/1?limit=1').get_json()
+    assert len(dashboard['tasks']) == 1
+    assert dashboard['stats'] == stats
+    assert dashboard['page']['next_offset'] == 1
+
+
+def test_columnar_list(client):
+    create(client, priority='low')
+    response = client.get('/api/tasks?user_id=1', headers={'Accept': COLUMNAR_MIMETYPE})
+    assert response.mimetype == COLUMNAR_MIMETYPE
+    assert response.get_json()['count'] == 1
+
+
+def test_analytics(client):
+    create(client, priority='high')
+    body = client.get('/api/tasks/analytics/1?days=7').get_json()
+    assert body['total_tasks'] == 1
+    assert body['priority'] == {'high': {'total': 1, 'completed': 0}}
+    assert client.get('/api/tasks/analytics/1?days=0').status_code == 400
+
+
+def test_conditional_update(client):
+    task_id = create(client)
+    response = client.get(f'/api/tasks/{task_id}')
+    assert response.headers['ETag'] == '"1"'
+    assert client.get(f'/api/tasks/{task_id}', headers={'If-None-Match': '"1"'}).status_code == 304
+
+    response = client.put(f'/api/tasks/{task_id}', json={'status': 'completed'}, headers={'If-Match': '"1"'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"2"'
+    assert response.get_json()['version'] == 2
+
+    # A second tab still holding version 1 is told to reload, not silently overwritten
+    stale = client.put(f'/api/tasks/{task_id}', json={'status': 'pending'}, headers={'If-Match': '"1"'})
+    assert stale.status_code == 412
+    assert stale.headers['ETag'] == '"2"'
+    assert client.get(f'/api/tasks/{task_id}').get_json()['task']['status'] == 'completed'
+
+    assert client.put(f'/api/tasks/{task_id}', json={'title': 'x'}, headers={'If-Match': 'W/"2"'}).status_code == 412
+    assert client.put(f'/api/tasks/{task_id}', json={'title': 'x'}, headers={'If-Match': '*'}).status_code == 200
@@ -0,0 +1,221 @@
+# task_service/tests/test_deadlines.py
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_sqlite_store
+from deadlines import DeadlineScheduler, due_at
+from test_storage_conformance import new_task
+
+BEFORE = '2025-01-15T00:00:00'  # stats clock earlier than every due date below
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    task_store = make_sqlite_store(tmp_path)
+    task_store.init_schema()
+    yield task_store
+    task_store.close()
+
+
+def scheduler_for(store, events=None, **options):
+    options = dict({'window': 86400, 'batch': 100, 'reminder_lead': 3600}, **options)
+    scheduler = DeadlineScheduler(store, **options)
+    if events is not None:
+        scheduler.on_event(events.append)
+    return scheduler
+
+
+def test_due_at_orders_like_the_strings():
+    assert due_at('2025-03-01') == datetime(2025, 3, 1)
+    assert due_at('2025-03-01T10:00:00+02:00') == datetime(2025, 3, 1, 10)
+    assert due_at('next week') is None
+    assert due_at(None) is None
+
+
+def test_passed_deadlines_are_flagged(sqlite_store):
+    due = sqlite_store.create_task(new_task(1, due_date='2025-03-01T12:00:00'))
+    later = sqlite_store.create_task(new_task(1, due_date='2025-03-05T12:00:00'))
+    sqlite_store.create_task(new_task(1, status='completed', due_date='2025-03-01T12:00:00'))
+    events = []
+    scheduler = scheduler_for(sqlite_store, events)
+
+    wait = scheduler.run_pending(datetime(2025, 3, 1, 12, 0, 1))
+    assert [(e['type'], e['task_id']) for e in events] == [('overdue', due)]
+    assert 0 < wait <= 86400
+    # The flag is stored: stats count it whatever clock they are given
+    assert sqlite_store.task_stats(1, BEFORE)['overdue_tasks'] == 1
+    assert sqlite_store.pending_deadlines('2099-01-01') == [('2025-03-05T12:00:00', later, 1)]
+
+    scheduler.run_pending(datetime(2025, 3, 6))
+    assert sqlite_store.task_stats(1, BEFORE)['overdue_tasks'] == 2
+    assert scheduler.stats()['flagged'] == 2
+
+
+def test_reminders_come_before_the_deadline(sqlite_store):
+    task_id = sqlite_store.create_task(new_task(1, due_date='2025-03-01T12:00:00'))
+    events = []
+    scheduler = scheduler_for(sqlite_store, events)
+    assert scheduler.run_pending(datetime(2025, 3, 1, 10)) == 3600
+
+    scheduler.run_pending(datetime(2025, 3, 1, 11, 30))
+    assert events == [{'type': 'reminder', 'task_id': task_id, 'user_id': 1,
+                       'due_date': '2025-03-01T12:00:00'}]
+    scheduler.run_pending(datetime(2025, 3, 1, 11, 45))
+    assert len(events) == 1
+    scheduler.run_pending(datetime(2025, 3, 1, 12, 30))
+    assert [e['type'] for e in events] == ['reminder', 'overdue']
+
+
+def test_routes_keep_the_heap_current(sqlite_store):
+    events = []
+    scheduler = scheduler_for(sqlite_store, events)
+    scheduler.run_pending(datetime(2025, 3, 1))
+
+    # Created inside the loaded window after the load
+    task_id = sqlite_store.create_task(new_task(1, due_date='2025-03-01T06:00:00'))
+    scheduler.schedule(task_id, 1, '2025-03-01T06:00:00', 'pending')
+    assert scheduler.stats()['scheduled'] == 1
+    # Completed before its deadline
+    sqlite_store.update_task(task_id, {'status': 'completed', 'updated_at': '2025-03-01T01:00:00'})
+    scheduler.schedule(task_id, 1, '2025-03-01T06:00:00', 'completed')
+    gone = sqlite_store.create_task(new_task(1, due_date='2025-03-01T06:00:00'))
+    scheduler.schedule(gone, 1, '2025-03-01T06:00:00', 'pending')
+    sqlite_store.delete_task(gone)
+    scheduler.cancel(gone)
+
+    scheduler.run_pending(datetime(2025, 3, 1, 7))
+    assert events == []
+
+
+def test_a_stale_entry_flags_nothing(sqlite_store):
+    task_id = sqlite_store.create_task(new_task(1, due_date='2025-03-01T06:00:00'))
+    scheduler = scheduler_for(sqlite_store, reminder_lead=0)
+    scheduler.run_pending(datetime(2025, 3, 1))
+    # Changed by another process: the route hooks never saw it
+    sqlite_store.update_task(task_id, {'due_date': '2025-04-01', 'updated_at': '2025-03-01T01:00:00'})
+
+    scheduler.run_pending(datetime(2025, 3, 1, 7))
+    assert scheduler.stats()['flagged'] == 0
+    assert sqlite_store.task_stats(1, '2025-03-01T07:00:00')['overdue_tasks'] == 0
+
+
+def test_deadlines_load_page_by_page(sqlite_store):
+    for hour in range(10):
+        sqlite_store.create_task(new_task(hour % 3, due_date=f'2025-03-01T{hour:02d}:30:00'))
+    scheduler = scheduler_for(sqlite_store, batch=4, reminder_lead=0)
+
+    scheduler.run_pending(datetime(2025, 3, 1))
+    assert scheduler.stats()['scheduled'] == 4
+    held = []
+    for hour in range(10):
+        scheduler.run_pending(datetime(2025, 3, 1, hour, 45))
+        held.append(scheduler.stats()['scheduled'])
+    # Refilled once half the batch has fired, never holding much more than a batch
+    assert max(held) <= 6
+    stats = scheduler.stats()
+    assert stats['flagged'] == 10
+    assert stats['pages'] >= 3
+
+
+def test_background_thread_wakes_for_new_deadlines(sqlite_store):
+    events = []
+    scheduler = scheduler_for(sqlite_store, events, reminder_lead=0)
+    scheduler.start()
+    try:
+        due = (datetime.now() + timedelta(seconds=0.3)).isoformat()
+        task_id = sqlite_store.create_task(new_task(1, due_date=due, updated_at=datetime.now().isoformat()))
+        deadline = time.monotonic() + 5
+        while scheduler.stats()['pages'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        scheduler.schedule(task_id, 1, due, 'pending')
+        while not events and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        scheduler.stop(timeout=5)
+    assert [e['task_id'] for e in events] == [task_id]
+    assert not scheduler.stats()['running']
+
+
+def test_writes_after_the_due_date_set_the_flag(store):
+    task_id = store.create_task(new_task(1, due_date='2025-01-01', updated_at='2025-02-01T00:00:00'))
+    assert store.task_stats(1, BEFORE)['overdue_tasks'] == 1
+    assert store.pending_deadlines('2099-01-01') == []
+
+    store.update_task(task_id, {'due_date': '2025-06-01', 'updated_at': '2025-02-02T00:00:00'})
+    assert store.task_stats(1, BEFORE)['overdue_tasks'] == 0
+    assert store.mark_overdue([(task_id, 1)], '2025-06-02T00:00:00') == [task_id]
+    assert store.task_stats(1, BEFORE)['overdue_tasks'] == 1
+
+    store.update_task(task_id, {'status': 'completed', 'updated_at': '2025-06-03T00:00:00'})
+    assert store.task_stats(1, BEFORE)['overdue_tasks'] == 0
+
+
+def test_pending_deadlines_pages_in_due_order(store):
+    ids = [store.create_task(new_task(user_id, due_date=f'2025-03-0{day}'))
+           for user_id, day in ((1, 3), (2, 1), (3, 2), (4, 2))]
+    store.create_task(new_task(5, due_date='2025-03-04'))
+    store.create_task(new_task(6))
+
+    tied = sorted([('2025-03-02', ids[2], 3), ('2025-03-02', ids[3], 4)])
+    first = store.pending_deadlines('2025-03-04', limit=2)
+    assert first == [('2025-03-01', ids[1], 2), tied[0]]
+    rest = store.pending_deadlines('2025-03-04', after=first[-1][:2], limit=5)
+    assert rest == [tied[1], ('2025-03-03', ids[0], 1)]
+    # Re-checked on write: not yet due, not flagged
+    assert store.mark_overdue([(ids[0], 1), (ids[1], 2)], '2025-03-02T00:00:00') == [ids[1]]
+
+
+def test_api_writes_reach_a_running_scheduler(client, service, monkeypatch):
+    scheduler = scheduler_for(service.store)
+    scheduler._thread = object()  # reports running; passes are driven by the test
+    monkeypatch.setattr(service, 'deadlines', scheduler)
+    scheduler.run_pending()
+    soon = datetime.now().replace(microsecond=0).isoformat()
+    response = client.post('/api/tasks', json={'user_id': 1, 'title': 'Due', 'due_date': soon})
+    task_id = response.get_json()['task']['id']
+    assert scheduler.stats()['scheduled'] == 1
+
+    client.put(f'/api/tasks/{task_id}', json={'status': 'completed'})
+    assert scheduler.stats()['scheduled'] == 0
+    client.put(f'/api/tasks/{task_id}', json={'status': 'pending'})
+    assert scheduler.stats()['scheduled'] == 1
+    client.delete(f'/api/tasks/{task_id}')
+    assert scheduler.stats()['scheduled'] == 0
+
+
+def test_the_service_logs_one_reminder_for_a_task_due_soon(client, service, monkeypatch, capsys):
+    # The service's own scheduler and listener, from a clean slate
+    for name, value in (('_heap', []), ('_entries', {}), ('_cursor', None), ('_resync_at', None)):
+        monkeypatch.setattr(service.deadlines, name, value)
+    monkeypatch.setattr(service.deadlines, 'window', timedelta(hours=1))
+    monkeypatch.setattr(service.deadlines, 'reminder_lead', timedelta(hours=1))
+    due = (datetime.now() + timedelta(days=1)).replace(microsecond=0)
+    task_id = client.post('/api/tasks', json={'user_id': 1, 'title': 'Due',
+                                              'due_date': due.isoformat()}).get_json()['task']['id']
+    capsys.readouterr()
+
+    for minutes_left in (90, 55, 50):
+        service.deadlines.run_pending(due - timedelta(minutes=minutes_left))
+    logged = [json.loads(line) for line in capsys.readouterr().err.splitlines()
+              if line.startswith('{"event":"deadline"')]
+    assert logged == [{'event': 'deadline', 'type': 'reminder', 'task_id': task_id, 'user_id': 1,
+                       'due_date': due.isoformat()}]
+
+
+def test_a_numeric_due_date_is_rejected_once_the_scheduler_has_run(client, service, monkeypatch):
+    scheduler = scheduler_for(service.store)
+    monkeypatch.setattr(service, 'deadlines', scheduler)
+    scheduler.run_pending()  # sets the cursor that due dates are compared with
+    response = client.post('/api/tasks', json={'user_id': 1, 'title': 'Due', 'due_date': 20251231})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'due_date must be a string'
+    assert client.get('/api/tasks?user_id=1').get_json()['tasks'] == []
+
+    task_id = client.post('/api/tasks', json={'user_id': 1, 'title': 'Due'}).get_json()['task']['id']
+    assert client.put(f'/api/tasks/{task_id}', json={'due_date': 20251231}).status_code == 400
+    # Whatever reaches the scheduler, it never fails the write that scheduled it
+    scheduler.schedule(task_id, 1, 20251231, 'pending')
+    assert scheduler.stats()['scheduled'] == 0
@@ -0,0 +1,76 @@
+# task_service/tests/test_idempotency.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TASK = {'user_id': 1, 'title': 'Write docs'}
+
+
+def post(client, key, body=TASK):
+    return client.post('/api/tasks', json=body, headers={'Idempotency-Key': key})
+
+
+def test_retry_replays_the_first_response(client):
+    first = post(client, 'abc')
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+
+    retry = post(client, 'abc')
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_data() == first.get_data()
+    assert len(client.get('/api/tasks?user_id=1').get_json()['tasks']) == 1
+
+
+def test_without_a_key_every_post_creates(client):
+    client.post('/api/tasks', json=TASK)
+    client.post('/api/tasks', json=TASK)
+    assert len(client.get('/api/tasks?user_id=1').get_json()['tasks']) == 2
+
+
+def test_reusing_a_key_for_another_request_is_rejected(client):
+    post(client, 'abc')
+    response = post(client, 'abc', {'user_id': 1, 'title': 'Something else'})
+    assert response.status_code == 422
+
+
+def test_keys_are_per_user(client):
+    post(client, 'abc')
+    other = post(client, 'abc', {'user_id': 2, 'title': 'Write docs'})
+    assert other.status_code == 201
+    assert 'Idempotent-Replayed' not in other.headers
+
+
+def test_failed_requests_are_not_stored(client):
+    assert post(client, 'abc', {'user_id': 1}).status_code == 400
+    assert post(client, 'abc').status_code == 201
+
+
+def test_invalid_key(client):
+    assert post(client, ' ').status_code == 400
+    assert post(client, 'k' * 256).status_code == 400
+
+
+def test_concurrent_duplicates_wait_for_the_first(client, service, monkeypatch):
+    create_task = service.store.create_task
+    calls = []
+
+    def slow_create(task, idempotency=None):
+        calls.append(1)
+        time.sleep(0.2)
+        return create_task(task, idempotency=idempotency)
+
+    monkeypatch.setattr(service.store, 'create_task', slow_create)
+    start = threading.Barrier(4)
+
+    def hedged():
+        start.wait()
+        return post(service.app.test_client(), 'hedge')
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda _: hedged(), range(4)))
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [201] * 4
+    assert len({r.get_data() for r in responses}) == 1
+    assert sum(r.headers.get('Idempotent-Replayed') == 'true' for r in responses) == 3
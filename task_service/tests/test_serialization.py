@@ -0,0 +1,79 @@
+# task_service/tests/test_serialization.py
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+
+import serialization
+from serialization import Compressor, FastJSONProvider
+
+
+def make_app(**options):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    compressor = Compressor(**options)
+    compressor.init_app(app)
+
+    @app.route('/big')
+    def big():
+        return jsonify({'tasks': [{'id': i, 'title': 'Write docs'} for i in range(200)]})
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/stats')
+    def stats():
+        return jsonify({'by_status': {None: 1, 'pending': 2}})
+
+    return app, compressor
+
+
+def test_fast_provider_output_is_plain_json():
+    app, _ = make_app(enabled=False)
+    client = app.test_client()
+    assert client.get('/small').get_json() == {'ok': True}
+    assert client.get('/stats').get_json() == {'by_status': {'null': 1, 'pending': 2}}
+
+
+def test_gzip_above_threshold_only():
+    app, compressor = make_app(min_size=512)
+    client = app.test_client()
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'Write docs' in gzip.decompress(response.data)
+    assert compressor.stats()['bytes_out'] < compressor.stats()['bytes_in']
+
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_no_compression_without_accept_encoding():
+    app, _ = make_app(min_size=0)
+    response = app.test_client().get('/big')
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_json()['tasks']) == 200
+
+
+def test_brotli_preferred_when_available(monkeypatch):
+    if serialization.brotli is None:
+        pytest.skip('brotli not installed')
+    app, _ = make_app(min_size=0)
+    response = app.test_client().get('/big', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, False),
+    ('*/*', False),
+    ('application/json', False),
+    ('application/vnd.tasks.columnar+json', True),
+    ('application/vnd.tasks.columnar+json, application/json;q=0.5', True),
+    ('application/json, application/vnd.tasks.columnar+json;q=0.5', False),
+])
+def test_columnar_negotiation(accept, expected):
+    app = Flask(__name__)
+    headers = {'Accept': accept} if accept else {}
+    with app.test_request_context('/api/tasks', headers=headers):
+        assert serialization.wants_columnar() is expected
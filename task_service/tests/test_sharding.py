@@ -0,0 +1,228 @@
+# task_service/tests/test_sharding.py
+import argparse
+import sqlite3
+import threading
+
+import pytest
+
+import sharding
+from sharding import ShardMap, ShardRouter, bucket_for, move_bucket, move_user
+from storage.sqlite import SqliteTaskStore
+from test_storage_conformance import new_task
+
+
+def make_store(tmp_path, shards=2, **options):
+    router = ShardRouter([str(tmp_path / f'tasks-{i}.db') for i in range(shards)],
+                         map_path=str(tmp_path / 'shard_map.json'), batch_window=0.001,
+                         reload_interval=0.01, **options)
+    task_store = SqliteTaskStore(router)
+    task_store.init_schema()
+    return task_store
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    task_store = make_store(tmp_path)
+    yield task_store
+    task_store.close()
+
+
+def rows_in(shard, user_id, table='tasks'):
+    with sqlite3.connect(shard.database_path) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {table} WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+
+def user_on(router, shard_index, start=1):
+    """First user id from `start` on that the map routes to the shard"""
+    return next(u for u in range(start, 10000) if router.map.shard_for(u) == shard_index)
+
+
+def test_buckets_are_stable_and_overrides_win():
+    assert bucket_for(42, 64) == bucket_for('42', 64)
+    shard_map = ShardMap.default(['a.db', 'b.db'], 4)
+    assert shard_map.buckets == [0, 1, 0, 1]
+    user_id = next(u for u in range(100) if shard_map.shard_for(u) == 0)
+    shard_map.users[user_id] = 1
+    assert shard_map.shard_for(user_id) == 1
+
+
+def test_map_round_trips_and_reloads(sharded):
+    router = sharded.router
+    user_id = user_on(router, 0)
+    other = ShardRouter([], map_path=router.map_path, reload_interval=0)
+    try:
+        assert other.map.to_dict() == router.map.to_dict()
+        router.map.users[user_id] = 1
+        router.save_map()
+        assert other.for_user(user_id).index == 1
+        assert other.map.version == router.map.version
+    finally:
+        other.close()
+
+
+def test_tasks_are_routed_by_user(sharded):
+    router = sharded.router
+    users = [user_on(router, 0), user_on(router, 1)]
+    ids = [sharded.create_task(new_task(user_id)) for user_id in users]
+    assert [rows_in(router.shards[i], user_id) for i, user_id in enumerate(users)] == [1, 1]
+    assert [router.shards[i].owns_id(task_id) for i, task_id in enumerate(ids)] == [True, True]
+    assert sharded.get_task(ids[1])['user_id'] == users[1]
+
+
+def test_in_memory_readers_never_see_uncommitted_rows():
+    router = ShardRouter([':memory:'], batch_window=0.001)
+    task_store = SqliteTaskStore(router)
+    task_store.init_schema()
+    try:
+        shard = router.shards[0]
+        inserted, release, seen = threading.Event(), threading.Event(), []
+
+        def rolled_back(cursor):
+            cursor.execute("INSERT INTO tasks (id, user_id, title) VALUES (1, 7, 'ghost')")
+            inserted.set()
+            release.wait(5)
+            raise ValueError('roll me back')
+
+        future = shard.writer.submit(rolled_back)
+        assert inserted.wait(5)
+        reader = threading.Thread(target=lambda: seen.append(task_store.list_tasks(7)))
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive()  # waits for the batch instead of reading into it
+        release.set()
+        with pytest.raises(ValueError):
+            future.result(5)
+        reader.join(5)
+        assert seen == [[]]
+    finally:
+        task_store.close()
+
+
+def test_move_user_keeps_the_source_until_the_map_settles(sharded, monkeypatch):
+    router = sharded.router
+    user_id = user_on(router, 0)
+    ids = [sharded.create_task(new_task(user_id, title=f't{i}')) for i in range(3)]
+    seen = []
+
+    def settle(router_, _):
+        # The map is published, the source still answers for old readers
+        seen.append((router_.map.shard_for(user_id), rows_in(router.shards[0], user_id),
+                     rows_in(router.shards[1], user_id)))
+    monkeypatch.setattr(sharding, '_settle', settle)
+
+    assert move_user(router, user_id, 1) == 3
+    assert seen == [(1, 3, 3)]
+    assert (rows_in(router.shards[0], user_id), rows_in(router.shards[1], user_id)) == (0, 3)
+    assert [t['id'] for t in sharded.list_tasks(user_id)] == ids[::-1]
+    assert move_user(router, user_id, 1) == 0
+
+
+def test_move_user_catches_up_without_undoing_target_writes(sharded, monkeypatch):
+    router = sharded.router
+    user_id = user_on(router, 0)
+    kept, changed, dropped = [sharded.create_task(new_task(user_id, due_date='2025-01-05'))
+                              for _ in range(3)]
+    sharded.mark_overdue([(kept, user_id)], '2025-02-01T00:00:00')
+    source = router.shards[0]
+
+    def settle(router_, _):
+        # A process on the old map writes to the source...
+        with sqlite3.connect(source.database_path) as conn:
+            conn.execute("UPDATE tasks SET title = 'old map', version = version + 1 WHERE id = ?", (changed,))
+            conn.execute('DELETE FROM tasks WHERE id = ?', (dropped,))
+            conn.execute("INSERT INTO tasks (id, user_id, title, version) VALUES (?, ?, 'late', 1)",
+                         (kept + 100, user_id))
+        # ...while one on the new map already updated the target
+        sharded.update_task(kept, {'title': 'new map', 'updated_at': '2025-02-02T00:00:00'})
+    monkeypatch.setattr(sharding, '_settle', settle)
+
+    move_user(router, user_id, 1)
+    tasks = {t['id']: t for t in sharded.list_tasks(user_id)}
+    assert sorted(tasks) == sorted([kept, changed, kept + 100])
+    assert tasks[kept]['title'] == 'new map'
+    assert tasks[changed]['title'] == 'old map'
+    assert sharded.task_stats(user_id, '2024-01-01')['overdue_tasks'] == 1
+    assert rows_in(source, user_id) == 0
+
+
+def test_archived_tasks_follow_their_owner(sharded):
+    router = sharded.router
+    user_id = user_on(router, 0)
+    sharded.create_task(new_task(user_id, status='completed', updated_at='2025-01-01T00:00:00'))
+    assert sharded.archive_completed('2025-06-01', 10, '2025-06-01T00:00:00') == 1
+    move_user(router, user_id, 1, settle=0)
+    assert (rows_in(router.shards[0], user_id, 'tasks_archive'),
+            rows_in(router.shards[1], user_id, 'tasks_archive')) == (0, 1)
+    assert len(sharded.list_tasks(user_id, include_archived=True)) == 1
+
+
+def test_move_bucket_hands_over_every_user(sharded):
+    router = sharded.router
+    bucket = router.map.bucket_for(user_on(router, 0))
+    users = [u for u in range(1, 500) if router.map.bucket_for(u) == bucket][:3]
+    for user_id in users:
+        sharded.create_task(new_task(user_id))
+    assert move_bucket(router, bucket, 1, settle=0) == 3
+    assert router.map.buckets[bucket] == 1
+    assert [rows_in(router.shards[1], u) for u in users] == [1, 1, 1]
+    assert sum(rows_in(router.shards[0], u) for u in users) == 0
+
+
+@pytest.fixture
+def tool(service, sharded, monkeypatch):
+    import shard_tool
+    monkeypatch.setattr(shard_tool, 'store', sharded)
+    monkeypatch.setattr(shard_tool, 'router', sharded.router)
+    monkeypatch.setattr(shard_tool, 'init_db', sharded.init_schema)
+    return shard_tool
+
+
+def test_split_adds_a_shard_with_half_the_buckets(tool, sharded, tmp_path):
+    router = sharded.router
+    users = list(range(1, 41))
+    for user_id in users:
+        sharded.create_task(new_task(user_id))
+    owned = router.map.buckets.count(0)
+
+    tool.cmd_split(argparse.Namespace(source=0, path=str(tmp_path / 'tasks-2.db')))
+    assert len(router.shards) == 3
+    assert router.map.buckets.count(2) == owned - owned // 2
+    assert router.map.buckets.count(0) == owned // 2
+    assert all(len(sharded.list_tasks(u)) == 1 for u in users)
+    assert sum(rows_in(router.shards[2], u) for u in users) > 0
+
+
+def test_split_creates_the_tables_before_publishing_the_shard(tool, sharded, tmp_path, monkeypatch):
+    router = sharded.router
+    path = str(tmp_path / 'tasks-2.db')
+    published = []
+
+    def save_map(save=router.save_map):
+        if path in router.map.shards:
+            with sqlite3.connect(path) as conn:
+                rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                published.append({name for (name,) in rows})
+        save()
+
+    monkeypatch.setattr(router, 'save_map', save_map)
+    tool.cmd_split(argparse.Namespace(source=0, path=path))
+    assert published and all({'tasks', 'tasks_archive', 'user_versions'} <= tables for tables in published)
+    # Another process reading the published map finds a usable shard
+    other = ShardRouter([], map_path=router.map_path)
+    try:
+        assert len(other.scatter(lambda shard, conn: conn.execute('SELECT COUNT(*) FROM tasks').fetchone())) == 3
+    finally:
+        other.close()
+
+
+def test_rebalance_evens_out_buckets(tool, sharded):
+    router = sharded.router
+    router.map.buckets = [0] * len(router.map.buckets)
+    router.save_map()
+    for user_id in range(1, 21):
+        sharded.create_task(new_task(user_id))
+
+    tool.cmd_rebalance(argparse.Namespace())
+    assert router.map.buckets.count(0) == router.map.buckets.count(1)
+    assert all(len(sharded.list_tasks(u)) == 1 for u in range(1, 21))
+    assert sum(rows_in(router.shards[0], u) for u in range(1, 21)) < 20
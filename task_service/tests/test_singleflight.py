@@ -0,0 +1,81 @@
+# task_service/tests/test_singleflight.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_query():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'body'
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flights.do, ('tasks', 1), slow_query)
+        started.wait(5)
+        followers = [pool.submit(flights.do, ('tasks', 1), slow_query) for _ in range(4)]
+        while flights.stats()['coalesced'] < 4:
+            pass
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == ['body'] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {'executed': 1, 'coalesced': 4, 'in_flight': 0, 'enabled': True}
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flights = SingleFlight()
+    assert flights.do(('tasks', 1), lambda: 'a') == 'a'
+    assert flights.do(('tasks', 1), lambda: 'b') == 'b'
+    assert flights.do(('stats', 1), lambda: 'c') == 'c'
+    assert flights.stats()['executed'] == 3
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing_query():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('db down')
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, 'k', failing_query)
+        started.wait(5)
+        follower = pool.submit(flights.do, 'k', failing_query)
+        while flights.stats()['coalesced'] < 1:
+            pass
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_forget_detaches_running_flight():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def before_write():
+        started.set()
+        release.wait(5)
+        return 'stale'
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flights.do, 'k', before_write)
+        started.wait(5)
+        flights.forget()
+        # A read after the write must not join the old query
+        assert flights.do('k', lambda: 'fresh') == 'fresh'
+        release.set()
+        assert leader.result() == 'stale'
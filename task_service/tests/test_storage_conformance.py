@@ -0,0 +1,309 @@
+# task_service/tests/test_storage_conformance.py
+"""Behaviour every TaskStore backend must share"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from analytics import TaskAnalytics
+from storage import TASK_FIELDS, IdempotencyConflict, IdempotencyRecord, VersionConflict
+
+
+def new_task(user_id, title='Write docs', **fields):
+    task = {
+        'user_id': user_id,
+        'title': title,
+        'description': '',
+        'priority': 'medium',
+        'status': 'pending',
+        'due_date': None,
+        'created_at': '2025-01-01T00:00:00',
+        'updated_at': '2025-01-01T00:00:00',
+    }
+    task.update(fields)
+    return task
+
+
+def test_create_and_get(store):
+    task_id = store.create_task(new_task(7, due_date='2025-02-01'))
+    task = store.get_task(task_id)
+    assert tuple(task) == TASK_FIELDS
+    assert task['id'] == task_id
+    assert task['user_id'] == 7
+    assert task['due_date'] == '2025-02-01'
+
+
+def test_get_missing_task(store):
+    assert store.get_task(123456) is None
+
+
+def test_list_is_per_user_and_newest_first(store):
+    store.create_task(new_task(1, 'old', created_at='2025-01-01T00:00:00'))
+    store.create_task(new_task(1, 'new', created_at='2025-03-01T00:00:00'))
+    store.create_task(new_task(2, 'other'))
+    assert [t['title'] for t in store.list_tasks(1)] == ['new', 'old']
+    assert [t['title'] for t in store.list_tasks(2)] == ['other']
+    assert store.list_tasks(3) == []
+
+
+def test_update_only_touches_given_fields(store):
+    task_id = store.create_task(new_task(1, description='keep me'))
+    assert store.update_task(task_id, {'status': 'completed', 'updated_at': '2025-05-05T00:00:00'})
+    task = store.get_task(task_id)
+    assert task['status'] == 'completed'
+    assert task['description'] == 'keep me'
+    assert task['updated_at'] == '2025-05-05T00:00:00'
+
+
+def test_update_can_clear_a_field(store):
+    task_id = store.create_task(new_task(1, due_date='2025-02-01', description='keep me'))
+    assert store.update_task(task_id, {'due_date': None, 'title': 'Renamed'})
+    task = store.get_task(task_id)
+    assert (task['due_date'], task['title'], task['description']) == (None, 'Renamed', 'keep me')
+
+
+def test_warm(store):
+    task_id = store.create_task(new_task(1))
+    store.warm(rows=10)
+    assert store.get_task(task_id)['id'] == task_id
+
+
+def test_update_and_delete_missing_task(store):
+    assert store.update_task(999999, {'status': 'completed'}) is False
+    assert store.delete_task(999999) is False
+
+
+def test_every_update_bumps_the_version(store):
+    task_id = store.create_task(new_task(1))
+    assert store.get_task(task_id)['version'] == 1
+    assert store.update_task(task_id, {'title': 'Renamed'}) == 2
+    assert store.update_task(task_id, {'status': 'completed'}) == 3
+    assert store.get_task(task_id)['version'] == 3
+
+
+def test_conditional_update(store):
+    task_id = store.create_task(new_task(1))
+    assert store.update_task(task_id, {'status': 'completed'}, expected_versions={1}) == 2
+
+    # A writer still holding version 1 loses and learns the current version
+    with pytest.raises(VersionConflict) as conflict:
+        store.update_task(task_id, {'status': 'pending'}, expected_versions={1})
+    assert conflict.value.current_version == 2
+    assert store.get_task(task_id)['status'] == 'completed'
+
+    assert store.update_task(999999, {'status': 'pending'}, expected_versions={1}) is False
+
+
+def test_delete(store):
+    task_id = store.create_task(new_task(1))
+    assert store.delete_task(task_id) is True
+    assert store.get_task(task_id) is None
+
+
+def test_task_stats(store):
+    store.create_task(new_task(1, status='pending', due_date='2025-01-01T00:00:00'))
+    store.create_task(new_task(1, status='completed', due_date='2025-01-01T00:00:00'))
+    store.create_task(new_task(1, status='pending', due_date='2099-01-01T00:00:00'))
+    store.create_task(new_task(2))
+    stats = store.task_stats(1, '2025-06-01T00:00:00')
+    assert stats == {
+        'total_tasks': 3,
+        'by_status': {'pending': 2, 'completed': 1},
+        'overdue_tasks': 1,
+    }
+
+
+def test_global_stats(store):
+    for user_id in range(1, 6):
+        store.create_task(new_task(user_id))
+    store.create_task(new_task(3, status='completed'))
+    assert store.global_stats() == {'total_tasks': 6, 'by_status': {'pending': 5, 'completed': 1}}
+
+
+def test_concurrent_creates_get_unique_ids(store):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda i: store.create_task(new_task(i % 5)), range(100)))
+    assert len(set(ids)) == 100
+    assert sum(len(store.list_tasks(u)) for u in range(5)) == 100
+
+
+def test_archive_completed_moves_old_completed_tasks(store):
+    old_done = store.create_task(new_task(1, 'old done', status='completed',
+                                          updated_at='2025-01-01T00:00:00'))
+    new_done = store.create_task(new_task(1, 'new done', status='completed',
+                                          updated_at='2025-06-01T00:00:00'))
+    old_open = store.create_task(new_task(1, 'old open', updated_at='2025-01-01T00:00:00'))
+
+    assert store.archive_completed('2025-03-01T00:00:00', 100, '2025-06-02T00:00:00') == 1
+    assert store.archive_completed('2025-03-01T00:00:00', 100, '2025-06-02T00:00:00') == 0
+
+    assert store.get_task(old_done) is None
+    assert store.get_task(old_done, include_archived=True)['title'] == 'old done'
+    assert {t['id'] for t in store.list_tasks(1)} == {old_open, new_done}
+    assert {t['id'] for t in store.list_tasks(1, include_archived=True)} == {old_done, new_done, old_open}
+
+    stats = store.task_stats(1, '2025-06-01T00:00:00', include_archived=True)
+    assert stats['total_tasks'] == 3
+    assert stats['by_status'] == {'pending': 1, 'completed': 2}
+    assert store.task_stats(1, '2025-06-01T00:00:00')['total_tasks'] == 2
+
+
+def test_archive_completed_is_batched(store):
+    for i in range(5):
+        store.create_task(new_task(1, f'done {i}', status='completed',
+                                   updated_at='2025-01-01T00:00:00'))
+    moved = store.archive_completed('2025-03-01T00:00:00', 2, '2025-06-02T00:00:00')
+    # At most `limit` per shard / per call
+    assert 0 < moved < 5
+    while store.archive_completed('2025-03-01T00:00:00', 2, '2025-06-02T00:00:00'):
+        pass
+    assert store.list_tasks(1) == []
+    assert len(store.list_tasks(1, include_archived=True)) == 5
+    assert store.compact() >= 0
+
+
+def test_dashboard_pages_and_stats(store):
+    ids = [store.create_task(new_task(1, f'task {i}', created_at=f'2025-01-0{i + 1}T00:00:00',
+                                      due_date='2025-01-01T00:00:00'))
+           for i in range(5)]
+    store.create_task(new_task(2))
+    now = '2025-06-01T00:00:00'
+
+    first = store.dashboard(1, now, 2)
+    assert [t['id'] for t in first['tasks']] == [ids[4], ids[3]]
+    assert tuple(first['tasks'][0]) == TASK_FIELDS
+    assert first['stats'] == store.task_stats(1, now)
+    assert first['stats']['total_tasks'] == 5
+    assert first['stats']['overdue_tasks'] == 5
+
+    rest = store.dashboard(1, now, 10, offset=2)
+    assert [t['id'] for t in rest['tasks']] == [ids[2], ids[1], ids[0]]
+    assert store.dashboard(3, now, 10) == {
+        'tasks': [], 'stats': {'total_tasks': 0, 'by_status': {}, 'overdue_tasks': 0}
+    }
+
+
+def test_list_tasks_json_matches_list_tasks(store):
+    store.create_task(new_task(1, 'quote " and ünïcode', created_at='2025-01-01T00:00:00'))
+    store.create_task(new_task(1, 'second', due_date='2025-02-01', created_at='2025-02-01T00:00:00'))
+    done = store.create_task(new_task(1, 'archived', status='completed'))
+    store.archive_completed('2099-01-01T00:00:00', 10, '2025-06-01T00:00:00')
+    assert json.loads(store.list_tasks_json(1)) == store.list_tasks(1)
+    with_archive = json.loads(store.list_tasks_json(1, include_archived=True))
+    assert done in {t['id'] for t in with_archive}
+    assert with_archive == store.list_tasks(1, include_archived=True)
+    assert store.list_tasks_json(42) == '[]'
+
+
+def test_dashboard_json_matches_dashboard(store):
+    for i in range(3):
+        store.create_task(new_task(1, f'task "{i}"', created_at=f'2025-01-0{i + 1}T00:00:00',
+                                   due_date='2025-01-02T00:00:00'))
+    store.create_task(new_task(1, 'archived', status='completed'))
+    store.archive_completed('2099-01-01T00:00:00', 10, '2025-06-01T00:00:00')
+    now = '2025-06-01T00:00:00'
+    for include_archived in (False, True):
+        expected = store.dashboard(1, now, 2, offset=1, include_archived=include_archived)
+        encoded = store.dashboard_json(1, now, 2, offset=1, include_archived=include_archived)
+        assert [json.loads(t) for t in encoded['tasks']] == expected['tasks']
+        assert encoded['stats'] == expected['stats']
+
+
+def test_list_tasks_columns_matches_list_tasks(store):
+    store.create_task(new_task(1, 'a', priority='high', created_at='2025-01-01T00:00:00'))
+    store.create_task(new_task(1, 'b', status='completed', created_at='2025-01-02T00:00:00'))
+    store.create_task(new_task(1, 'c', priority='high', created_at='2025-01-03T00:00:00'))
+    result = store.list_tasks_columns(1)
+    columns = result['columns']
+    assert result['count'] == 3
+    assert set(columns) == set(TASK_FIELDS)
+    assert columns['title'] == ['c', 'b', 'a']
+    assert columns['priority'] == {'dictionary': ['high', 'medium'], 'codes': [0, 1, 0]}
+    assert columns['status'] == {'dictionary': ['pending', 'completed'], 'codes': [0, 1, 0]}
+    assert columns['id'] == [t['id'] for t in store.list_tasks(1)]
+    assert store.list_tasks_columns(2)['count'] == 0
+
+
+def test_user_version_changes_on_every_write(store):
+    versions = [store.user_version(1)]
+    task_id = store.create_task(new_task(1))
+    versions.append(store.user_version(1))
+    store.update_task(task_id, {'status': 'completed', 'updated_at': '2025-01-02T00:00:00'})
+    versions.append(store.user_version(1))
+    other = store.user_version(2)
+    store.delete_task(task_id)
+    versions.append(store.user_version(1))
+    assert len(set(versions)) == len(versions)
+    assert store.user_version(2) == other
+
+
+def test_overdue_flag_keeps_the_user_version(store):
+    task_id = store.create_task(new_task(1, due_date='2025-01-01T00:00:00'))
+    version = store.user_version(1)
+    assert store.mark_overdue([(task_id, 1)], '2025-01-02T00:00:00') == [task_id]
+    assert store.user_version(1) == version
+
+
+def test_analytics_source_covers_tasks_and_archive(store):
+    store.create_task(new_task(1, priority='high', due_date='2025-01-03',
+                               created_at='2025-01-01T12:00:00'))
+    store.create_task(new_task(1, priority=None, status='completed',
+                               created_at='2025-01-01T00:00:00', updated_at='2025-01-02T06:00:00'))
+    store.archive_completed('2099-01-01T00:00:00', 10, '2025-06-01T00:00:00')
+    source = {k: json.loads(v) for k, v in store.analytics_source(1).items()}
+    rows = sorted(zip(source['status'], source['priority'], source['created'],
+                      source['updated'], source['due']), key=lambda r: r[2])
+    # Columns as stored; analytics.py interprets them
+    assert rows == [
+        ('completed', None, '2025-01-01T00:00:00', '2025-01-02T06:00:00', None),
+        ('pending', 'high', '2025-01-01T12:00:00', '2025-01-01T00:00:00', '2025-01-03'),
+    ]
+    assert {k: json.loads(v) for k, v in store.analytics_source(2).items()} == {
+        'status': [], 'priority': [], 'created': [], 'updated': [], 'due': []
+    }
+
+
+def test_analytics_skips_unparsable_dates(store):
+    store.create_task(new_task(1, due_date='next friday', created_at='yesterday'))
+    store.create_task(new_task(1, priority='high', due_date='2025-01-02', created_at='2025-01-01 12:00'))
+    # Left out of the metrics instead of an error for the whole user
+    result = TaskAnalytics(store).for_user(1, datetime(2025, 1, 3), days=3)
+    assert result['total_tasks'] == 2
+    assert result['completion']['created'] == [1, 0, 0]
+    assert result['overdue_aging']['total'] == 1
+
+
+def idempotency_record(key='key-1', created_at='2025-01-01T00:00:00', expires_at='2025-01-02T00:00:00'):
+    return IdempotencyRecord(key, 'fp', created_at, expires_at,
+                             lambda new_id: (201, json.dumps({'id': new_id})))
+
+
+def test_create_task_stores_idempotent_response(store):
+    record = idempotency_record()
+    task_id = store.create_task(new_task(1), idempotency=record)
+    assert (record.status, json.loads(record.body)) == (201, {'id': task_id})
+    stored = store.get_idempotent_response(1, 'key-1', '2025-01-01T12:00:00')
+    assert dict(stored) == {'fingerprint': 'fp', 'status': 201, 'body': record.body}
+    # Keys are per user, and expire
+    assert store.get_idempotent_response(2, 'key-1', '2025-01-01T12:00:00') is None
+    assert store.get_idempotent_response(1, 'key-1', '2025-01-02T00:00:00') is None
+
+
+def test_taken_idempotency_key_rolls_the_insert_back(store):
+    store.create_task(new_task(1), idempotency=idempotency_record())
+    with pytest.raises(IdempotencyConflict):
+        store.create_task(new_task(1, 'retry'), idempotency=idempotency_record())
+    assert [t['title'] for t in store.list_tasks(1)] == ['Write docs']
+
+    # An expired key is taken over
+    later = idempotency_record(created_at='2025-01-03T00:00:00', expires_at='2025-01-04T00:00:00')
+    task_id = store.create_task(new_task(1, 'later'), idempotency=later)
+    assert json.loads(store.get_idempotent_response(1, 'key-1', '2025-01-03T00:00:01')['body']) == {'id': task_id}
+
+
+def test_purge_idempotency_keys(store):
+    store.create_task(new_task(1), idempotency=idempotency_record('old'))
+    store.create_task(new_task(2), idempotency=idempotency_record('new', expires_at='2025-02-01T00:00:00'))
+    assert store.purge_idempotency_keys('2025-01-15T00:00:00') == 1
+    assert store.get_idempotent_response(2, 'new', '2025-01-15T00:00:00') is not None
@@ -0,0 +1,60 @@
+# task_service/tests/test_user_client.py
+import requests
+
+from user_client import UserServiceClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+
+def test_profiles_are_cached(monkeypatch):
+    calls = []
+
+    def fake_get(url, timeout):
+        calls.append(url)
+        if url.endswith('/1'):
+            return FakeResponse(200, {'user': {'id': 1, 'username': 'ann'}})
+        return FakeResponse(404)
+
+    monkeypatch.setattr(requests.Session, 'get', staticmethod(fake_get))
+    client = UserServiceClient('http://users:6001/')
+    assert client.get_profile(1) == {'id': 1, 'username': 'ann'}
+    assert client.get_profile(1) == {'id': 1, 'username': 'ann'}
+    assert client.get_profile(2) is None
+    assert client.get_profile(2) is None
+    assert calls == ['http://users:6001/api/users/profile/1', 'http://users:6001/api/users/profile/2']
+    assert client.stats() == {'hits': 2, 'misses': 2, 'errors': 0, 'entries': 2}
+
+
+def test_failures_are_not_cached(monkeypatch):
+    def unreachable(url, timeout):
+        raise requests.ConnectionError('refused')
+
+    monkeypatch.setattr(requests.Session, 'get', staticmethod(unreachable))
+    client = UserServiceClient('http://users:6001', ttl=60)
+    assert client.get_profile(1) is None
+    assert client.stats()['errors'] == 1
+    assert client.stats()['entries'] == 0
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', staticmethod(lambda url, timeout: FakeResponse(200, {'user': {}})))
+    client = UserServiceClient('http://users:6001', max_entries=2)
+    for user_id in range(5):
+        client.get_profile(user_id)
+    assert client.stats()['entries'] == 2
+
+
+def test_close_releases_the_session(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'get', staticmethod(lambda url, timeout: FakeResponse(404)))
+    client = UserServiceClient('http://users:6001')
+    client.get_profile(1)
+    client.close()
+    client.close()
+    assert client.get_profile(2) is None
@@ -0,0 +1,118 @@
+# task_service/tests/test_write_queue.py
+import sqlite3
+import threading
+
+import pytest
+
+from write_queue import WriteQueue, WriteQueueClosed
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'writes.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE items (name TEXT UNIQUE NOT NULL)')
+    return path
+
+
+@pytest.fixture
+def writer(database):
+    queue = WriteQueue(database, batch_window=0.05)
+    yield queue
+    queue.stop()
+
+
+def names(database):
+    with sqlite3.connect(database) as conn:
+        return sorted(row[0] for row in conn.execute('SELECT name FROM items'))
+
+
+def insert(name):
+    return 'INSERT INTO items (name) VALUES (?)', (name,)
+
+
+def test_commands_share_one_commit(writer, database):
+    futures = [writer.submit_statement(*insert(f'item{i}')) for i in range(10)]
+    assert [f.result(5).rowcount for f in futures] == [1] * 10
+    assert len(names(database)) == 10
+    stats = writer.stats()
+    assert (stats['batches'], stats['commands'], stats['largest_batch']) == (1, 10, 10)
+
+
+def test_a_failing_command_only_rolls_back_itself(writer, database):
+    def half_done(cursor):
+        cursor.execute(*insert('partial'))
+        cursor.execute(*insert('first'))  # duplicate: IntegrityError
+
+    first = writer.submit_statement(*insert('first'))
+    failing = writer.submit(half_done)
+    last = writer.submit_statement(*insert('last'))
+    assert first.result(5).rowcount == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        failing.result(5)
+    assert last.result(5).rowcount == 1
+    assert names(database) == ['first', 'last']
+    assert writer.stats()['batches'] == 1
+    assert writer.stats()['failed_commands'] == 1
+
+
+def test_futures_resolve_only_after_commit(writer, database):
+    running, release = threading.Event(), threading.Event()
+
+    def slow(cursor):
+        running.set()
+        release.wait(5)
+
+    first = writer.submit_statement(*insert('first'))
+    writer.submit(slow)
+    assert running.wait(5)
+    # 'first' ran, but its batch has not committed yet
+    assert not first.done()
+    assert names(database) == []
+    release.set()
+    first.result(5)
+    assert names(database) == ['first']
+
+
+def test_stop_flushes_queued_work(database):
+    queue = WriteQueue(database, batch_window=0.05)
+    futures = [queue.submit_statement(*insert(f'item{i}')) for i in range(5)]
+    queue.stop()
+    assert all(f.done() for f in futures)
+    assert len(names(database)) == 5
+    with pytest.raises(WriteQueueClosed):
+        queue.submit_statement(*insert('late'))
+
+
+def test_no_future_is_left_hanging_by_a_concurrent_stop(database):
+    queue = WriteQueue(database, batch_window=0.001)
+    futures, lock = [], threading.Lock()
+
+    def submitter(n):
+        for i in range(1000):
+            try:
+                future = queue.submit_statement(*insert(f'{n}-{i}'))
+            except WriteQueueClosed:
+                return
+            with lock:
+                futures.append(future)
+
+    threads = [threading.Thread(target=submitter, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    queue.stop()
+    for thread in threads:
+        thread.join(5)
+    # Every accepted command was written: stop() only closes the door
+    assert all(f.result(5).rowcount == 1 for f in futures)
+    assert len(names(database)) == len(futures)
+
+
+def test_commands_the_writer_never_runs_fail(database):
+    queue = WriteQueue(database)
+    queue._start_locked = lambda: None  # no writer thread, as if it had died
+    future = queue.submit_statement(*insert('orphan'))
+    queue.stop()
+    with pytest.raises(WriteQueueClosed):
+        future.result(0)
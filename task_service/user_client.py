@@ -0,0 +1,80 @@
+# task_service/user_client.py
+"""Profile lookups against user_service, cached for a short time"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserServiceClient:
+    """GET /api/users/profile/<id> with a bounded TTL cache in front"""
+
+    def __init__(self, base_url, ttl=60.0, max_entries=10000, timeout=2.0):
+        self.base_url = base_url.rstrip('/')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._cache = OrderedDict()
+        self._session = None  # requests.Session: keep-alive connections to user_service
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['USER_SERVICE_URL'],
+            ttl=config['PROFILE_CACHE_TTL'],
+            max_entries=config['PROFILE_CACHE_SIZE'],
+        )
+
+    def get_profile(self, user_id):
+        """Profile dict, or None if the user does not exist or the service is down"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(user_id)
+                self.counters['hits'] += 1
+                return entry[1]
+            self.counters['misses'] += 1
+
+        import requests  # deferred: keeps it off the startup path (see startup.py)
+
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+            session = self._session
+        try:
+            response = session.get(f'{self.base_url}/api/users/profile/{user_id}',
+                                    timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"User service lookup failed: {e}", file=sys.stderr)
+            with self._lock:
+                self.counters['errors'] += 1
+            return None
+        if response.status_code == 200:
+            profile = response.json().get('user')
+        elif response.status_code == 404:
+            profile = None  # cached too, so unknown ids do not hammer user_service
+        else:
+            with self._lock:
+                self.counters['errors'] += 1
+            return None
+
+        with self._lock:
+            self._cache[user_id] = (now + self.ttl, profile)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return profile
+
+    def close(self):
+        """Close pooled HTTP connections"""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._cache))
@@ -0,0 +1,262 @@
+# task_service/write_queue.py
+"""
+Single-writer queue with group commit.
+
+Route handlers never write to SQLite themselves. They submit a write command
+to the WriteQueue and wait on the returned future. A dedicated writer thread
+owns the only write connection, collects whatever commands arrive within a
+short batch window and runs them in ONE transaction, so N concurrent writes
+cost one lock acquisition and one fsync instead of N.
+
+Every command runs inside its own SAVEPOINT, so a command that fails (for
+example an IntegrityError) only rolls back its own changes; the rest of the
+batch still commits. Futures are completed only after COMMIT returns, so a
+caller never sees a result that is not durable yet.
+
+stop() flushes everything submitted before it. Submitting and stopping take
+the same lock, so no command can be queued behind the stop marker; a command
+that is still unwritten when the writer thread is gone fails with
+WriteQueueClosed instead of leaving its caller waiting.
+
+An optional `lock` is held for each batch, from BEGIN to COMMIT. Shared-cache
+in-memory databases pass the same lock to their readers, which have no busy
+wait on table locks and must not see a batch before it commits.
+"""
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+
+class WriteResult:
+    """Outcome of a single write statement"""
+    __slots__ = ('lastrowid', 'rowcount')
+
+    def __init__(self, lastrowid, rowcount):
+        self.lastrowid = lastrowid
+        self.rowcount = rowcount
+
+    def __repr__(self):
+        return f"WriteResult(lastrowid={self.lastrowid}, rowcount={self.rowcount})"
+
+
+class WriteQueueClosed(RuntimeError):
+    """Raised when a write is submitted after the queue was stopped"""
+
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Batches write commands from many threads into group commits"""
+
+    def __init__(self, database_path, batch_window=0.002, max_batch=256,
+                 busy_timeout=5.0, name='sqlite-writer', lock=None):
+        self.database_path = database_path
+        self.lock = lock
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.busy_timeout = busy_timeout
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Counters exposed through stats()
+        self.batches = 0
+        self.commands = 0
+        self.failed_commands = 0
+        self.largest_batch = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the writer thread (idempotent)"""
+        with self._lock:
+            self._closed = False
+            self._start_locked()
+
+    def _start_locked(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Flush pending commands and stop the writer thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                return  # still flushing; it completes what is queued
+        self._fail_pending(WriteQueueClosed('write queue stopped before the command ran'))
+
+    def _fail_pending(self, error):
+        """Fail the futures of commands the writer thread will never run"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(error)
+
+    @property
+    def pending(self):
+        """Approximate number of commands waiting to be written"""
+        return self._queue.qsize()
+
+    # ------------------------------------------------------------------
+    # Submitting work
+    # ------------------------------------------------------------------
+    def submit(self, command):
+        """
+        Queue a write command and return a Future.
+
+        `command` is a callable that receives the writer's sqlite3 cursor and
+        returns the value the future should resolve to. It must only run SQL;
+        the queue owns the transaction.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise WriteQueueClosed('write queue is stopped')
+            self._start_locked()
+            self._queue.put((command, future))
+        return future
+
+    def submit_statement(self, sql, params=()):
+        """Queue a single statement; the future resolves to a WriteResult"""
+        def command(cursor):
+            cursor.execute(sql, params)
+            return WriteResult(cursor.lastrowid, cursor.rowcount)
+        return self.submit(command)
+
+    def execute(self, sql, params=(), timeout=None):
+        """Queue a single statement and wait for its WriteResult"""
+        return self.submit_statement(sql, params).result(timeout)
+
+    def stats(self):
+        """Counters for the health/admin endpoints"""
+        return {
+            'pending': self.pending,
+            'batches': self.batches,
+            'commands': self.commands,
+            'failed_commands': self.failed_commands,
+            'largest_batch': self.largest_batch,
+            'avg_batch_size': round(self.commands / self.batches, 2) if self.batches else 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database_path,
+            timeout=self.busy_timeout,
+            isolation_level=None,  # we issue BEGIN/COMMIT ourselves
+            check_same_thread=False,
+            uri=self.database_path.startswith('file:'),  # shared-cache in-memory shards
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _collect_batch(self, first):
+        """Gather commands that arrive within the batch window"""
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is _STOP:
+                    stopping = True
+                    # Drain anything submitted before stop() was called
+                    batch = []
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is not _STOP:
+                            batch.append(item)
+                else:
+                    batch = self._collect_batch(first)
+                    if batch[-1] is _STOP:
+                        batch.pop()
+                        stopping = True
+                if batch:
+                    with self.lock or nullcontext():
+                        self._write_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, batch):
+        cursor = conn.cursor()
+        results = []
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for command, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    results.append(None)
+                    continue
+                cursor.execute('SAVEPOINT write_cmd')
+                try:
+                    value = command(cursor)
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write_cmd')
+                    cursor.execute('RELEASE write_cmd')
+                    self.failed_commands += 1
+                    results.append((False, e))
+                else:
+                    cursor.execute('RELEASE write_cmd')
+                    results.append((True, value))
+            cursor.execute('COMMIT')
+        except Exception as e:
+            print(f"WRITE BATCH ERROR: {e}", file=sys.stderr)
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for _, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.commands += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        for (_, future), outcome in zip(batch, results):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
@@ -1,71 +1,99 @@
+import time
+STARTED = time.perf_counter()  # start of the 'import' startup phase
 # Enable config loading from .env files
 from dotenv import load_dotenv
 load_dotenv('.env.development')  # Load environment variables
 # user_service/app.py
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import sqlite3
+import atexit
+import base64
 import hashlib
+import json
 import os
 from datetime import datetime
 import traceback
 import sys
 from config import get_config  # .env config loader
+from storage import create_user_store, DuplicateUserError, PREFIX_COLUMNS
+from backup import BackupManager, BackupInProgress
+from admission import AdmissionController
+from idempotency import IdempotencyKeys
+from user_cache import UserCache
+from startup import Startup
+from shutdown import GracefulShutdown
 
 app = Flask(__name__)
 
 # Load configuration
 env = os.getenv('FLASK_ENV', 'development')
-app.config.from_object(get_config(env))
-get_config(env).init_app(app)
+config_class = get_config(env)
+app.config.from_object(config_class)
+config_class.init_app(app)
 
 # Setup CORS with configured origins
 CORS(app, origins=app.config['CORS_ORIGINS'])
 
-# Database setup
-DATABASE = os.environ.get('DATABASE', 'users.db')
+# Migrations and warmup run before GET /ready turns 200 (see startup.py)
+startup = Startup('user-service', started=STARTED)
+startup.init_app(app)
 
-# Ensure the database file exists
-def ensure_data_directory():
-    db_dir = os.path.dirname(DATABASE)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir, exist_ok=True)
+# SIGTERM: fail readiness, drain in-flight requests, close the store, exit (see shutdown.py)
+shutdown = GracefulShutdown.from_config(app.config, startup)
+shutdown.init_app(app)
 
-# def get_db():
-#     """Get database connection using config"""
-#     conn = sqlite3.connect(app.config['DATABASE_PATH'])
-#     conn.row_factory = sqlite3.Row
-#     return conn
+# User persistence goes through a UserStore (storage/); the backend is chosen
+# by STORAGE_BACKEND in config
+store = create_user_store(app.config)
+atexit.register(store.close)
 
-def get_db_connection():
-    """Get database connection using config"""
-    try:
-        conn = sqlite3.connect(app.config['DATABASE_PATH'])
-        conn.row_factory = sqlite3.Row
-        return conn
-    except Exception as e:
-        print(f"ERROR connecting to database: {e}", file=sys.stderr)
-        raise
+# Online snapshots of the users database (SQLite files only; nothing to snapshot in memory)
+backups = None
+if store.backend == 'sqlite' and not store.in_memory:
+    backups = BackupManager.from_config(
+        app.config,
+        sources=lambda: [('users', store.database_path)],
+    )
+    atexit.register(backups.stop)
+
+# Per-client rate limits (login attempts count against the write budget)
+admission = AdmissionController.from_config(app.config)
+admission.init_app(app)
+atexit.register(admission.close)
+
+# Safe retries of POST /api/users/register (Idempotency-Key header)
+idempotency = IdempotencyKeys.from_config(
+    app.config, purge=lambda now: store.purge_idempotency_keys(now)
+)
+
+# Users by id, username and email for logins and profile reads (see user_cache.py)
+user_cache = UserCache.from_config(app.config)
+
+# After draining: no new backups, connections closed
+shutdown.on_shutdown('background_jobs', lambda: stop_background_jobs())
+shutdown.on_shutdown('stores', lambda: store.close())
+shutdown.on_shutdown('rate_limits', admission.close)
 
 def init_db():
     """Initialize the database with user table"""
     print("Initializing database...", file=sys.stderr)
-    ensure_data_directory()
-    conn = get_db_connection()
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP,
-            last_login TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    store.init_schema()
     print("Database initialized successfully!", file=sys.stderr)
 
+def warm_up():
+    """Open connections and cache the newest profiles before taking traffic"""
+    store.warm()
+    if app.config['STARTUP_WARM_USERS']:
+        user_cache.prime(store.list_users(limit=app.config['STARTUP_WARM_USERS']))
+
+def start_background_jobs():
+    if backups is not None:
+        backups.start_scheduler(app.config['BACKUP_INTERVAL'])
+
+def stop_background_jobs():
+    if backups is not None:
+        backups.stop()
+
 def hash_password(password):
     """Simple password hashing (use bcrypt in production)"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -81,15 +109,25 @@ def health_check():
     Health check endpoint for Kubernetes probes.
     Returns 200 if service is healthy.
     """
+    if startup.state == 'failed':
+        return jsonify({
+            'status': 'unhealthy',
+            'service': 'user-service',
+            'error': f'Startup failed: {startup.error}',
+            'timestamp': datetime.now().isoformat()
+        }), 503
     try:
         # Test database connection
-        conn = get_db_connection()
-        conn.execute('SELECT 1')
-        conn.close()
+        store.ping()
         
         return jsonify({
             'status': 'healthy',
             'service': 'user-service',
+            'admission': admission.stats(),
+            'idempotency': idempotency.stats(),
+            'user_cache': user_cache.stats(),
+            'startup': startup.stats(),
+            'shutdown': shutdown.stats(),
             'timestamp': datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -112,6 +150,11 @@ def register_user():
     print(f"Raw data: {request.data}", file=sys.stderr)
 
     try:
+        try:
+            idempotency_key = idempotency.request_key()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         data = request.get_json()
         print(f"Parsed JSON: {data}", file=sys.stderr)
 
@@ -133,37 +176,41 @@ def register_user():
         
         print(f"Username: {username}, Email: {email}", file=sys.stderr)
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Hash password
         password_hash = hash_password(password)
         
         # Explicitly set created_at to avoid SQLite DEFAULT issues
         created_at = datetime.now().isoformat()
         
-        # Insert new user
-        cursor.execute(
-            'INSERT INTO users (username, email, password_hash, created_at) VALUES (?, ?, ?, ?)',
-            (username, email, password_hash, created_at)
-        )
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        
-        print(f"User created successfully: ID={user_id}", file=sys.stderr)
+        def create(record=None):
+            user_id = store.create_user(username, email, password_hash, created_at, idempotency=record)
+            user_cache.forget_keys(username, email)
+            print(f"User created successfully: ID={user_id}", file=sys.stderr)
+            return user_id
         
-        return jsonify({
-            'message': 'User registered successfully',
-            'user': {
-                'id': user_id,
-                'username': username,
-                'email': email
+        def respond(user_id):
+            return 201, {
+                'message': 'User registered successfully',
+                'user': {
+                    'id': user_id,
+                    'username': username,
+                    'email': email
+                }
             }
-        }), 201
         
-    except sqlite3.IntegrityError as e:
-        print(f"IntegrityError: {str(e)}", file=sys.stderr)
+        if idempotency_key is not None:
+            return idempotency.run(
+                None, idempotency_key, idempotency.fingerprint(data),
+                lambda at: store.get_idempotent_response(idempotency_key, at),
+                create, respond
+            )
+        
+        # Insert new user
+        status, body = respond(create())
+        return jsonify(body), status
+        
+    except DuplicateUserError as e:
+        print(f"DuplicateUserError: {str(e)}", file=sys.stderr)
         return jsonify({'error': 'Username or email already exists'}), 409
         
     except Exception as e:
@@ -188,24 +235,15 @@ def login_user():
         username = data['username'].strip()
         password = data['password']
         
-        conn = get_db_connection()
-        user = conn.execute(
-            'SELECT * FROM users WHERE username = ? OR email = ?',
-            (username, username)
-        ).fetchone()
+        user = user_cache.find_for_login(username, store.find_for_login)
         
         if not user or not verify_password(password, user['password_hash']):
-            conn.close()
             return jsonify({'error': 'Invalid username or password'}), 401
         
         # Update last login
         last_login = datetime.now().isoformat()
-        conn.execute(
-            'UPDATE users SET last_login = ? WHERE id = ?',
-            (last_login, user['id'])
-        )
-        conn.commit()
-        conn.close()
+        store.record_login(user['id'], last_login)
+        user_cache.apply(user['id'], {'last_login': last_login})
         
         return jsonify({
             'message': 'Login successful',
@@ -225,60 +263,126 @@ def login_user():
 def get_user_profile(user_id):
     """Get user profile by ID"""
     try:
-        conn = get_db_connection()
-        user = conn.execute(
-            'SELECT id, username, email, created_at, last_login FROM users WHERE id = ?',
-            (user_id,)
-        ).fetchone()
-        conn.close()
+        user = user_cache.get_profile(user_id, store.get_user)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'created_at': user['created_at'],
-                'last_login': user['last_login']
-            }
-        }), 200
+        return jsonify({'user': user}), 200
         
     except Exception as e:
         print(f"Profile error: {str(e)}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         return jsonify({'error': 'Internal server error'}), 500
 
+def encode_cursor(*position):
+    """Opaque keyset cursor for the page after this user (a row's keyset columns)"""
+    raw = json.dumps(position).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, prefix=None):
+    """
+    The store's `after` from encode_cursor(): (created_at, id), or (column,
+    value, id) for a prefix search. ValueError if it is not one
+    """
+    try:
+        position = tuple(json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if prefix:
+        valid = (len(position) == 3 and position[0] in PREFIX_COLUMNS
+                 and isinstance(position[1], str) and isinstance(position[2], int))
+    else:
+        valid = len(position) == 2 and isinstance(position[0], str) and isinstance(position[1], int)
+    if not valid:
+        raise ValueError('Invalid cursor')
+    return position
+
 @app.route('/api/users', methods=['GET'])
 def list_users():
-    """List all users (for development/admin purposes)"""
+    """One page of users, newest first, or the users matching a username/email prefix"""
     try:
-        conn = get_db_connection()
-        users = conn.execute(
-            'SELECT id, username, email, created_at, last_login FROM users ORDER BY created_at DESC'
-        ).fetchall()
-        conn.close()
+        prefix = request.args.get('q', '').strip() or None
+        if request.args.get('count', '').lower() in ('1', 'true', 'yes'):
+            return jsonify({'count': store.count_users(prefix)}), 200
         
-        user_list = []
-        for user in users:
-            user_list.append({
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'created_at': user['created_at'],
-                'last_login': user['last_login']
-            })
+        try:
+            limit = int(request.args.get('limit', app.config['USER_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        try:
+            after = decode_cursor(request.args['cursor'], prefix) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not 1 <= limit <= app.config['USER_PAGE_MAX']:
+            return jsonify({'error': f"limit must be between 1 and {app.config['USER_PAGE_MAX']}"}), 400
+        
+        # One row more than asked tells whether there is a next page
+        rows = store.list_users_json(limit + 1, after=after, prefix=prefix)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        page = {'limit': limit, 'next_cursor': encode_cursor(*rows[-1][1:]) if more else None}
         
-        return jsonify({'users': user_list}), 200
+        # Profiles come encoded by the store; only the page object is encoded here
+        body = '{"users":[' + ','.join(row[0] for row in rows) + '],"page":' + json.dumps(page) + '}\n'
+        return app.response_class(body, mimetype='application/json'), 200
         
     except Exception as e:
         print(f"List users error: {str(e)}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/users/export', methods=['GET'])
+def export_users():
+    """All users (or those matching ?q=) as NDJSON, streamed in keyset batches"""
+    prefix = request.args.get('q', '').strip() or None
+    batch = app.config['USER_EXPORT_BATCH']
+    user_store = store  # the store this request started with, for the whole stream
+    
+    def generate():
+        after = None
+        while True:
+            # A short query per batch: no connection or lock is held between them
+            rows = user_store.list_users_json(batch, after=after, prefix=prefix)
+            if not rows:
+                return
+            yield ''.join(row[0] + '\n' for row in rows)
+            if len(rows) < batch:
+                return
+            after = rows[-1][1:]
+    
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/admin/backups', methods=['GET', 'POST'])
+def admin_backups():
+    """Backup progress and snapshot list (GET) or start a snapshot (POST)"""
+    if backups is None:
+        return jsonify({'error': f"Backups are not supported for '{store.backend}' storage"}), 404
+    
+    if request.method == 'POST':
+        try:
+            backups.start_snapshot()
+        except BackupInProgress:
+            return jsonify({'error': 'A backup is already running', 'status': backups.status()}), 409
+        return jsonify({'message': 'Backup started', 'status': backups.status()}), 202
+    
+    try:
+        return jsonify({
+            'status': backups.status(),
+            'snapshots': backups.list_snapshots()
+        }), 200
+    except Exception as e:
+        print(f"Backup status error: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return jsonify({'error': 'Internal server error'}), 500
+
 if __name__ == '__main__':
-    init_db()
+    # Serve /health and /ready at once; everything else waits for these phases
+    startup.start(
+        [('migrate', init_db), ('warm', warm_up)],
+        after_ready=[('background_jobs', start_background_jobs)],
+    )
+    shutdown.install()
     print(f"🚀 User Service starting in {env} mode")
     print(f"📊 Database: {app.config['DATABASE_PATH']}")
     print(f"🔧 Debug: {app.config['DEBUG']}")
@@ -0,0 +1,345 @@
+# user_service/backup.py
+"""
+Online hot backups.
+
+A snapshot copies every source database with `VACUUM INTO`, which reads the
+whole database inside one read transaction, so commits made meanwhile cannot
+restart or tear the copy (the paged backup API starts over after every write
+from another connection, so under steady writes it may never finish). The
+users file is not in WAL mode, so writes wait for the copy; for a users table
+that takes milliseconds, well inside their busy timeout. The copy is checked
+with `PRAGMA quick_check` and gzipped, and its SHA-256 checksum is recorded
+in the snapshot's manifest.json. Snapshots live in BACKUP_DIR/<timestamp>/
+and only the newest BACKUP_RETENTION are kept.
+
+Command line (run from the service directory):
+    python backup.py create
+    python backup.py list
+    python backup.py restore <snapshot> [--only NAME]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+class BackupInProgress(RuntimeError):
+    """Raised when a backup is requested while another one is running"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BackupManager:
+    """Creates, schedules, prunes and restores snapshots"""
+
+    def __init__(self, sources, backup_dir, retention=7, extra_files=None):
+        # sources: callable returning [(name, database_path)], so shard
+        # layouts that change at runtime are picked up by the next backup
+        self._sources = sources
+        self.extra_files = extra_files or (lambda: [])
+        self.backup_dir = Path(backup_dir)
+        self.retention = retention
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._scheduler = None
+        self._stop = threading.Event()
+        self._progress = {}
+        self.last_result = None
+
+    @classmethod
+    def from_config(cls, config, sources, extra_files=None):
+        return cls(
+            sources,
+            config['BACKUP_DIR'],
+            retention=config['BACKUP_RETENTION'],
+            extra_files=extra_files,
+        )
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+    def status(self):
+        """Progress of the running backup plus the last result"""
+        with self._lock:
+            progress = dict(self._progress)
+            running = self._running
+        if running and progress.get('started'):
+            elapsed = time.monotonic() - progress.pop('started')
+            progress['elapsed_seconds'] = round(elapsed, 3)
+            progress['throughput_bytes_per_sec'] = (
+                int(progress['bytes_copied'] / elapsed) if elapsed > 0 else 0
+            )
+        else:
+            progress.pop('started', None)
+        return {
+            'state': 'running' if running else 'idle',
+            'progress': progress if running else None,
+            'last_result': self.last_result,
+        }
+
+    def list_snapshots(self):
+        """Snapshots on disk, newest first"""
+        snapshots = []
+        if not self.backup_dir.exists():
+            return snapshots
+        for manifest_path in sorted(self.backup_dir.glob('*/manifest.json'), reverse=True):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            manifest['path'] = str(manifest_path.parent)
+            snapshots.append(manifest)
+        return snapshots
+
+    # ------------------------------------------------------------------
+    # Creating snapshots
+    # ------------------------------------------------------------------
+    def _copy_database(self, source_path, target_path, name):
+        """Consistent copy from a single read transaction; returns (pages, page_size)"""
+        with self._lock:
+            self._progress['database'] = name
+        src = sqlite3.connect(source_path, timeout=30)
+        try:
+            src.execute('VACUUM INTO ?', (target_path,))
+        finally:
+            src.close()
+        dst = sqlite3.connect(target_path)
+        try:
+            check = dst.execute('PRAGMA quick_check').fetchone()[0]
+            if check != 'ok':
+                raise RuntimeError(f"quick_check failed for {name}: {check}")
+            pages = dst.execute('PRAGMA page_count').fetchone()[0]
+            page_size = dst.execute('PRAGMA page_size').fetchone()[0]
+        finally:
+            dst.close()
+        with self._lock:
+            self._progress['bytes_copied'] += pages * page_size
+            self._progress['databases_done'] += 1
+        return pages, page_size
+
+    def _begin(self):
+        """Claim the single backup slot (BackupInProgress if it is taken)"""
+        with self._lock:
+            if self._running:
+                raise BackupInProgress('a backup is already running')
+            self._running = True
+            self._progress = {'started': time.monotonic(), 'bytes_copied': 0, 'databases_done': 0}
+
+    def create_snapshot(self):
+        """Take a snapshot of every source now; returns its manifest"""
+        self._begin()
+        return self._snapshot()
+
+    def _snapshot(self):
+        """Body of create_snapshot(); the caller has claimed the slot"""
+        started = time.monotonic()
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        snapshot_dir = self.backup_dir / stamp
+        partial_dir = self.backup_dir / f".{stamp}.partial"
+        try:
+            partial_dir.mkdir(parents=True, exist_ok=True)
+            manifest = {'created_at': datetime.now().isoformat(), 'databases': [], 'files': []}
+
+            for name, source_path in self._sources():
+                db_started = time.monotonic()
+                raw_path = partial_dir / f"{name}.db"
+                pages, page_size = self._copy_database(source_path, str(raw_path), name)
+
+                archive_path = partial_dir / f"{name}.db.gz"
+                with open(raw_path, 'rb') as raw, gzip.open(archive_path, 'wb', compresslevel=6) as gz:
+                    shutil.copyfileobj(raw, gz, 1024 * 1024)
+                raw_size = raw_path.stat().st_size
+                raw_path.unlink()
+
+                manifest['databases'].append({
+                    'name': name,
+                    'source': source_path,
+                    'file': archive_path.name,
+                    'sha256': _sha256(archive_path),
+                    'pages': pages,
+                    'page_size': page_size,
+                    'bytes': raw_size,
+                    'compressed_bytes': archive_path.stat().st_size,
+                    'seconds': round(time.monotonic() - db_started, 3),
+                })
+
+            for file_path in self.extra_files():
+                if file_path and os.path.exists(file_path):
+                    shutil.copy2(file_path, partial_dir / Path(file_path).name)
+                    manifest['files'].append({
+                        'source': file_path,
+                        'file': Path(file_path).name,
+                        'sha256': _sha256(partial_dir / Path(file_path).name),
+                    })
+
+            duration = time.monotonic() - started
+            total_bytes = sum(db['bytes'] for db in manifest['databases'])
+            manifest['seconds'] = round(duration, 3)
+            manifest['throughput_bytes_per_sec'] = int(total_bytes / duration) if duration > 0 else 0
+            with open(partial_dir / 'manifest.json', 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            # Only complete snapshots get a visible name
+            os.replace(partial_dir, snapshot_dir)
+            manifest['path'] = str(snapshot_dir)
+            self.last_result = {'ok': True, 'snapshot': str(snapshot_dir),
+                                'seconds': manifest['seconds'],
+                                'throughput_bytes_per_sec': manifest['throughput_bytes_per_sec']}
+            self.prune()
+            print(f"Backup written to {snapshot_dir} in {duration:.2f}s", file=sys.stderr)
+            return manifest
+        except Exception as e:
+            shutil.rmtree(partial_dir, ignore_errors=True)
+            self.last_result = {'ok': False, 'error': str(e),
+                                'finished_at': datetime.now().isoformat()}
+            print(f"BACKUP ERROR: {e}", file=sys.stderr)
+            raise
+        finally:
+            with self._lock:
+                self._running = False
+
+    def start_snapshot(self):
+        """
+        Run a snapshot in a background thread. The slot is claimed before
+        returning, so of two concurrent callers exactly one gets a thread
+        and the other BackupInProgress.
+        """
+        self._begin()
+        thread = threading.Thread(target=self._run_quietly, name='backup', daemon=True)
+        try:
+            thread.start()
+        except Exception:
+            with self._lock:
+                self._running = False
+            raise
+        return thread
+
+    def _run_quietly(self):
+        try:
+            self._snapshot()
+        except Exception:
+            pass  # recorded in last_result
+
+    def prune(self):
+        """Delete snapshots beyond the retention count"""
+        snapshots = sorted(p.parent for p in self.backup_dir.glob('*/manifest.json'))
+        for old in snapshots[:-self.retention] if self.retention > 0 else []:
+            shutil.rmtree(old, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Schedule
+    # ------------------------------------------------------------------
+    def start_scheduler(self, interval):
+        """Take a snapshot every `interval` seconds"""
+        if interval <= 0 or self._scheduler is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.create_snapshot()
+                except BackupInProgress:
+                    pass
+                except Exception:
+                    pass  # recorded in last_result
+
+        self._scheduler = threading.Thread(target=loop, name='backup-scheduler', daemon=True)
+        self._scheduler.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Restore
+    # ------------------------------------------------------------------
+    def restore(self, snapshot, only=None):
+        """
+        Verify and restore a snapshot over the current databases.
+
+        The copy goes through the backup API into the live file, so running
+        processes see the restored data on their next query without a restart.
+        """
+        snapshot_dir = Path(snapshot)
+        if not snapshot_dir.is_absolute() and not snapshot_dir.exists():
+            snapshot_dir = self.backup_dir / snapshot
+        with open(snapshot_dir / 'manifest.json') as f:
+            manifest = json.load(f)
+
+        targets = dict(self._sources())
+        restored = []
+        for db in manifest['databases']:
+            if only and db['name'] not in only:
+                continue
+            archive_path = snapshot_dir / db['file']
+            if _sha256(archive_path) != db['sha256']:
+                raise ValueError(f"checksum mismatch for {archive_path}")
+            target = targets.get(db['name'], db['source'])
+
+            with tempfile.TemporaryDirectory() as tmp:
+                raw_path = os.path.join(tmp, 'restore.db')
+                with gzip.open(archive_path, 'rb') as gz, open(raw_path, 'wb') as raw:
+                    shutil.copyfileobj(gz, raw, 1024 * 1024)
+                src = sqlite3.connect(raw_path)
+                dst = sqlite3.connect(target, timeout=30)
+                try:
+                    src.backup(dst)
+                finally:
+                    dst.close()
+                    src.close()
+            restored.append({'name': db['name'], 'target': target})
+
+        for extra in manifest.get('files', []):
+            if only:
+                continue
+            copy_path = snapshot_dir / extra['file']
+            if _sha256(copy_path) != extra['sha256']:
+                raise ValueError(f"checksum mismatch for {copy_path}")
+            shutil.copy2(copy_path, extra['source'])
+            restored.append({'name': extra['file'], 'target': extra['source']})
+        return restored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Online database backups')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('create')
+    sub.add_parser('list')
+    p = sub.add_parser('restore')
+    p.add_argument('snapshot', help='snapshot directory or its name in BACKUP_DIR')
+    p.add_argument('--only', action='append', help='restore only this database (repeatable)')
+    args = parser.parse_args(argv)
+
+    from app import backups
+    if backups is None:
+        print("Backups are only available for the sqlite storage backend", file=sys.stderr)
+        return 1
+
+    if args.command == 'create':
+        manifest = backups.create_snapshot()
+        print(f"Snapshot {manifest['path']} ({manifest['seconds']}s)")
+    elif args.command == 'list':
+        for snap in backups.list_snapshots():
+            size = sum(db['compressed_bytes'] for db in snap['databases'])
+            print(f"{Path(snap['path']).name}  {snap['created_at']}  {size} bytes")
+    elif args.command == 'restore':
+        for item in backups.restore(args.snapshot, only=args.only):
+            print(f"Restored {item['name']} -> {item['target']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
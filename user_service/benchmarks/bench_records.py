@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+bench_records.py - Memory and CPU of cached users and directory pages
+
+Usage:
+    python benchmarks/bench_records.py [--users 5000] [--page 100] [--iterations 200]
+
+Each path is run the old way ('before', reimplemented here) and the way the
+service does it now ('after'):
+  cache      one dict per cached user  vs  a slotted UserRecord
+  directory  page of sqlite3.Row -> dicts, then json.dumps  vs  rows encoded by SQLite
+  export     the whole table in the same two ways, as NDJSON
+
+'cache' reports what the filled cache holds per user (tracemalloc, after a
+collection). For the other paths, 'peak KiB' is the tracemalloc high-water
+mark of one call, above what was allocated before it: the transient memory a
+request needs. 'B/row' divides it by the rows returned. 'us' is CPU time per
+call (measured without tracemalloc, which slows allocation down).
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import LOGIN_FIELDS, PROFILE_FIELDS, UserRecord  # noqa: E402
+from storage.sqlite import SqliteUserStore  # noqa: E402
+
+
+def make_store(tmp_dir, users):
+    store = SqliteUserStore(os.path.join(tmp_dir, 'users.db'))
+    store.init_schema()
+    for i in range(users):
+        store.create_user(f'user{i}', f'user{i}@example.com', 'pbkdf2:sha256:600000$' + 'x' * 80,
+                          f'2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}')
+    return store
+
+
+# ----------------------------------------------------------------------
+# The previous implementations
+# ----------------------------------------------------------------------
+def list_users_before(store, limit):
+    with store._connection() as conn:
+        rows = conn.execute(
+            f'SELECT {", ".join(PROFILE_FIELDS)} FROM users WHERE 1 '
+            f'ORDER BY created_at DESC, id DESC LIMIT ?', (limit,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def page_before(store, limit):
+    users = list_users_before(store, limit)
+    return json.dumps({'users': users, 'page': {'limit': limit, 'next_cursor': None}})
+
+
+def page_after(store, limit):
+    rows = store.list_users_json(limit)
+    return '{"users":[' + ','.join(row[0] for row in rows) + '],"page":' + json.dumps(
+        {'limit': limit, 'next_cursor': None}) + '}'
+
+
+def export_before(store, limit):
+    return ''.join(json.dumps(row) + '\n' for row in list_users_before(store, limit))
+
+
+def export_after(store, limit):
+    return ''.join(row[0] + '\n' for row in store.list_users_json(limit))
+
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+def cpu_per_call(fn, iterations):
+    fn()  # warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations
+
+
+def peak_bytes(fn):
+    fn()  # warm up: statement caches
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def held_bytes(build):
+    """Memory still allocated by build()'s result once it returns"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    del result
+    return held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--page', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(tmp, args.users)
+        try:
+            logins = [store.find_for_login(f'user{i}') for i in range(args.users)]
+            held = [held_bytes(lambda: [dict(user) for user in logins]),
+                    held_bytes(lambda: [UserRecord.from_dict(user) for user in logins])]
+            assert UserRecord.from_dict(logins[0]).login() == {f: logins[0][f] for f in LOGIN_FIELDS}
+
+            print(f"{'path':<10} {'rows':>6} {'before us':>10} {'after us':>9} "
+                  f"{'before KiB':>11} {'after KiB':>10} {'before B/row':>13} {'after B/row':>12}")
+            print(f"{'cache':<10} {args.users:>6} {'-':>10} {'-':>9} "
+                  f"{held[0] / 1024:>11.1f} {held[1] / 1024:>10.1f} "
+                  f"{held[0] / args.users:>13.0f} {held[1] / args.users:>12.0f}")
+
+            paths = {
+                'directory': (args.page, page_before, page_after),
+                'export': (args.users, export_before, export_after),
+            }
+            for name, (rows, before, after) in paths.items():
+                same = [[json.loads(line) for line in fn(store, rows).splitlines()] for fn in (before, after)]
+                assert same[0] == same[1]
+                iterations = max(1, args.iterations * args.page // rows)
+                cpu = [cpu_per_call(lambda: fn(store, rows), iterations) * 1e6 for fn in (before, after)]
+                peak = [peak_bytes(lambda: fn(store, rows)) for fn in (before, after)]
+                print(f"{name:<10} {rows:>6} {cpu[0]:>10.0f} {cpu[1]:>9.0f} "
+                      f"{peak[0] / 1024:>11.1f} {peak[1] / 1024:>10.1f} "
+                      f"{peak[0] / rows:>13.0f} {peak[1] / rows:>12.0f}")
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+bench_storage.py - Compare user storage backends under concurrent load
+
+Usage:
+    python benchmarks/bench_storage.py [--threads 16] [--ops 4000]
+    TEST_POSTGRES_DSN=postgresql://localhost/users_bench python benchmarks/bench_storage.py
+
+The mix follows real traffic: logins (lookup + last_login write) and profile
+reads dominate, with one registration per ten operations. SQLite always
+runs; PostgreSQL runs when TEST_POSTGRES_DSN is set.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import DuplicateUserError  # noqa: E402
+from storage.sqlite import SqliteUserStore  # noqa: E402
+
+
+def postgres_store(dsn):
+    from storage.postgres import PostgresUserStore
+    store = PostgresUserStore(dsn, pool_size=16)
+    store.init_schema()
+    with store.pool.connection() as conn:
+        conn.execute('TRUNCATE users RESTART IDENTITY')
+    return store
+
+
+def run_mix(store, threads, ops, seed_users=500):
+    now = '2025-01-01T00:00:00'
+    for i in range(seed_users):
+        store.create_user(f'user{i}', f'user{i}@example.com', 'hash', now)
+
+    def op(i):
+        started = time.perf_counter()
+        kind = i % 10
+        if kind == 0:
+            try:
+                store.create_user(f'new{i}', f'new{i}@example.com', 'hash', now)
+            except DuplicateUserError:
+                pass
+        elif kind < 5:
+            user = store.find_for_login(f'user{i % seed_users}')
+            store.record_login(user['id'], now)
+        else:
+            store.get_user(i % seed_users + 1)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(op, range(ops)))
+    elapsed = time.perf_counter() - started
+    return {
+        'ops_per_sec': ops / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=4000)
+    args = parser.parse_args()
+
+    backends = [('sqlite', lambda tmp: SqliteUserStore(os.path.join(tmp, 'users.db')))]
+    if os.getenv('TEST_POSTGRES_DSN'):
+        backends.append(('postgres', lambda tmp: postgres_store(os.environ['TEST_POSTGRES_DSN'])))
+
+    print(f"{'backend':<10} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, factory in backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = factory(tmp)
+            store.init_schema()
+            try:
+                result = run_mix(store, args.threads, args.ops)
+            finally:
+                store.close()
+        print(f"{name:<10} {result['ops_per_sec']:>10.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
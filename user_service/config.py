@@ -12,6 +12,50 @@ class Config:
     # Database Settings
     DATABASE_PATH = os.getenv('DATABASE', './data/users.db')
     
+    # Storage Backend ('sqlite' or 'postgres')
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+    POSTGRES_DSN = os.getenv('POSTGRES_DSN', '')
+    POSTGRES_POOL_SIZE = int(os.getenv('POSTGRES_POOL_SIZE', 10))
+    
+    # Backup Settings (online snapshots, see backup.py)
+    BACKUP_DIR = os.getenv('BACKUP_DIR', str(Path(DATABASE_PATH).parent / 'backups'))
+    BACKUP_INTERVAL = int(os.getenv('BACKUP_INTERVAL', 6 * 3600))  # seconds, 0 = off
+    BACKUP_RETENTION = int(os.getenv('BACKUP_RETENTION', 7))
+    
+    # Admission Control (rate limits and load shedding, see admission.py)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # 'memory' or 'sqlite'
+    RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', str(Path(DATABASE_PATH).parent / 'ratelimit.db'))
+    RATE_LIMIT_READ_PER_SEC = float(os.getenv('RATE_LIMIT_READ_PER_SEC', 20))
+    RATE_LIMIT_READ_BURST = int(os.getenv('RATE_LIMIT_READ_BURST', 40))
+    RATE_LIMIT_WRITE_PER_SEC = float(os.getenv('RATE_LIMIT_WRITE_PER_SEC', 5))
+    RATE_LIMIT_WRITE_BURST = int(os.getenv('RATE_LIMIT_WRITE_BURST', 10))
+    # Proxies (addresses or CIDRs) whose X-Forwarded-For names the client
+    RATE_LIMIT_TRUSTED_PROXIES = [p.strip() for p in os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '').split(',') if p.strip()]
+    MAX_INFLIGHT_WRITES = int(os.getenv('MAX_INFLIGHT_WRITES', 64))
+    
+    # Idempotency Settings (Idempotency-Key on POST /api/users/register, see idempotency.py)
+    IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', 'True').lower() == 'true'
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))  # seconds a key is remembered
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 30))
+    IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', 600))  # seconds, 0 = off
+    
+    # User Cache Settings (login and profile lookups, see user_cache.py)
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))  # users, 0 = off
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))  # seconds, 0 = until evicted
+    
+    # User Directory Settings (GET /api/users pages and /api/users/export)
+    USER_PAGE_SIZE = int(os.getenv('USER_PAGE_SIZE', 50))
+    USER_PAGE_MAX = int(os.getenv('USER_PAGE_MAX', 500))
+    USER_EXPORT_BATCH = int(os.getenv('USER_EXPORT_BATCH', 1000))  # rows per query while streaming
+    
+    # Startup Settings (readiness pipeline, see startup.py)
+    STARTUP_WARM_USERS = int(os.getenv('STARTUP_WARM_USERS', 1000))  # newest profiles cached, 0 = off
+    
+    # Shutdown Settings (SIGTERM draining, see shutdown.py)
+    SHUTDOWN_READINESS_DELAY = float(os.getenv('SHUTDOWN_READINESS_DELAY', 3))  # seconds unready before draining
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 20))  # seconds to wait for in-flight requests
+    
     # Server Settings
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 6001))
@@ -54,6 +98,8 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     DATABASE_PATH = ':memory:'  # Use in-memory database for tests
+    BACKUP_INTERVAL = 0
+    RATE_LIMIT_ENABLED = False
 
 
 # Configuration dictionary
@@ -65,13 +111,8 @@ config = {
 }
 
 
-# def get_config(env=None):
-#     """Get configuration based on environment"""
-#     if env is None:
-#         env = os.getenv('FLASK_ENV', 'development')
-#     return config.get(env, config['default'])
-
 def get_config(env=None):
-    if env == 'production':
-        return ProductionConfig()
-    return DevelopmentConfig()
\ No newline at end of file
+    """Get configuration based on environment"""
+    if env is None:
+        env = os.getenv('FLASK_ENV', 'development')
+    return config.get(env, config['default'])
\ No newline at end of file
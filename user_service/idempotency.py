@@ -0,0 +1,185 @@
+# user_service/idempotency.py
+"""
+Idempotency-Key support for POST /api/users/register.
+
+A client that sends `Idempotency-Key: <unique string>` may retry the same
+request as often as it likes (after a timeout, or hedged in parallel) and
+still create at most one user:
+
+- The first request runs normally. Its response is stored under the key in
+  the same transaction as the insert (see UserStore.create_user), so a
+  crash can never leave a user without its stored response or the other
+  way round.
+- Later requests with the same key get the stored response back, with
+  `Idempotent-Replayed: true`. Reusing a key for a different request (other
+  body or path) is a client bug and answers 422.
+- Requests that arrive while the first one is still running wait for it
+  (up to IDEMPOTENCY_WAIT_TIMEOUT) and then replay its response. A
+  duplicate in another process loses the insert race (on the key or on the
+  username) and replays as well.
+- Only successful inserts are stored. A request that failed (validation
+  error, 500) can be retried with the same key and runs again.
+
+Keys expire after IDEMPOTENCY_TTL seconds; expired rows are purged every
+IDEMPOTENCY_PURGE_INTERVAL seconds.
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify, request
+
+from storage import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeys:
+    """Replays stored responses for repeated Idempotency-Keys"""
+
+    def __init__(self, ttl=86400, wait_timeout=30.0, purge_interval=600, purge=None, enabled=True):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        # purge: callable(now) deleting expired keys, returns rows deleted
+        self.purge_interval = purge_interval
+        self.purge = purge
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._flights = {}  # (scope, key) -> Event set when the first request finishes
+        self._last_purge = time.monotonic()
+        self.counters = {'executed': 0, 'replayed': 0, 'waited': 0, 'mismatched': 0}
+
+    @classmethod
+    def from_config(cls, config, purge=None):
+        return cls(
+            ttl=config['IDEMPOTENCY_TTL'],
+            wait_timeout=config['IDEMPOTENCY_WAIT_TIMEOUT'],
+            purge_interval=config['IDEMPOTENCY_PURGE_INTERVAL'],
+            purge=purge,
+            enabled=config['IDEMPOTENCY_ENABLED'],
+        )
+
+    def request_key(self):
+        """The request's Idempotency-Key, or None; ValueError if it is unusable"""
+        key = request.headers.get(HEADER)
+        if not self.enabled or key is None:
+            return None
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters')
+        return key
+
+    @staticmethod
+    def fingerprint(payload):
+        """Hash of what makes two requests "the same": method, path and JSON body"""
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        digest = hashlib.sha256(f'{request.method} {request.path}\n{canonical}'.encode())
+        return digest.hexdigest()
+
+    def run(self, scope, key, fingerprint, lookup, create, render):
+        """
+        Response for a create request carrying an Idempotency-Key.
+
+        lookup(now) -> stored {'fingerprint', 'status', 'body'} or None
+        create(record) -> new id; must store `record` with its insert
+        render(new_id) -> (status, body dict) of the response to send and store
+        """
+        flight_key = (scope, key)
+        while True:
+            stored = lookup(datetime.now().isoformat())
+            if stored is not None:
+                return self._replay(stored, fingerprint)
+
+            with self._lock:
+                flight = self._flights.get(flight_key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[flight_key] = threading.Event()
+                else:
+                    self.counters['waited'] += 1
+            if not leader:
+                if not flight.wait(self.wait_timeout):
+                    response = jsonify({'error': f'A request with this {HEADER} is still in progress'})
+                    response.status_code = 409
+                    response.headers['Retry-After'] = '1'
+                    return response
+                # Replay the first request's response, or run again if it failed
+                continue
+
+            try:
+                return self._execute(key, fingerprint, lookup, create, render)
+            finally:
+                with self._lock:
+                    del self._flights[flight_key]
+                flight.set()
+
+    def _execute(self, key, fingerprint, lookup, create, render):
+        # Bound here: the store may call render_text() on its writer thread,
+        # outside the app context
+        dumps = current_app.json.dumps
+
+        def render_text(new_id):
+            status, body = render(new_id)
+            return status, dumps(body)
+
+        now = datetime.now()
+        record = IdempotencyRecord(key, fingerprint, now.isoformat(),
+                                   (now + timedelta(seconds=self.ttl)).isoformat(), render_text)
+        try:
+            create(record)
+        except Exception:
+            # Another process may have committed the same key first (unique
+            # constraint, or a duplicate username): answer with its response
+            stored = lookup(datetime.now().isoformat())
+            if stored is None:
+                raise
+            return self._replay(stored, fingerprint)
+
+        with self._lock:
+            self.counters['executed'] += 1
+        self._maybe_purge_later()
+        return current_app.response_class(record.body, status=record.status,
+                                          mimetype='application/json')
+
+    def _replay(self, stored, fingerprint):
+        if stored['fingerprint'] != fingerprint:
+            with self._lock:
+                self.counters['mismatched'] += 1
+            response = jsonify({'error': f'{HEADER} was already used for a different request'})
+            response.status_code = 422
+            return response
+        with self._lock:
+            self.counters['replayed'] += 1
+        response = current_app.response_class(stored['body'], status=stored['status'],
+                                              mimetype='application/json')
+        response.headers[REPLAYED_HEADER] = 'true'
+        return response
+
+    # ------------------------------------------------------------------
+    # Expiry
+    # ------------------------------------------------------------------
+    def _maybe_purge_later(self):
+        with self._lock:
+            due = self.purge_interval and time.monotonic() - self._last_purge >= self.purge_interval
+            if due:
+                self._last_purge = time.monotonic()
+        if due and self.purge is not None:
+            threading.Thread(target=self._purge, name='idempotency-purge', daemon=True).start()
+
+    def _purge(self):
+        try:
+            removed = self.purge(datetime.now().isoformat())
+            if removed:
+                print(f"Purged {removed} expired idempotency keys", file=sys.stderr)
+        except Exception as e:
+            print(f"Idempotency key purge failed: {e}", file=sys.stderr)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._flights), enabled=self.enabled)
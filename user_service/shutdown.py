@@ -0,0 +1,177 @@
+# user_service/shutdown.py
+"""
+Graceful shutdown on SIGTERM (Kubernetes rollouts, `docker stop`).
+
+The handler returns at once. A background thread then:
+
+1. fails readiness: GET /ready answers 503, so the pod leaves the Service
+   endpoints. Requests keep being served for SHUTDOWN_READINESS_DELAY
+   seconds while kube-proxy and the gateway catch up.
+2. stops accepting work: new requests (except /health, /ready and /live) get 503
+   with Retry-After and Connection: close, so clients retry on another pod.
+3. drains: waits until the requests already running are done, up to
+   SHUTDOWN_DRAIN_TIMEOUT seconds. Streamed responses count until their
+   last chunk has been sent.
+4. flushes: runs the registered steps in order (stop the backup scheduler,
+   close the database pool and rate-limit store).
+5. stops the server, which exits the process.
+
+Each phase is timed. The drain report (completed, abandoned and rejected
+requests, ms per phase) is logged and kept in stats() for /health.
+"""
+import _thread
+import signal
+import sys
+import threading
+import time
+
+from flask import jsonify, request
+from werkzeug.wsgi import ClosingIterator
+
+# Always served, whatever the state
+UNGATED_PATHS = ('/health', '/ready', '/live')
+
+
+class GracefulShutdown:
+    """SIGTERM -> fail readiness, drain in-flight requests, flush, exit"""
+
+    def __init__(self, startup, readiness_delay=3.0, drain_timeout=20.0, poll_interval=0.05):
+        self.startup = startup
+        self.readiness_delay = readiness_delay
+        self.drain_timeout = drain_timeout
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._accepting = True
+        self._started = False
+        self._steps = []  # (name, fn) run in order after draining
+        self.report = None
+        self.counters = {'completed': 0, 'rejected': 0}
+
+    @classmethod
+    def from_config(cls, config, startup):
+        return cls(
+            startup,
+            readiness_delay=config['SHUTDOWN_READINESS_DELAY'],
+            drain_timeout=config['SHUTDOWN_DRAIN_TIMEOUT'],
+        )
+
+    def init_app(self, app):
+        app.wsgi_app = self._track(app.wsgi_app)
+        app.before_request(self._gate)
+
+    def on_shutdown(self, name, fn):
+        """Run fn() once requests have drained (in registration order)"""
+        self._steps.append((name, fn))
+
+    def install(self):
+        """Handle SIGTERM; call from the main thread"""
+        signal.signal(signal.SIGTERM, self._on_signal)
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    # ------------------------------------------------------------------
+    # Request tracking
+    # ------------------------------------------------------------------
+    def _track(self, wsgi_app):
+        def tracked(environ, start_response):
+            with self._lock:
+                self._in_flight += 1
+            try:
+                body = wsgi_app(environ, start_response)
+            except BaseException:
+                self._finished()
+                raise
+            # The server closes the body after the last chunk
+            return ClosingIterator(body, self._finished)
+        return tracked
+
+    def _finished(self):
+        with self._lock:
+            self._in_flight -= 1
+            self.counters['completed'] += 1
+
+    def _gate(self):
+        if self._accepting or request.path in UNGATED_PATHS:
+            return None
+        with self._lock:
+            self.counters['rejected'] += 1
+        response = jsonify({'error': 'Service is shutting down'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        response.headers['Connection'] = 'close'
+        return response
+
+    # ------------------------------------------------------------------
+    # Shutdown
+    # ------------------------------------------------------------------
+    def _on_signal(self, signum, frame):
+        print(f"Received signal {signum}, shutting down gracefully", file=sys.stderr)
+        threading.Thread(target=self.run, kwargs={'exit_process': True},
+                         name='shutdown', daemon=True).start()
+
+    def run(self, exit_process=False):
+        """Run the shutdown sequence once; return the drain report"""
+        with self._lock:
+            if self._started:
+                return self.report
+            self._started = True
+        phases = {}
+        with self._lock:
+            completed_before = self.counters['completed']
+
+        started = time.perf_counter()
+        self.startup.state = 'draining'
+        time.sleep(self.readiness_delay)
+        phases['unready'] = _ms_since(started)
+
+        started = time.perf_counter()
+        with self._lock:
+            self._accepting = False
+            waiting = self._in_flight
+        deadline = time.monotonic() + self.drain_timeout
+        while self.in_flight > 0 and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+        phases['drain'] = _ms_since(started)
+        abandoned = self.in_flight
+
+        errors = {}
+        for name, fn in self._steps:
+            started = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                errors[name] = str(e)
+                print(f"Shutdown step '{name}' failed: {e}", file=sys.stderr)
+            phases[name] = _ms_since(started)
+
+        with self._lock:
+            self.report = {
+                'in_flight_at_drain': waiting,
+                'completed': self.counters['completed'] - completed_before,
+                'abandoned': abandoned,
+                'rejected': self.counters['rejected'],
+                'phases_ms': phases,
+            }
+            if errors:
+                self.report['errors'] = errors
+        self.startup.state = 'stopped'
+        print(f"Drained: {self.report}", file=sys.stderr)
+
+        if exit_process:
+            # Stops app.run() in the main thread, which then runs atexit hooks
+            _thread.interrupt_main()
+        return self.report
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=self._in_flight,
+                        accepting=self._accepting, report=self.report)
+
+
+def _ms_since(started):
+    return round((time.perf_counter() - started) * 1000, 1)
@@ -0,0 +1,21 @@
+# user_service/storage/__init__.py
+"""User storage backends, selected through Config.STORAGE_BACKEND"""
+from storage.base import (UserStore, DuplicateUserError, IdempotencyConflict, IdempotencyRecord,
+                          UserRecord, PROFILE_FIELDS, LOGIN_FIELDS, PREFIX_COLUMNS, page_position)
+
+
+def create_user_store(config):
+    """Build the UserStore named by config['STORAGE_BACKEND']"""
+    backend = config['STORAGE_BACKEND']
+    if backend == 'sqlite':
+        from storage.sqlite import SqliteUserStore
+        return SqliteUserStore.from_config(config)
+    if backend == 'postgres':
+        from storage.postgres import PostgresUserStore
+        return PostgresUserStore.from_config(config)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+__all__ = ['UserStore', 'DuplicateUserError', 'IdempotencyConflict', 'IdempotencyRecord',
+           'UserRecord', 'PROFILE_FIELDS', 'LOGIN_FIELDS', 'PREFIX_COLUMNS', 'page_position',
+           'create_user_store']
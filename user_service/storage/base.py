@@ -0,0 +1,180 @@
+# user_service/storage/base.py
+"""
+Storage interface for users.
+
+Routes only talk to a UserStore; which database sits behind it is chosen by
+Config.STORAGE_BACKEND. Users are returned as plain dicts.
+"""
+import json
+from abc import ABC, abstractmethod
+
+# Columns safe to return to clients (never password_hash)
+PROFILE_FIELDS = ('id', 'username', 'email', 'created_at', 'last_login')
+
+# Columns a login needs, in the order find_for_login() selects them
+LOGIN_FIELDS = PROFILE_FIELDS + ('password_hash',)
+
+# Login indexes a prefix search walks, in the order its results come back
+PREFIX_COLUMNS = ('username', 'email')
+
+# Rows read per fetchmany() when a result is turned into dicts
+FETCH_BATCH = 256
+
+
+class DuplicateUserError(Exception):
+    """Username or email is already registered"""
+
+
+class IdempotencyConflict(Exception):
+    """The Idempotency-Key already has a stored, unexpired response"""
+
+
+class IdempotencyRecord:
+    """
+    Response to store under an Idempotency-Key, in the same transaction as
+    the insert it answers. render(new_id) -> (status, JSON body text) is
+    called by the store once the id is known; the result is kept on the
+    record so the first response and every replay are byte-identical.
+    """
+    __slots__ = ('key', 'fingerprint', 'created_at', 'expires_at', 'render', 'status', 'body')
+
+    def __init__(self, key, fingerprint, created_at, expires_at, render):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.render = render
+        self.status = None
+        self.body = None
+
+    def response_for(self, new_id):
+        self.status, self.body = self.render(new_id)
+        return self.status, self.body
+
+
+class UserRecord:
+    """
+    One user as the in-process cache holds it: slots instead of a dict per
+    entry. password_hash is None until a login has read it (profile reads
+    never select it).
+    """
+    __slots__ = LOGIN_FIELDS
+
+    def __init__(self, id, username, email, created_at, last_login, password_hash=None):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.created_at = created_at
+        self.last_login = last_login
+        self.password_hash = password_hash
+
+    @classmethod
+    def from_dict(cls, user):
+        return cls(*(user.get(field) for field in LOGIN_FIELDS))
+
+    def profile(self):
+        """Profile dict (PROFILE_FIELDS)"""
+        return {field: getattr(self, field) for field in PROFILE_FIELDS}
+
+    def login(self):
+        """Dict with every LOGIN_FIELDS key, as find_for_login() returns it"""
+        return {field: getattr(self, field) for field in LOGIN_FIELDS}
+
+
+def fetch_in_batches(cursor, size=FETCH_BATCH):
+    """Rows of an executed cursor, read `size` at a time with fetchmany()"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def page_position(user, prefix=None):
+    """Keyset of a list_users() row: what `after` takes to continue behind it"""
+    if not prefix:
+        return user['created_at'], user['id']
+    column = 'username' if user['username'].lower().startswith(prefix.lower()) else 'email'
+    return column, user[column], user['id']
+
+
+class UserStore(ABC):
+    """Persistence operations used by the user routes"""
+
+    backend = None
+
+    @abstractmethod
+    def init_schema(self):
+        """Create tables and indexes if they do not exist"""
+
+    @abstractmethod
+    def ping(self):
+        """Raise if the database cannot be reached"""
+
+    @abstractmethod
+    def create_user(self, username, email, password_hash, created_at, idempotency=None):
+        """
+        Insert a user and return its id; raise DuplicateUserError on conflict
+        (usernames and emails are unique regardless of case).
+        With an IdempotencyRecord, its response is stored atomically with the
+        user (IdempotencyConflict, and no user, if the key is already taken).
+        """
+
+    @abstractmethod
+    def get_idempotent_response(self, key, now):
+        """{'fingerprint', 'status', 'body'} stored for the key, or None if absent or expired"""
+
+    @abstractmethod
+    def purge_idempotency_keys(self, now):
+        """Delete expired idempotency keys; return how many"""
+
+    @abstractmethod
+    def find_for_login(self, identifier):
+        """
+        User dict including password_hash, matched case-insensitively by
+        username or email, or None
+        """
+
+    @abstractmethod
+    def record_login(self, user_id, last_login):
+        """Store the last login timestamp"""
+
+    @abstractmethod
+    def get_user(self, user_id):
+        """Profile dict (PROFILE_FIELDS) or None"""
+
+    @abstractmethod
+    def list_users(self, limit=None, after=None, prefix=None):
+        """
+        Profiles, newest first (created_at DESC, id DESC). Keyset paging:
+        after=(created_at, id) of the last row of the previous page.
+
+        prefix keeps users whose username or email starts with it, ignoring
+        case, in index order instead: username matches by username, then
+        users matched only by their email, by email. after is then (column,
+        value, id), column being the PREFIX_COLUMNS entry the row came from.
+        """
+
+    def list_users_json(self, limit=None, after=None, prefix=None):
+        """
+        list_users() with each profile already encoded: [(JSON object text,
+        *keyset)], the keyset being the next page's `after`. Backends
+        encode rows in the database, so the routes splice them into the
+        response without a dict per user
+        """
+        return [(json.dumps(user), *page_position(user, prefix))
+                for user in self.list_users(limit, after=after, prefix=prefix)]
+
+    @abstractmethod
+    def count_users(self, prefix=None):
+        """Number of users (a maintained counter), or of those matching prefix"""
+
+    def warm(self):
+        """Open pooled connections and read the login indexes before taking traffic"""
+
+    def describe(self):
+        """Backend details for the admin endpoints"""
+        return {'backend': self.backend}
+
+    def close(self):
+        """Release connections"""
@@ -0,0 +1,291 @@
+# user_service/storage/postgres.py
+"""
+PostgreSQL user store.
+
+Used when STORAGE_BACKEND=postgres. Needs `psycopg` and `psycopg_pool`
+(see requirements.txt).
+"""
+from storage.base import (UserStore, DuplicateUserError, IdempotencyConflict, PROFILE_FIELDS,
+                          LOGIN_FIELDS, PREFIX_COLUMNS, fetch_in_batches)
+
+try:
+    from psycopg import errors as pg_errors
+    from psycopg.rows import dict_row, tuple_row
+    from psycopg_pool import ConnectionPool
+except ImportError:  # pragma: no cover - only needed for this backend
+    pg_errors = dict_row = tuple_row = ConnectionPool = None
+
+_PROFILE_COLUMNS = ', '.join(PROFILE_FIELDS)
+_LOGIN_COLUMNS = ', '.join(LOGIN_FIELDS)
+
+# A profile encoded by PostgreSQL, plus the keyset columns for the next cursor
+_PROFILE_OBJECT = 'json_build_object(' + ', '.join(f"'{f}', {f}" for f in PROFILE_FIELDS) + ')::text'
+_PROFILE_JSON = _PROFILE_OBJECT + ', created_at, id'
+
+_FIND_BY_USERNAME = f'SELECT {_LOGIN_COLUMNS} FROM users WHERE lower(username) = lower(%s)'
+_FIND_BY_EMAIL_OR_USERNAME = (
+    f'(SELECT {_LOGIN_COLUMNS} FROM users WHERE lower(email) = lower(%s)) '
+    f'UNION ALL (SELECT {_LOGIN_COLUMNS} FROM users WHERE lower(username) = lower(%s)) LIMIT 1'
+)
+
+_GET_USER = f'SELECT {_PROFILE_COLUMNS} FROM users WHERE id = %s'
+
+# Prefix search on the text_pattern_ops indexes (LIKE 'abc%' is a range scan)
+_PREFIX_MATCH = "(lower(username) LIKE %s OR lower(email) LIKE %s)"
+
+
+def _like_prefix(prefix):
+    escaped = prefix.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+def _list_statements(columns):
+    """
+    Directory page statements by cursor given. Parameters: the (created_at,
+    id) cursor, then the limit (NULL for no limit)
+    """
+    return {
+        after: (f'SELECT {columns} FROM users WHERE {"(created_at, id) < (%s, %s)" if after else "TRUE"} '
+                f'ORDER BY created_at DESC, id DESC LIMIT %s')
+        for after in (False, True)
+    }
+
+
+def _prefix_statements(columns):
+    """
+    Prefix search statements by (index column, cursor given), as in the
+    SQLite store: each walks one text_pattern_ops index in its own (byte)
+    order, username matches first, then users matched by their email only.
+    Rows end with the keyset (column, value, id). Parameters: the LIKE
+    pattern, the (value, value, id) cursor, the pattern again for the email
+    walk, then the limit (NULL for no limit)
+    """
+    statements = {}
+    for column in PREFIX_COLUMNS:
+        for after in (False, True):
+            where = [f'lower({column}) LIKE %s']
+            if after:
+                where.append(f'(lower({column}) ~>~ lower(%s) OR (lower({column}) = lower(%s) AND id > %s))')
+            if column == 'email':
+                where.append('lower(username) NOT LIKE %s')
+            statements[column, after] = (
+                f"SELECT {columns}, '{column}', {column}, id FROM users WHERE {' AND '.join(where)} "
+                f'ORDER BY lower({column}) USING ~<~, id LIMIT %s'
+            )
+    return statements
+
+
+_LIST_USERS = _list_statements(_PROFILE_COLUMNS)
+_LIST_USERS_JSON = _list_statements(_PROFILE_JSON)
+_PREFIX_USERS = _prefix_statements(_PROFILE_COLUMNS)
+_PREFIX_USERS_JSON = _prefix_statements(_PROFILE_OBJECT)
+
+
+def _prefix_params(column, prefix, after, limit):
+    params = [_like_prefix(prefix)]
+    if after is not None:
+        _, value, user_id = after
+        params += [value, value, user_id]
+    if column == 'email':
+        params.append(_like_prefix(prefix))
+    params.append(limit)
+    return params
+
+
+class PostgresUserStore(UserStore):
+    backend = 'postgres'
+
+    def __init__(self, dsn, pool_size=10):
+        if ConnectionPool is None:
+            raise RuntimeError("STORAGE_BACKEND=postgres needs the psycopg and psycopg_pool packages")
+        self.dsn = dsn
+        self.pool = ConnectionPool(
+            dsn,
+            min_size=1,
+            max_size=pool_size,
+            kwargs={'row_factory': dict_row},
+            open=True,
+        )
+
+    @classmethod
+    def from_config(cls, config):
+        if not config['POSTGRES_DSN']:
+            raise ValueError("POSTGRES_DSN must be set when STORAGE_BACKEND=postgres")
+        return cls(config['POSTGRES_DSN'], pool_size=config['POSTGRES_POOL_SIZE'])
+
+    def init_schema(self):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id BIGSERIAL PRIMARY KEY,
+                    username TEXT UNIQUE NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    created_at TEXT,
+                    last_login TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    body TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    expires_at TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at)')
+            # Directory pages (keyset on created_at, id) and prefix search
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_users_username_prefix '
+                         'ON users (lower(username) text_pattern_ops)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_users_email_prefix '
+                         'ON users (lower(email) text_pattern_ops)')
+            # Maintained user count, so count_users() never runs COUNT(*)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value BIGINT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE OR REPLACE FUNCTION count_users() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'TRUNCATE' THEN
+                        UPDATE counters SET value = 0 WHERE name = 'users';
+                    ELSE
+                        UPDATE counters SET value = value + CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END
+                        WHERE name = 'users';
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            ''')
+            conn.execute('LOCK TABLE users IN SHARE ROW EXCLUSIVE MODE')
+            conn.execute("INSERT INTO counters (name, value) SELECT 'users', COUNT(*) FROM users "
+                         "ON CONFLICT (name) DO NOTHING")
+            conn.execute('DROP TRIGGER IF EXISTS users_count ON users')
+            conn.execute('''
+                CREATE TRIGGER users_count AFTER INSERT OR DELETE ON users
+                FOR EACH ROW EXECUTE FUNCTION count_users()
+            ''')
+            conn.execute('DROP TRIGGER IF EXISTS users_count_truncate ON users')
+            conn.execute('''
+                CREATE TRIGGER users_count_truncate AFTER TRUNCATE ON users
+                FOR EACH STATEMENT EXECUTE FUNCTION count_users()
+            ''')
+            # Case-insensitive login keys (see find_for_login)
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_lower ON users (lower(username))')
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_lower ON users (lower(email))')
+
+    def ping(self):
+        with self.pool.connection() as conn:
+            conn.execute('SELECT 1')
+
+    def warm(self):
+        self.pool.wait()  # min_size connections open
+
+    def create_user(self, username, email, password_hash, created_at, idempotency=None):
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    'INSERT INTO users (username, email, password_hash, created_at) '
+                    'VALUES (%s, %s, %s, %s) RETURNING id',
+                    (username, email, password_hash, created_at)
+                ).fetchone()
+                if idempotency is not None:
+                    status, body = idempotency.response_for(row['id'])
+                    # Takes over an expired key; leaves a live one alone (rowcount 0)
+                    saved = conn.execute('''
+                        INSERT INTO idempotency_keys
+                            (key, fingerprint, status, body, created_at, expires_at)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (key) DO UPDATE SET
+                            fingerprint = excluded.fingerprint, status = excluded.status,
+                            body = excluded.body, created_at = excluded.created_at,
+                            expires_at = excluded.expires_at
+                        WHERE idempotency_keys.expires_at <= excluded.created_at
+                    ''', (idempotency.key, idempotency.fingerprint, status, body,
+                          idempotency.created_at, idempotency.expires_at)).rowcount
+                    if saved == 0:
+                        # Leaving the block with an exception rolls the user back too
+                        raise IdempotencyConflict(idempotency.key)
+        except pg_errors.UniqueViolation as e:
+            raise DuplicateUserError(str(e)) from e
+        return row['id']
+
+    def get_idempotent_response(self, key, now):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'SELECT fingerprint, status, body FROM idempotency_keys '
+                'WHERE key = %s AND expires_at > %s',
+                (key, now)
+            ).fetchone()
+
+    def purge_idempotency_keys(self, now):
+        with self.pool.connection() as conn:
+            return conn.execute(
+                'DELETE FROM idempotency_keys WHERE expires_at <= %s', (now,)
+            ).rowcount
+
+    def find_for_login(self, identifier):
+        with self.pool.connection() as conn:
+            # Emails always contain '@': a plain username is one index seek
+            with conn.cursor(row_factory=tuple_row) as cursor:
+                if '@' not in identifier:
+                    user = cursor.execute(_FIND_BY_USERNAME, (identifier,)).fetchone()
+                else:
+                    user = cursor.execute(_FIND_BY_EMAIL_OR_USERNAME, (identifier, identifier)).fetchone()
+        return dict(zip(LOGIN_FIELDS, user)) if user else None
+
+    def record_login(self, user_id, last_login):
+        with self.pool.connection() as conn:
+            conn.execute('UPDATE users SET last_login = %s WHERE id = %s', (last_login, user_id))
+
+    def get_user(self, user_id):
+        with self.pool.connection() as conn:
+            return conn.execute(_GET_USER, (user_id,)).fetchone()
+
+    def list_users(self, limit=None, after=None, prefix=None):
+        if prefix:
+            rows = self._prefix_rows(_PREFIX_USERS, limit, after, prefix)
+            return [dict(zip(PROFILE_FIELDS, row)) for row in rows]
+        with self.pool.connection() as conn:
+            cursor = conn.execute(_LIST_USERS[after is not None], [*(after or ()), limit])
+            return list(fetch_in_batches(cursor))
+
+    def list_users_json(self, limit=None, after=None, prefix=None):
+        if prefix:
+            return self._prefix_rows(_PREFIX_USERS_JSON, limit, after, prefix)
+        with self.pool.connection() as conn:
+            with conn.cursor(row_factory=tuple_row) as cursor:
+                return cursor.execute(_LIST_USERS_JSON[after is not None], [*(after or ()), limit]).fetchall()
+
+    def _prefix_rows(self, statements, limit, after, prefix):
+        """Username walk, then email walk, until limit rows (see _prefix_statements)"""
+        columns = PREFIX_COLUMNS[PREFIX_COLUMNS.index(after[0]):] if after else PREFIX_COLUMNS
+        rows = []
+        with self.pool.connection() as conn:
+            with conn.cursor(row_factory=tuple_row) as cursor:
+                for column in columns:
+                    remaining = None if limit is None else limit - len(rows)
+                    if remaining == 0:
+                        break
+                    rows += cursor.execute(statements[column, after is not None],
+                                           _prefix_params(column, prefix, after, remaining)).fetchall()
+                    after = None  # the next walk starts at the top of its range
+        return rows
+
+    def count_users(self, prefix=None):
+        with self.pool.connection() as conn:
+            if prefix:
+                return conn.execute(f'SELECT COUNT(*) AS count FROM users WHERE {_PREFIX_MATCH}',
+                                    [_like_prefix(prefix)] * 2).fetchone()['count']
+            return conn.execute("SELECT value FROM counters WHERE name = 'users'").fetchone()['value']
+
+    def describe(self):
+        return {'backend': self.backend, 'pool': self.pool.get_stats()}
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,343 @@
+# user_service/storage/sqlite.py
+"""
+SQLite user store (one connection per call, like the original routes).
+
+DATABASE_PATH ':memory:' (TestingConfig) keeps a single pinned connection
+instead, shared by all calls under a lock. A fresh connection to ':memory:'
+would be a new, empty database every time.
+"""
+import os
+import sqlite3
+import string
+import sys
+import threading
+from contextlib import contextmanager
+
+from storage.base import (UserStore, DuplicateUserError, IdempotencyConflict, PROFILE_FIELDS,
+                          LOGIN_FIELDS, PREFIX_COLUMNS, fetch_in_batches)
+
+_PROFILE_COLUMNS = ', '.join(PROFILE_FIELDS)
+_LOGIN_COLUMNS = ', '.join(LOGIN_FIELDS)
+
+# A profile encoded by SQLite, plus the keyset columns for the next cursor
+_PROFILE_OBJECT = 'json_object(' + ', '.join(f"'{f}', {f}" for f in PROFILE_FIELDS) + ')'
+_PROFILE_JSON = _PROFILE_OBJECT + ', created_at, id'
+
+MEMORY_PATH = ':memory:'
+
+# Case-insensitive login keys. Emails always contain '@', so a plain username
+# is one seek on the username index; otherwise the email index is tried first
+# and LIMIT 1 stops there when it matches
+_FIND_BY_USERNAME = f'SELECT {_LOGIN_COLUMNS} FROM users WHERE username = ? COLLATE NOCASE'
+_FIND_BY_EMAIL_OR_USERNAME = f'''
+    SELECT {_LOGIN_COLUMNS} FROM users WHERE email = ? COLLATE NOCASE
+    UNION ALL
+    SELECT {_LOGIN_COLUMNS} FROM users WHERE username = ? COLLATE NOCASE
+    LIMIT 1
+'''
+
+_GET_USER = f'SELECT {_PROFILE_COLUMNS} FROM users WHERE id = ?'
+
+_ASCII_FOLD = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Upper bound of a prefix range: sorts after any string starting with the prefix
+PREFIX_END = '\U0010ffff'
+
+# Prefix ranges on the NOCASE indexes; one range scan per column
+_PREFIX_MATCH = '''
+    ((username >= ? COLLATE NOCASE AND username < ? COLLATE NOCASE)
+     OR (email >= ? COLLATE NOCASE AND email < ? COLLATE NOCASE))
+'''
+
+
+def _list_statements(columns):
+    """
+    Directory page statements by cursor given. Parameters: the (created_at,
+    id) cursor, then the limit (-1 for no limit)
+    """
+    return {
+        after: (f'SELECT {columns} FROM users WHERE {"(created_at, id) < (?, ?)" if after else "1"} '
+                f'ORDER BY created_at DESC, id DESC LIMIT ?')
+        for after in (False, True)
+    }
+
+
+def _prefix_statements(columns):
+    """
+    Prefix search statements by (index column, cursor given). Each walks one
+    NOCASE index in its own order, so LIMIT stops the scan and nothing is
+    sorted: username matches first, then users matched by their email only.
+    Rows end with the keyset (column, value, id). Parameters: the prefix
+    range (its start moved up to the cursor's value), the (value, id) cursor, the username range again for the email
+    walk, then the limit (-1 for no limit)
+    """
+    statements = {}
+    for column in PREFIX_COLUMNS:
+        for after in (False, True):
+            where = [f'{column} >= ? COLLATE NOCASE AND {column} < ? COLLATE NOCASE']
+            if after:
+                where.append(f'({column} > ? COLLATE NOCASE OR ({column} = ? COLLATE NOCASE AND id > ?))')
+            if column == 'email':
+                where.append('NOT (username >= ? COLLATE NOCASE AND username < ? COLLATE NOCASE)')
+            statements[column, after] = (
+                f"SELECT {columns}, '{column}', {column}, id FROM users WHERE {' AND '.join(where)} "
+                f'ORDER BY {column} COLLATE NOCASE, id LIMIT ?'
+            )
+    return statements
+
+
+_LIST_USERS = _list_statements(_PROFILE_COLUMNS)
+_LIST_USERS_JSON = _list_statements(_PROFILE_JSON)
+_PREFIX_USERS = _prefix_statements(_PROFILE_COLUMNS)
+_PREFIX_USERS_JSON = _prefix_statements(_PROFILE_OBJECT)
+
+
+def _limit_param(limit):
+    return -1 if limit is None else limit
+
+
+def _nocase(text):
+    """text as the NOCASE collation compares it (ASCII letters folded)"""
+    return text.translate(_ASCII_FOLD)
+
+
+def _prefix_params(column, prefix, after, limit):
+    params = [prefix, prefix + PREFIX_END]
+    if after is not None:
+        _, value, user_id = after
+        if _nocase(value) > _nocase(prefix):
+            params[0] = value  # the range scan starts at the cursor
+        params += [value, value, user_id]
+    if column == 'email':
+        params += [prefix, prefix + PREFIX_END]
+    params.append(_limit_param(limit))
+    return params
+
+
+# Takes over an expired key; leaves a live one alone (rowcount 0)
+_SAVE_IDEMPOTENCY_KEY = '''
+    INSERT INTO idempotency_keys (key, fingerprint, status, body, created_at, expires_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        fingerprint = excluded.fingerprint, status = excluded.status, body = excluded.body,
+        created_at = excluded.created_at, expires_at = excluded.expires_at
+    WHERE idempotency_keys.expires_at <= excluded.created_at
+'''
+
+
+class SqliteUserStore(UserStore):
+    backend = 'sqlite'
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.in_memory = database_path == MEMORY_PATH
+        self._pinned = None
+        self._pinned_lock = threading.Lock()
+        if self.in_memory:
+            self._pinned = sqlite3.connect(MEMORY_PATH, check_same_thread=False)
+            self._pinned.row_factory = sqlite3.Row
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['DATABASE_PATH'])
+
+    def _connect(self):
+        try:
+            conn = sqlite3.connect(self.database_path)
+            conn.row_factory = sqlite3.Row
+            return conn
+        except Exception as e:
+            print(f"ERROR connecting to database: {e}", file=sys.stderr)
+            raise
+
+    @contextmanager
+    def _connection(self):
+        if self._pinned is not None:
+            with self._pinned_lock:
+                try:
+                    yield self._pinned
+                finally:
+                    if self._pinned.in_transaction:
+                        self._pinned.rollback()
+            return
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def init_schema(self):
+        db_dir = os.path.dirname(self.database_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    created_at TIMESTAMP,
+                    last_login TEXT
+                )
+            ''')
+            # Stored responses for Idempotency-Key retries of POST /api/users/register
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    body TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    expires_at TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at)')
+            # Directory pages (keyset on created_at, id)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)')
+            # Maintained user count, so count_users() never runs COUNT(*)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) SELECT 'users', COUNT(*) FROM users")
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN
+                    UPDATE counters SET value = value + 1 WHERE name = 'users';
+                END
+            ''')
+            conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users BEGIN
+                    UPDATE counters SET value = value - 1 WHERE name = 'users';
+                END
+            ''')
+            # Login lookups; also makes 'Alice' and 'alice' the same username
+            for column in ('username', 'email'):
+                try:
+                    conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_users_{column}_nocase '
+                                 f'ON users ({column} COLLATE NOCASE)')
+                except sqlite3.IntegrityError:
+                    print(f"WARNING: users.{column} has values differing only in case; "
+                          f"case-insensitive lookups on it will scan the table", file=sys.stderr)
+            conn.commit()
+
+    def ping(self):
+        with self._connection() as conn:
+            conn.execute('SELECT 1')
+
+    def warm(self):
+        # No pool (a connection per call): pull the login index pages into the OS cache
+        with self._connection() as conn:
+            for index in ('idx_users_username_nocase', 'idx_users_email_nocase'):
+                conn.execute(f'SELECT COUNT(*) FROM users INDEXED BY {index}').fetchone()
+
+    def create_user(self, username, email, password_hash, created_at, idempotency=None):
+        with self._connection() as conn:
+            try:
+                cursor = conn.execute(
+                    'INSERT INTO users (username, email, password_hash, created_at) VALUES (?, ?, ?, ?)',
+                    (username, email, password_hash, created_at)
+                )
+                user_id = cursor.lastrowid
+                if idempotency is not None:
+                    status, body = idempotency.response_for(user_id)
+                    saved = conn.execute(_SAVE_IDEMPOTENCY_KEY, (
+                        idempotency.key, idempotency.fingerprint, status, body,
+                        idempotency.created_at, idempotency.expires_at
+                    )).rowcount
+                    if saved == 0:
+                        conn.rollback()
+                        raise IdempotencyConflict(idempotency.key)
+                conn.commit()
+                return user_id
+            except sqlite3.IntegrityError as e:
+                conn.rollback()
+                raise DuplicateUserError(str(e)) from e
+
+    def get_idempotent_response(self, key, now):
+        with self._connection() as conn:
+            row = conn.execute(
+                'SELECT fingerprint, status, body FROM idempotency_keys '
+                'WHERE key = ? AND expires_at > ?',
+                (key, now)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def purge_idempotency_keys(self, now):
+        with self._connection() as conn:
+            removed = conn.execute(
+                'DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,)
+            ).rowcount
+            conn.commit()
+        return removed
+
+    def find_for_login(self, identifier):
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            if '@' in identifier:
+                user = cursor.execute(_FIND_BY_EMAIL_OR_USERNAME, (identifier, identifier)).fetchone()
+            else:
+                user = cursor.execute(_FIND_BY_USERNAME, (identifier,)).fetchone()
+        return dict(zip(LOGIN_FIELDS, user)) if user else None
+
+    def record_login(self, user_id, last_login):
+        with self._connection() as conn:
+            conn.execute('UPDATE users SET last_login = ? WHERE id = ?', (last_login, user_id))
+            conn.commit()
+
+    def get_user(self, user_id):
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            user = cursor.execute(_GET_USER, (user_id,)).fetchone()
+        return dict(zip(PROFILE_FIELDS, user)) if user else None
+
+    def list_users(self, limit=None, after=None, prefix=None):
+        if prefix:
+            rows = self._prefix_rows(_PREFIX_USERS, limit, after, prefix)
+            return [dict(zip(PROFILE_FIELDS, row)) for row in rows]
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(_LIST_USERS[after is not None], [*(after or ()), _limit_param(limit)])
+            return [dict(zip(PROFILE_FIELDS, row)) for row in fetch_in_batches(cursor)]
+
+    def list_users_json(self, limit=None, after=None, prefix=None):
+        if prefix:
+            return self._prefix_rows(_PREFIX_USERS_JSON, limit, after, prefix)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples, no Row objects
+            return cursor.execute(_LIST_USERS_JSON[after is not None],
+                                  [*(after or ()), _limit_param(limit)]).fetchall()
+
+    def _prefix_rows(self, statements, limit, after, prefix):
+        """Username walk, then email walk, until limit rows (see _prefix_statements)"""
+        columns = PREFIX_COLUMNS[PREFIX_COLUMNS.index(after[0]):] if after else PREFIX_COLUMNS
+        rows = []
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            for column in columns:
+                remaining = None if limit is None else limit - len(rows)
+                if remaining == 0:
+                    break
+                rows += cursor.execute(statements[column, after is not None],
+                                       _prefix_params(column, prefix, after, remaining)).fetchall()
+                after = None  # the next walk starts at the top of its range
+        return rows
+
+    def count_users(self, prefix=None):
+        with self._connection() as conn:
+            if prefix:
+                return conn.execute(f'SELECT COUNT(*) FROM users WHERE {_PREFIX_MATCH}',
+                                    [prefix, prefix + PREFIX_END] * 2).fetchone()[0]
+            return conn.execute("SELECT value FROM counters WHERE name = 'users'").fetchone()[0]
+
+    def close(self):
+        if self._pinned is not None:
+            self._pinned.close()  # drops the in-memory database
+            self._pinned = None
@@ -0,0 +1,61 @@
+# user_service/tests/conftest.py
+import os
+
+import pytest
+
+from storage.sqlite import SqliteUserStore
+
+# Set TEST_POSTGRES_DSN (e.g. postgresql://postgres@localhost/users_test) to run
+# the conformance suite against a local PostgreSQL as well
+POSTGRES_DSN = os.getenv('TEST_POSTGRES_DSN')
+
+
+def make_postgres_store():
+    from storage.postgres import PostgresUserStore
+    store = PostgresUserStore(POSTGRES_DSN, pool_size=4)
+    store.init_schema()
+    with store.pool.connection() as conn:
+        conn.execute('TRUNCATE users, idempotency_keys RESTART IDENTITY')
+    return store
+
+
+@pytest.fixture(params=['sqlite', 'sqlite-memory', 'postgres'])
+def store(request, tmp_path):
+    if request.param == 'postgres':
+        if not POSTGRES_DSN:
+            pytest.skip('TEST_POSTGRES_DSN not set')
+        user_store = make_postgres_store()
+    elif request.param == 'sqlite-memory':
+        user_store = SqliteUserStore(':memory:')
+        user_store.init_schema()
+    else:
+        user_store = SqliteUserStore(str(tmp_path / 'users.db'))
+        user_store.init_schema()
+    yield user_store
+    user_store.close()
+
+
+# ----------------------------------------------------------------------
+# In-process API tests: the Flask app on TestingConfig (in-memory database,
+# no rate limits, no backups), driven through the test client
+# ----------------------------------------------------------------------
+@pytest.fixture(scope='session')
+def service():
+    """The app module, imported once with FLASK_ENV=testing"""
+    os.environ['FLASK_ENV'] = 'testing'
+    import app as user_app
+    return user_app
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    """Test client backed by a fresh in-memory database for each test"""
+    from storage import create_user_store
+    from user_cache import UserCache
+
+    user_store = create_user_store(service.app.config)
+    user_store.init_schema()
+    monkeypatch.setattr(service, 'store', user_store)
+    monkeypatch.setattr(service, 'user_cache', UserCache.from_config(service.app.config))
+    yield service.app.test_client()
+    user_store.close()
@@ -0,0 +1,125 @@
+# user_service/tests/test_admission.py
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from admission import AdmissionController, MemoryBuckets, SqliteBuckets
+
+
+def test_memory_bucket_refills_at_rate():
+    buckets = MemoryBuckets()
+    assert [buckets.take('k', 1.0, 2, now=0.0)[0] for _ in range(3)] == [True, True, False]
+    allowed, _, retry_after = buckets.take('k', 1.0, 2, now=0.0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert buckets.take('k', 1.0, 2, now=1.0)[0] is True
+
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SqliteBuckets(path), SqliteBuckets(path)
+    assert first.take('k', 0.001, 2, now=100.0)[0] is True
+    assert second.take('k', 0.001, 2, now=100.0)[0] is True
+    assert first.take('k', 0.001, 2, now=100.0)[0] is False
+    first.close()
+    second.close()
+
+
+def make_app(**options):
+    app = Flask(__name__)
+    controller = AdmissionController(MemoryBuckets(), **options)
+    controller.init_app(app)
+
+    @app.route('/health')
+    def health():
+        return 'ok'
+
+    @app.route('/items', methods=['GET', 'POST'])
+    def items():
+        return 'ok'
+
+    return app, controller
+
+
+def test_read_and_write_budgets_are_separate():
+    app, controller = make_app(read_rate=0.001, read_burst=2, write_rate=0.001, write_burst=1)
+    client = app.test_client()
+    assert [client.get('/items?user_id=1').status_code for _ in range(3)] == [200, 200, 429]
+    assert client.post('/items', json={'user_id': 1}).status_code == 200
+    response = client.post('/items', json={'user_id': 1})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    # Other clients and the health probe are unaffected
+    assert client.get('/items', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+    assert client.get('/health').status_code == 200
+    assert controller.stats()['rate_limited'] == 2
+
+
+def test_user_id_in_the_request_does_not_pick_the_bucket():
+    app, _ = make_app(write_rate=0.001, write_burst=1)
+    client = app.test_client()
+    assert client.post('/items', json={'user_id': 1}).status_code == 200
+    assert client.post('/items', json={'user_id': 2}).status_code == 429
+    # Naming someone else's id from another address leaves their budget alone
+    other = {'REMOTE_ADDR': '10.0.0.2'}
+    assert client.post('/items', json={'user_id': 1}, environ_base=other).status_code == 200
+
+
+def test_clients_behind_a_trusted_proxy_get_their_own_bucket():
+    app, _ = make_app(read_rate=0.001, read_burst=1, trusted_proxies=['10.0.0.0/8'])
+    client = app.test_client()
+    proxy = {'REMOTE_ADDR': '10.1.2.3'}
+
+    def get(forwarded, environ=proxy):
+        return client.get('/items', headers={'X-Forwarded-For': forwarded}, environ_base=environ).status_code
+    assert get('203.0.113.1') == 200
+    assert get('203.0.113.2') == 200
+    # Only the hop our proxy appended counts; a spoofed first entry does not
+    assert get('198.51.100.9, 203.0.113.1') == 429
+    # An untrusted sender cannot choose its address
+    assert get('203.0.113.3', environ={'REMOTE_ADDR': '192.0.2.1'}) == 200
+    assert get('203.0.113.4', environ={'REMOTE_ADDR': '192.0.2.1'}) == 429
+
+
+def test_a_locked_bucket_file_fails_open(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    app = Flask(__name__)
+    controller = AdmissionController(SqliteBuckets(path), write_rate=0.001, write_burst=1)
+    controller.init_app(app)
+    app.add_url_rule('/items', 'items', lambda: 'ok', methods=['POST'])
+
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute('BEGIN IMMEDIATE')
+    try:
+        assert app.test_client().post('/items').status_code == 200
+    finally:
+        holder.execute('ROLLBACK')
+        holder.close()
+    assert controller.stats()['limiter_errors'] == 1
+    controller.close()
+
+
+def test_writes_are_shed_when_queue_is_backed_up():
+    backlog = {'pending': 0}
+    app, controller = make_app(write_queue_limit=10, write_pressure=lambda: backlog['pending'])
+    client = app.test_client()
+    assert client.post('/items', json={'user_id': 1}).status_code == 200
+    backlog['pending'] = 10
+    response = client.post('/items', json={'user_id': 1})
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert client.get('/items?user_id=1').status_code == 200
+    stats = controller.stats()
+    assert stats['shed'] == 1
+    assert stats['inflight_writes'] == 0
+
+
+def test_inflight_write_limit():
+    app, controller = make_app(max_inflight_writes=0)
+    assert app.test_client().post('/items', json={}).status_code == 503
+
+
+def test_disabled_controller_admits_everything():
+    app, _ = make_app(read_rate=0.001, read_burst=1, enabled=False)
+    client = app.test_client()
+    assert [client.get('/items').status_code for _ in range(3)] == [200, 200, 200]
@@ -0,0 +1,124 @@
+# user_service/tests/test_api.py
+"""The HTTP API end to end, in-process (see the client fixture in conftest.py)"""
+import json
+
+import pytest
+
+
+def register(client, username='alice', email='alice@example.com', password='secret123'):
+    return client.post('/api/users/register',
+                       json={'username': username, 'email': email, 'password': password})
+
+
+def test_health(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'healthy'
+
+
+def test_register_login_profile(client):
+    response = register(client, email=' Alice@Example.com ')
+    assert response.status_code == 201
+    user = response.get_json()['user']
+    assert user['email'] == 'alice@example.com'
+
+    login = client.post('/api/users/login', json={'username': 'alice', 'password': 'secret123'})
+    assert login.status_code == 200
+    assert login.get_json()['user']['id'] == user['id']
+
+    profile = client.get(f"/api/users/profile/{user['id']}").get_json()['user']
+    assert profile['username'] == 'alice'
+    assert profile['last_login'] is not None
+    assert 'password_hash' not in profile
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'username': 'alice', 'email': 'a@example.com'}, 'Missing required fields'),
+    ({'username': 'al', 'email': 'a@example.com', 'password': 'secret123'},
+     'Username must be at least 3 characters'),
+    ({'username': 'alice', 'email': 'a@example.com', 'password': '123'},
+     'Password must be at least 6 characters'),
+    ({'username': 'alice', 'email': 'not-an-email', 'password': 'secret123'}, 'Invalid email format'),
+])
+def test_register_validation(client, body, error):
+    response = client.post('/api/users/register', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_duplicate_registration(client):
+    assert register(client).status_code == 201
+    assert register(client, email='other@example.com').status_code == 409
+    assert register(client, username='bob').status_code == 409
+
+
+def test_login_failures(client):
+    register(client)
+    assert client.post('/api/users/login', json={'username': 'alice', 'password': 'wrong!!'}).status_code == 401
+    assert client.post('/api/users/login', json={'username': 'nobody', 'password': 'secret123'}).status_code == 401
+    assert client.post('/api/users/login', json={'username': 'alice'}).status_code == 400
+
+
+def test_profile_not_found(client):
+    assert client.get('/api/users/profile/999').status_code == 404
+
+
+def test_list_users(client):
+    register(client)
+    register(client, 'bob', 'bob@example.com')
+    users = client.get('/api/users').get_json()['users']
+    assert sorted(u['username'] for u in users) == ['alice', 'bob']
+
+
+def test_each_test_starts_with_an_empty_database(client):
+    assert client.get('/api/users').get_json()['users'] == []
+
+
+def test_in_memory_store_has_no_backups(client):
+    assert client.get('/api/admin/backups').status_code == 404
+
+
+def test_login_ignores_case_and_is_served_from_cache(client, service):
+    user_id = register(client, username='Alice').get_json()['user']['id']
+    for identifier in ('alice', 'ALICE', 'Alice@example.com'):
+        login = client.post('/api/users/login', json={'username': identifier, 'password': 'secret123'})
+        assert login.status_code == 200
+        assert login.get_json()['user']['id'] == user_id
+    assert client.get(f'/api/users/profile/{user_id}').status_code == 200
+    assert service.user_cache.stats()['hits'] == 3
+    assert register(client, username='alice', email='other@example.com').status_code == 409
+
+
+def test_user_directory_pages_search_and_count(client):
+    for name in ('ann', 'andy', 'bob', 'Anna'):
+        register(client, username=name, email=f'{name.lower()}@example.com')
+
+    first = client.get('/api/users?limit=3').get_json()
+    assert [u['username'] for u in first['users']] == ['Anna', 'bob', 'andy']
+    rest = client.get(f"/api/users?limit=3&cursor={first['page']['next_cursor']}").get_json()
+    assert [u['username'] for u in rest['users']] == ['ann']
+    assert rest['page']['next_cursor'] is None
+
+    # A prefix search walks the username index: matches come in username order
+    search = client.get('/api/users?q=AN&limit=2').get_json()
+    assert [u['username'] for u in search['users']] == ['andy', 'ann']
+    rest = client.get(f"/api/users?q=AN&limit=2&cursor={search['page']['next_cursor']}").get_json()
+    assert [u['username'] for u in rest['users']] == ['Anna']
+    # A directory cursor does not continue a search, nor the other way round
+    assert client.get(f"/api/users?q=AN&cursor={first['page']['next_cursor']}").status_code == 400
+    assert client.get(f"/api/users?cursor={search['page']['next_cursor']}").status_code == 400
+    assert client.get('/api/users?count=true').get_json() == {'count': 4}
+    assert client.get('/api/users?count=true&q=b').get_json() == {'count': 1}
+
+    assert client.get('/api/users?cursor=garbage').status_code == 400
+    assert client.get('/api/users?limit=0').status_code == 400
+
+
+def test_user_export_streams_ndjson(client, service, monkeypatch):
+    monkeypatch.setitem(service.app.config, 'USER_EXPORT_BATCH', 2)
+    for i in range(5):
+        register(client, username=f'user{i}', email=f'user{i}@example.com')
+    response = client.get('/api/users/export')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['username'] for row in rows] == [f'user{i}' for i in range(4, -1, -1)]
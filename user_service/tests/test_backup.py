@@ -0,0 +1,99 @@
+# user_service/tests/test_backup.py
+import gzip
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from backup import BackupInProgress, BackupManager
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'live.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, body TEXT)')
+    conn.executemany('INSERT INTO items (body) VALUES (?)', [('x' * 500,) for _ in range(200)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def count_items(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+
+def make_manager(tmp_path, database, **kwargs):
+    return BackupManager(lambda: [('live', database)], tmp_path / 'backups', **kwargs)
+
+
+def test_snapshot_is_compressed_and_checksummed(tmp_path, database):
+    manager = make_manager(tmp_path, database)
+    manifest = manager.create_snapshot()
+    db = manifest['databases'][0]
+    assert db['compressed_bytes'] < db['bytes']
+    with gzip.open(tmp_path / 'backups' / manifest['path'] / db['file']) as gz:
+        assert gz.read(16) == b'SQLite format 3\x00'
+    assert manager.status()['last_result']['ok'] is True
+
+
+def test_restore_brings_back_deleted_rows(tmp_path, database):
+    manager = make_manager(tmp_path, database)
+    manifest = manager.create_snapshot()
+    with sqlite3.connect(database) as conn:
+        conn.execute('DELETE FROM items')
+    assert count_items(database) == 0
+    manager.restore(manifest['path'])
+    assert count_items(database) == 200
+
+
+def test_restore_rejects_corrupted_snapshot(tmp_path, database):
+    manager = make_manager(tmp_path, database)
+    manifest = manager.create_snapshot()
+    manifest_path = tmp_path / 'backups' / manifest['path'] / 'manifest.json'
+    doc = json.loads(manifest_path.read_text())
+    doc['databases'][0]['sha256'] = '0' * 64
+    manifest_path.write_text(json.dumps(doc))
+    with pytest.raises(ValueError):
+        manager.restore(manifest['path'])
+
+
+def test_retention_keeps_newest_snapshots(tmp_path, database):
+    manager = make_manager(tmp_path, database, retention=2)
+    paths = [manager.create_snapshot()['path'] for _ in range(4)]
+    assert [s['path'] for s in manager.list_snapshots()] == paths[:1:-1]
+
+
+def test_snapshot_finishes_under_steady_writes(tmp_path, database):
+    with sqlite3.connect(database) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+    stop = threading.Event()
+
+    def write():
+        conn = sqlite3.connect(database, isolation_level=None)
+        while not stop.is_set():
+            conn.execute('INSERT INTO items (body) VALUES (?)', ('y' * 500,))
+        conn.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        manifest = make_manager(tmp_path, database).create_snapshot()
+    finally:
+        stop.set()
+        writer.join()
+    assert manifest['databases'][0]['pages'] > 0
+
+
+def test_only_one_of_two_concurrent_starts_runs(tmp_path, database):
+    manager = make_manager(tmp_path, database)
+    release = threading.Event()
+    manager._snapshot = lambda: release.wait(5)
+    thread = manager.start_snapshot()
+    with pytest.raises(BackupInProgress):
+        manager.start_snapshot()
+    assert manager.status()['state'] == 'running'
+    release.set()
+    thread.join(5)
@@ -0,0 +1,60 @@
+# user_service/tests/test_idempotency.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+USER = {'username': 'alice', 'email': 'alice@example.com', 'password': 'secret123'}
+
+
+def register(client, key, body=USER):
+    return client.post('/api/users/register', json=body, headers={'Idempotency-Key': key})
+
+
+def test_retry_replays_the_first_response(client):
+    first = register(client, 'abc')
+    assert first.status_code == 201
+    retry = register(client, 'abc')
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_data() == first.get_data()
+    assert len(client.get('/api/users').get_json()['users']) == 1
+
+
+def test_new_key_for_an_existing_user_is_a_conflict(client):
+    register(client, 'abc')
+    assert register(client, 'def').status_code == 409
+
+
+def test_reusing_a_key_for_another_request_is_rejected(client):
+    register(client, 'abc')
+    other = dict(USER, username='bob', email='bob@example.com')
+    assert register(client, 'abc', other).status_code == 422
+
+
+def test_failed_requests_are_not_stored(client):
+    assert register(client, 'abc', dict(USER, password='123')).status_code == 400
+    assert register(client, 'abc').status_code == 201
+
+
+def test_concurrent_duplicates_wait_for_the_first(client, service, monkeypatch):
+    create_user = service.store.create_user
+    calls = []
+
+    def slow_create(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.2)
+        return create_user(*args, **kwargs)
+
+    monkeypatch.setattr(service.store, 'create_user', slow_create)
+    start = threading.Barrier(4)
+
+    def hedged():
+        start.wait()
+        return register(service.app.test_client(), 'hedge')
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda _: hedged(), range(4)))
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [201] * 4
+    assert len({r.get_data() for r in responses}) == 1
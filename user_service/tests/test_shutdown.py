@@ -0,0 +1,92 @@
+# user_service/tests/test_shutdown.py
+import threading
+
+from flask import Flask
+
+from shutdown import GracefulShutdown
+from startup import Startup
+
+
+def make_app(**options):
+    # Requests below use buffered=True: the test client then closes each
+    # response, as a real server does, which ends its in-flight count
+    app = Flask(__name__)
+    startup = Startup('test-service')
+    startup.init_app(app)
+    startup.run([])
+    shutdown = GracefulShutdown(startup, readiness_delay=0, poll_interval=0.01, **options)
+    shutdown.init_app(app)
+    entered, release = threading.Event(), threading.Event()
+
+    @app.route('/slow')
+    def slow():
+        entered.set()
+        release.wait(5)
+        return 'done'
+
+    @app.route('/items')
+    def items():
+        return 'ok'
+
+    return app, shutdown, entered, release
+
+
+def test_drains_in_flight_requests_then_flushes():
+    app, shutdown, entered, release = make_app(drain_timeout=5)
+    steps = []
+    shutdown.on_shutdown('writes', lambda: steps.append('writes'))
+    shutdown.on_shutdown('pools', lambda: steps.append('pools'))
+    client = app.test_client()
+
+    slow = {}
+    request_thread = threading.Thread(target=lambda: slow.update(response=client.get('/slow', buffered=True)))
+    request_thread.start()
+    entered.wait(5)
+    assert shutdown.in_flight == 1
+
+    shutdown_thread = threading.Thread(target=shutdown.run)
+    shutdown_thread.start()
+    while shutdown.stats()['accepting']:
+        pass
+    assert client.get('/ready', buffered=True).status_code == 503
+    rejected = client.get('/items', buffered=True)
+    assert rejected.status_code == 503
+    assert rejected.headers['Connection'] == 'close'
+    assert steps == []  # still draining
+
+    release.set()
+    request_thread.join(5)
+    shutdown_thread.join(5)
+    assert slow['response'].get_data(as_text=True) == 'done'
+    assert steps == ['writes', 'pools']
+    report = shutdown.stats()['report']
+    assert report['in_flight_at_drain'] == 1
+    assert report['abandoned'] == 0
+    assert report['rejected'] == 1
+    assert list(report['phases_ms']) == ['unready', 'drain', 'writes', 'pools']
+
+
+def test_deadline_abandons_stuck_requests():
+    app, shutdown, entered, release = make_app(drain_timeout=0.05)
+    thread = threading.Thread(target=lambda: app.test_client().get('/slow', buffered=True))
+    thread.start()
+    entered.wait(5)
+    report = shutdown.run()
+    assert report['abandoned'] == 1
+    release.set()
+    thread.join(5)
+
+
+def test_failing_step_does_not_stop_the_others():
+    _, shutdown, _, _ = make_app()
+    steps = []
+
+    def broken():
+        raise OSError('gone')
+
+    shutdown.on_shutdown('broken', broken)
+    shutdown.on_shutdown('pools', lambda: steps.append('pools'))
+    report = shutdown.run()
+    assert steps == ['pools']
+    assert report['errors'] == {'broken': 'gone'}
+    assert shutdown.run() is report  # runs once
@@ -0,0 +1,82 @@
+# user_service/tests/test_startup.py
+import threading
+
+from flask import Flask
+
+from startup import Startup
+
+
+def make_app():
+    app = Flask(__name__)
+    startup = Startup('test-service')
+    startup.init_app(app)
+
+    @app.route('/health')
+    def health():
+        return 'ok'
+
+    @app.route('/items')
+    def items():
+        return 'ok'
+
+    return app, startup
+
+
+def test_imported_app_is_not_gated():
+    app, startup = make_app()
+    client = app.test_client()
+    assert client.get('/items').status_code == 200
+    assert client.get('/ready').status_code == 503
+    assert startup.stats()['state'] == 'idle'
+
+
+def test_routes_wait_for_the_phases():
+    app, startup = make_app()
+    client = app.test_client()
+    migrating, release = threading.Event(), threading.Event()
+
+    def migrate():
+        migrating.set()
+        release.wait(5)
+
+    thread = startup.start([('migrate', migrate), ('warm', lambda: None)])
+    migrating.wait(5)
+    response = client.get('/items')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get('/health').status_code == 200
+    assert client.get('/live').status_code == 200
+    assert client.get('/ready').status_code == 503
+
+    release.set()
+    thread.join(5)
+    assert client.get('/items').status_code == 200
+    ready = client.get('/ready')
+    assert ready.status_code == 200
+    assert list(ready.get_json()['startup']['phases_ms']) == ['migrate', 'warm']
+
+
+def test_failed_phase_keeps_the_service_unready():
+    app, startup = make_app()
+    after = []
+
+    def migrate():
+        raise RuntimeError('disk full')
+
+    assert startup.run([('migrate', migrate)], after_ready=[('jobs', lambda: after.append(1))]) is False
+    assert startup.stats()['error'] == 'migrate: disk full'
+    client = app.test_client()
+    assert client.get('/items').status_code == 503
+    assert client.get('/live').status_code == 503
+    assert after == []
+
+
+def test_after_ready_failures_are_only_logged():
+    _, startup = make_app()
+
+    def preload():
+        raise ImportError('nope')
+
+    assert startup.run([], after_ready=[('preload', preload)]) is True
+    assert startup.ready
+    assert 'preload' in startup.stats()['phases_ms']
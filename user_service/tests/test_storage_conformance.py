@@ -0,0 +1,158 @@
+# user_service/tests/test_storage_conformance.py
+"""Behaviour every UserStore backend must share"""
+import json
+
+import pytest
+
+from storage import (DuplicateUserError, IdempotencyConflict, IdempotencyRecord, PROFILE_FIELDS,
+                     page_position)
+
+
+def add_user(store, username='alice', email='alice@example.com', created_at='2025-01-01T00:00:00'):
+    return store.create_user(username, email, 'hash', created_at)
+
+
+def test_create_and_get(store):
+    user_id = add_user(store)
+    user = store.get_user(user_id)
+    assert tuple(user) == PROFILE_FIELDS
+    assert user['username'] == 'alice'
+    assert user['last_login'] is None
+
+
+def test_get_missing_user(store):
+    assert store.get_user(424242) is None
+
+
+@pytest.mark.parametrize('username, email', [
+    ('alice', 'other@example.com'),
+    ('bob', 'alice@example.com'),
+])
+def test_duplicates_are_rejected(store, username, email):
+    add_user(store)
+    with pytest.raises(DuplicateUserError):
+        add_user(store, username, email)
+
+
+def test_find_for_login_by_username_or_email(store):
+    user_id = add_user(store)
+    assert store.find_for_login('alice')['id'] == user_id
+    assert store.find_for_login('alice@example.com')['id'] == user_id
+    assert store.find_for_login('alice')['password_hash'] == 'hash'
+    assert store.find_for_login('nobody') is None
+
+
+def test_login_keys_ignore_case(store):
+    user_id = add_user(store, 'Alice', 'alice@example.com')
+    assert store.find_for_login('ALICE')['id'] == user_id
+    assert store.find_for_login('Alice@Example.COM')['id'] == user_id
+    with pytest.raises(DuplicateUserError):
+        add_user(store, 'alice', 'other@example.com')
+
+
+def test_username_containing_at(store):
+    user_id = add_user(store, 'bob@home', 'bob@example.com')
+    assert store.find_for_login('BOB@home')['id'] == user_id
+
+
+def test_warm(store):
+    user_id = add_user(store)
+    store.warm()
+    assert store.get_user(user_id)['username'] == 'alice'
+
+
+def test_record_login(store):
+    user_id = add_user(store)
+    store.record_login(user_id, '2025-02-02T00:00:00')
+    assert store.get_user(user_id)['last_login'] == '2025-02-02T00:00:00'
+
+
+def test_list_users_newest_first(store):
+    add_user(store, 'old', 'old@example.com', '2025-01-01T00:00:00')
+    add_user(store, 'new', 'new@example.com', '2025-03-01T00:00:00')
+    users = store.list_users()
+    assert [u['username'] for u in users] == ['new', 'old']
+    assert all('password_hash' not in u for u in users)
+
+
+def test_list_users_keyset_pages(store):
+    for i in range(5):
+        add_user(store, f'user{i}', f'user{i}@example.com', '2025-01-01T00:00:00')
+    first = store.list_users(limit=3)
+    last = first[-1]
+    second = store.list_users(limit=3, after=(last['created_at'], last['id']))
+    assert [u['username'] for u in first + second] == [f'user{i}' for i in range(4, -1, -1)]
+
+
+def test_prefix_search_and_count(store):
+    add_user(store, 'Alice', 'alice@example.com')
+    add_user(store, 'bob', 'al.bob@example.com')
+    add_user(store, 'carol', 'carol@example.com')
+    assert {u['username'] for u in store.list_users(prefix='AL')} == {'Alice', 'bob'}
+    assert store.list_users(prefix='al%') == []
+    assert store.count_users() == 3
+    assert store.count_users(prefix='car') == 1
+
+
+def test_prefix_search_pages_each_index_in_its_order(store):
+    add_user(store, 'Alice', 'alice@example.com')
+    add_user(store, 'bob', 'al.bob@example.com')
+    add_user(store, 'alan', 'zed@example.com')
+    add_user(store, 'ALBERT', 'albert@example.com')
+    add_user(store, 'dave', 'Al@example.com')
+    pages, after = [], None
+    while True:
+        rows = store.list_users_json(2, after=after, prefix='al')
+        pages.append([json.loads(row[0])['username'] for row in rows])
+        if len(rows) < 2:
+            break
+        after = rows[-1][1:]
+    # Username matches by username, then users found by their email only
+    assert pages == [['alan', 'ALBERT'], ['Alice', 'bob'], ['dave']]
+    assert [row[1] for row in store.list_users_json(prefix='AL')] == ['username'] * 3 + ['email'] * 2
+
+
+def test_list_users_json_matches_list_users(store):
+    for i in range(4):
+        add_user(store, f'user{i}', f'user{i}@example.com', f'2025-01-0{i + 1}T00:00:00')
+    store.record_login(1, '2025-02-02T00:00:00')
+    for options in ({}, {'limit': 2}, {'after': ('2025-01-03T00:00:00', 3)}, {'prefix': 'USER'},
+                    {'after': ('username', 'user1', 2), 'prefix': 'u'}):
+        rows = store.list_users_json(**options)
+        users = store.list_users(**options)
+        assert [json.loads(row[0]) for row in rows] == users
+        assert [row[1:] for row in rows] == [page_position(u, options.get('prefix')) for u in users]
+
+
+def test_find_for_login_returns_login_fields(store):
+    add_user(store)
+    user = store.find_for_login('ALICE')
+    assert set(user) == set(PROFILE_FIELDS) | {'password_hash'}
+    assert user['password_hash'] == 'hash'
+
+
+def idempotency_record(key='key-1', created_at='2025-01-01T00:00:00', expires_at='2025-01-02T00:00:00'):
+    return IdempotencyRecord(key, 'fp', created_at, expires_at,
+                             lambda new_id: (201, json.dumps({'id': new_id})))
+
+
+def test_create_user_stores_idempotent_response(store):
+    record = idempotency_record()
+    user_id = store.create_user('alice', 'alice@example.com', 'hash', '2025-01-01T00:00:00',
+                                idempotency=record)
+    assert json.loads(record.body) == {'id': user_id}
+    stored = store.get_idempotent_response('key-1', '2025-01-01T12:00:00')
+    assert dict(stored) == {'fingerprint': 'fp', 'status': 201, 'body': record.body}
+    assert store.get_idempotent_response('key-1', '2025-01-02T00:00:00') is None
+
+
+def test_taken_idempotency_key_rolls_the_insert_back(store):
+    add_user(store)
+    store.create_user('bob', 'bob@example.com', 'hash', '2025-01-01T00:00:00',
+                      idempotency=idempotency_record())
+    with pytest.raises(IdempotencyConflict):
+        store.create_user('carol', 'carol@example.com', 'hash', '2025-01-01T00:00:00',
+                          idempotency=idempotency_record())
+    assert store.find_for_login('carol') is None
+    assert store.purge_idempotency_keys('2025-01-05T00:00:00') == 1
+    assert store.get_idempotent_response('key-1', '2025-01-01T12:00:00') is None
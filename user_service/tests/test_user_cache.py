@@ -0,0 +1,138 @@
+# user_service/tests/test_user_cache.py
+from storage import UserRecord
+from user_cache import UserCache, login_key
+
+ALICE = {'id': 1, 'username': 'Alice', 'email': 'alice@example.com', 'password_hash': 'hash',
+         'created_at': '2025-01-01T00:00:00', 'last_login': None}
+
+
+class Loader:
+    """Counts calls to the stand-in for the store"""
+
+    def __init__(self, user=ALICE):
+        self.user = user
+        self.calls = 0
+
+    def __call__(self, _):
+        self.calls += 1
+        return dict(self.user) if self.user else None
+
+
+def test_login_key_folds_ascii_like_nocase():
+    assert login_key('ALICE@Example.com') == 'alice@example.com'
+    assert login_key('ÄLICE') == 'Älice'
+
+
+def test_user_record_round_trips_dicts():
+    record = UserRecord.from_dict(ALICE)
+    assert record.login() == ALICE
+    assert 'password_hash' not in record.profile()
+    assert not hasattr(record, '__dict__')
+    profile_only = UserRecord.from_dict(record.profile())
+    assert profile_only.password_hash is None
+
+
+def test_logins_and_profiles_hit_the_cache():
+    cache = UserCache()
+    load = Loader()
+    assert cache.find_for_login('alice', load)['id'] == 1
+    assert cache.find_for_login('ALICE@example.com', load)['password_hash'] == 'hash'
+    profile = cache.get_profile(1, load)
+    assert 'password_hash' not in profile
+    assert load.calls == 1
+    assert cache.stats()['hits'] == 2
+
+
+def test_profile_only_entries_do_not_answer_logins():
+    cache = UserCache()
+    profile = {k: v for k, v in ALICE.items() if k != 'password_hash'}
+    cache.get_profile(1, Loader(profile))
+    load = Loader()
+    assert cache.find_for_login('alice', load)['password_hash'] == 'hash'
+    assert load.calls == 1
+    # A later profile load keeps the hash the login brought in
+    cache.prime([profile])
+    assert cache.find_for_login('alice', load)['password_hash'] == 'hash'
+    assert load.calls == 1
+
+
+def test_misses_are_not_cached():
+    cache = UserCache()
+    load = Loader(None)
+    assert cache.find_for_login('nobody', load) is None
+    assert cache.find_for_login('nobody', load) is None
+    assert load.calls == 2
+
+
+def test_writes_update_or_drop_entries():
+    cache = UserCache()
+    load = Loader()
+    cache.find_for_login('alice', load)
+    cache.apply(1, {'last_login': '2025-02-02T00:00:00'})
+    assert cache.get_profile(1, load)['last_login'] == '2025-02-02T00:00:00'
+
+    cache.forget_keys('alice')
+    cache.find_for_login('alice', load)
+    assert load.calls == 2
+
+
+def test_load_racing_a_write_is_not_stored():
+    cache = UserCache()
+
+    def stale_load(identifier):
+        cache.apply(1, {'last_login': 'now'})  # a login lands while we read
+        return dict(ALICE)
+
+    cache.find_for_login('alice', stale_load)
+    assert cache.stats()['entries'] == 0
+
+
+def test_bounded():
+    cache = UserCache(max_entries=1)
+    cache.find_for_login('alice', Loader())
+    bob = dict(ALICE, id=2, username='bob', email='bob@example.com')
+    cache.find_for_login('bob', Loader(bob))
+    assert cache.stats()['entries'] == 1
+    load = Loader()
+    cache.find_for_login('alice', load)
+    assert load.calls == 1
+
+
+def test_prime_caches_profiles():
+    cache = UserCache()
+    cache.prime([{k: v for k, v in ALICE.items() if k != 'password_hash'}])
+    load = Loader()
+    assert cache.get_profile(1, load)['username'] == 'Alice'
+    assert load.calls == 0
+
+
+def test_entries_expire_after_the_ttl():
+    now = [0.0]
+    cache = UserCache(ttl=30, clock=lambda: now[0])
+    load = Loader()
+    cache.find_for_login('alice', load)
+    now[0] = 29
+    cache.get_profile(1, load)
+    assert load.calls == 1
+    # Another replica changed the password: picked up once the entry expires
+    load.user = dict(ALICE, password_hash='new hash')
+    now[0] = 30
+    assert cache.find_for_login('alice', load)['password_hash'] == 'new hash'
+    assert load.calls == 2
+    assert cache.stats()['expired'] == 1
+    # A reload starts a fresh ttl; apply() does not extend it
+    now[0] = 45
+    cache.apply(1, {'last_login': 'now'})
+    now[0] = 60
+    cache.get_profile(1, load)
+    assert load.calls == 3
+
+
+def test_zero_ttl_keeps_entries_until_evicted():
+    now = [0.0]
+    cache = UserCache(ttl=0, clock=lambda: now[0])
+    load = Loader()
+    cache.find_for_login('alice', load)
+    now[0] = 10 ** 6
+    cache.find_for_login('alice', load)
+    assert load.calls == 1
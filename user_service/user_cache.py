@@ -0,0 +1,160 @@
+# user_service/user_cache.py
+"""
+In-process cache of users for login and profile lookups.
+
+Users are kept by id in a bounded LRU. Their username and email point at the
+id, folded the way SQLite's NOCASE folds them (ASCII only), so a repeated
+login or GET /api/users/profile/<id> is answered without touching the
+database. Misses are not cached.
+
+Writes go through the routes, which keep the cache current: register forgets
+the new user's keys, and an update (last_login) is applied to the cached
+entry. A load that races with a write is not stored, so a stale row cannot
+overwrite a newer one.
+
+That only covers writes made by this process. Replicas sharing a database
+(kubernetes/user-service runs two) do not see each other's writes, so every
+entry also expires USER_CACHE_TTL seconds after it was loaded; a row changed
+elsewhere is served stale for at most that long. Set USER_CACHE_TTL=0 to
+keep entries until they are evicted (one process per database, as the
+Dockerfile runs it), or USER_CACHE_SIZE=0 to turn the cache off.
+
+Entries are slotted UserRecords, not dicts, to keep the per-user footprint
+small (see benchmarks/bench_records.py); callers still get dicts.
+"""
+import string
+import threading
+import time
+from collections import OrderedDict
+
+from storage import UserRecord
+
+_ASCII_FOLD = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def login_key(identifier):
+    """Username or email as the NOCASE indexes compare it"""
+    return identifier.translate(_ASCII_FOLD)
+
+
+class UserCache:
+    """Bounded LRU of user rows by id, indexed by username and email"""
+
+    def __init__(self, max_entries=10000, ttl=30.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl  # seconds an entry is trusted after its load, 0 = until evicted
+        self._clock = clock
+        self._users = OrderedDict()  # id -> UserRecord (with password_hash once seen by a login)
+        self._expires = {}  # id -> clock() deadline, only when ttl is set
+        self._keys = {}  # login_key(username or email) -> id
+        self._generation = 0  # bumped by every write; loads that straddle one are dropped
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'expired': 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(max_entries=config['USER_CACHE_SIZE'], ttl=config['USER_CACHE_TTL'])
+
+    def _cached(self, user_id):
+        """Entry for user_id unless it is missing or expired (lock held)"""
+        user = self._users.get(user_id)
+        if user is not None and self.ttl and self._clock() >= self._expires[user_id]:
+            self.counters['expired'] += 1
+            self._evict(user_id, self._users.pop(user_id))
+            return None
+        return user
+
+    def find_for_login(self, identifier, load):
+        """Row including password_hash for a username or email; load(identifier) on a miss"""
+        with self._lock:
+            user_id = self._keys.get(login_key(identifier))
+            user = self._cached(user_id) if user_id is not None else None
+            if user is not None and user.password_hash is not None:
+                self._users.move_to_end(user_id)
+                self.counters['hits'] += 1
+                return user.login()
+            self.counters['misses'] += 1
+            generation = self._generation
+        user = load(identifier)
+        if user is not None:
+            self._store(UserRecord.from_dict(user), generation)
+        return user
+
+    def get_profile(self, user_id, load):
+        """Profile dict (PROFILE_FIELDS) or None; load(user_id) on a miss"""
+        with self._lock:
+            user = self._cached(user_id)
+            if user is not None:
+                self._users.move_to_end(user_id)
+                self.counters['hits'] += 1
+                return user.profile()
+            self.counters['misses'] += 1
+            generation = self._generation
+        profile = load(user_id)
+        if profile is not None:
+            self._store(UserRecord.from_dict(profile), generation)
+        return profile
+
+    def prime(self, users):
+        """Cache profiles loaded ahead of their first request (startup warmup)"""
+        with self._lock:
+            generation = self._generation
+        for user in users:
+            self._store(UserRecord.from_dict(user), generation)
+
+    def _store(self, user, generation):
+        if not self.max_entries:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            cached = self._cached(user.id)
+            if cached is not None and user.password_hash is None:
+                # A profile load must not drop a password_hash seen by a login
+                user.password_hash = cached.password_hash
+            self._users[user.id] = user
+            self._users.move_to_end(user.id)
+            if self.ttl:
+                self._expires[user.id] = self._clock() + self.ttl
+            self._keys[login_key(user.username)] = user.id
+            self._keys[login_key(user.email)] = user.id
+            while len(self._users) > self.max_entries:
+                self._evict(*self._users.popitem(last=False))
+
+    def _evict(self, user_id, user):
+        self._expires.pop(user_id, None)
+        for identifier in (user.username, user.email):
+            if self._keys.get(login_key(identifier)) == user_id:
+                del self._keys[login_key(identifier)]
+
+    def forget_keys(self, *identifiers):
+        """Drop whatever the given usernames/emails point at (after a register)"""
+        with self._lock:
+            self._generation += 1
+            self.counters['invalidations'] += 1
+            for identifier in identifiers:
+                user_id = self._keys.pop(login_key(identifier), None)
+                if user_id is not None and user_id in self._users:
+                    self._evict(user_id, self._users.pop(user_id))
+
+    def apply(self, user_id, changes):
+        """Apply {field: value} just written for a user to its cached row"""
+        with self._lock:
+            self._generation += 1
+            self.counters['invalidations'] += 1
+            user = self._users.get(user_id)
+            if user is not None:
+                for field, value in changes.items():
+                    setattr(user, field, value)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._users.clear()
+            self._expires.clear()
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._users), max_entries=self.max_entries,
+                        ttl=self.ttl)